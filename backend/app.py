@@ -21,6 +21,53 @@ def create_app():
     CORS(app, origins=app.config['CORS_ORIGINS'])
     jwt = JWTManager(app)
     
+    # Muestreador de métricas en segundo plano y escritor del historial
+    from services.system_monitor import sampler
+    from services.metrics_writer import metrics_writer
+    sampler.init_app(app)
+    metrics_writer.init_app(app)
+    sampler.add_listener(metrics_writer.record)
+    
+    # Consumo por instancia Odoo (cgroup v2) dentro de cada muestra
+    from services.cgroup_monitor import instance_resources
+    instance_resources.init_app(app)
+    sampler.add_collector('instances', instance_resources)
+    
+    # Exportador Prometheus: estado de instancias/backups y latencia de la API
+    from services.prometheus_exporter import panel_state, request_latency
+    panel_state.init_app(app)
+    request_latency.init_app(app)
+    sampler.add_collector('panel', panel_state)
+    
+    # Jobs en segundo plano: el proceso escritor despacha los encolados en cada muestra
+    from services.job_engine import job_engine
+    job_engine.init_app(app)
+    sampler.add_listener(job_engine.dispatch)
+    
+    # Eventos de instancias (altas, bajas, cambios de estado y jobs terminados)
+    from services.instance_events import instance_events, operation_tracker
+    operation_tracker.init_app(app)
+    instance_events.init_app(app)
+    sampler.add_collector('instance_events', instance_events)
+    
+    # Índice por dominio de los logs de nginx, al día en el proceso escritor
+    from services.nginx_log_index import nginx_log_indexer
+    nginx_log_indexer.init_app(app)
+    sampler.add_listener(nginx_log_indexer.tick)
+    
+    # Tráfico por instancia (peticiones/s, errores, latencias) sobre las líneas nuevas del access log
+    from services.nginx_analytics import nginx_analytics
+    nginx_analytics.init_app(app)
+    nginx_log_indexer.observe_access(nginx_analytics)
+    sampler.add_collector('nginx', nginx_analytics)
+    
+    # Alertas evaluadas sobre cada muestra
+    if app.config.get('ALERTS_ENABLED'):
+        from services.alert_engine import alert_engine
+        alert_engine.init_app(app)
+        sampler.add_listener(alert_engine.evaluate)
+        sampler.add_collector('alerts', alert_engine.active)
+    
     # Registrar blueprints
     from routes.auth import auth_bp
     from routes.metrics import metrics_bp
@@ -31,6 +78,8 @@ def create_app():
     from routes.github import github_bp
     from routes.test_upload import test_upload_bp
     from routes.chunked_upload import chunked_upload_bp
+    from routes.prometheus import prometheus_bp
+    from routes.jobs import jobs_bp
     
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(metrics_bp, url_prefix='/api/metrics')
@@ -41,6 +90,8 @@ def create_app():
     app.register_blueprint(github_bp, url_prefix='/api/github')
     app.register_blueprint(test_upload_bp, url_prefix='/api')
     app.register_blueprint(chunked_upload_bp, url_prefix='/api')
+    app.register_blueprint(prometheus_bp)
+    app.register_blueprint(jobs_bp, url_prefix='/api/jobs')
     
     # Manejadores de errores JWT
     @jwt.expired_token_loader
@@ -55,6 +106,14 @@ def create_app():
     def missing_token_callback(error):
         return jsonify({'error': 'Token no proporcionado'}), 401
     
+    # Los tokens de stream (de corta duración, van en la URL) no sirven para el resto de la API
+    from services.sse import token_scope_allowed
+    jwt.token_verification_loader(token_scope_allowed)
+    
+    @jwt.token_verification_failed_loader
+    def token_scope_callback(jwt_header, jwt_payload):
+        return jsonify({'error': 'Token no válido para este endpoint'}), 401
+    
     # Ruta de health check
     @app.route('/health')
     def health():
@@ -71,7 +130,9 @@ def create_app():
                 'instances': '/api/instances',
                 'logs': '/api/logs',
                 'backup': '/api/backup',
-                'github': '/api/github'
+                'github': '/api/github',
+                'jobs': '/api/jobs',
+                'prometheus': '/metrics'
             }
         }), 200
     
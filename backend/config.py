@@ -16,6 +16,8 @@ class Config:
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'dev-jwt-secret-key-change-in-production')
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=8)
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)
+    # Tokens de los streams SSE (van en la URL): solo sirven para abrir un stream
+    STREAM_TOKEN_EXPIRES = timedelta(seconds=int(os.getenv('STREAM_TOKEN_EXPIRES', 60)))
     
     # Database
     SQLALCHEMY_DATABASE_URI = f"postgresql://{os.getenv('DB_USER', 'mtg')}:{os.getenv('DB_PASSWORD', '!Phax3312!IMAC')}@{os.getenv('DB_HOST', 'localhost')}:{os.getenv('DB_PORT', '5432')}/{os.getenv('DB_NAME', 'server_panel')}"
@@ -45,6 +47,73 @@ class Config:
         f'http://{API_DOMAIN}'
     ]
     
+    # Métricas - muestreo en segundo plano (segundos entre muestras)
+    METRICS_SAMPLE_INTERVAL = float(os.getenv('METRICS_SAMPLE_INTERVAL', '2'))
+    # Segmento compartido entre workers: un solo proceso mide y el resto lee
+    METRICS_SHARED_STORE = os.getenv('METRICS_SHARED_STORE', 'true').lower() == 'true'
+    METRICS_SHM_PATH = os.getenv('METRICS_SHM_PATH', '')
+    METRICS_SHM_SIZE = int(os.getenv('METRICS_SHM_SIZE', str(1024 * 1024)))
+    # Stream SSE: duración máxima de cada conexión y latido (segundos)
+    METRICS_STREAM_MAX_SECONDS = int(os.getenv('METRICS_STREAM_MAX_SECONDS', '600'))
+    METRICS_STREAM_HEARTBEAT = int(os.getenv('METRICS_STREAM_HEARTBEAT', '15'))
+    # Historial: segundos entre muestras crudas, niveles de agregación y retención
+    METRICS_HISTORY_INTERVAL = int(os.getenv('METRICS_HISTORY_INTERVAL', '10'))
+    METRICS_FLUSH_INTERVAL = int(os.getenv('METRICS_FLUSH_INTERVAL', '60'))
+    METRICS_WRITER_BACKLOG = int(os.getenv('METRICS_WRITER_BACKLOG', '10000'))
+    METRICS_HISTORY_MAX_POINTS = int(os.getenv('METRICS_HISTORY_MAX_POINTS', '1500'))
+    METRICS_ROLLUP_GRACE_SECONDS = int(os.getenv('METRICS_ROLLUP_GRACE_SECONDS', '600'))
+    METRICS_RAW_RETENTION_HOURS = int(os.getenv('METRICS_RAW_RETENTION_HOURS', '48'))
+    METRICS_ROLLUP_1M_RETENTION_DAYS = int(os.getenv('METRICS_ROLLUP_1M_RETENTION_DAYS', '7'))
+    METRICS_ROLLUP_15M_RETENTION_DAYS = int(os.getenv('METRICS_ROLLUP_15M_RETENTION_DAYS', '90'))
+    METRICS_ROLLUP_1H_RETENTION_DAYS = int(os.getenv('METRICS_ROLLUP_1H_RETENTION_DAYS', '730'))
+    # Consumo por instancia (cgroup v2 de cada servicio systemd)
+    CGROUP_ROOT = os.getenv('CGROUP_ROOT', '/sys/fs/cgroup')
+    CGROUP_SLICE = os.getenv('CGROUP_SLICE', 'system.slice')
+    METRICS_INSTANCE_HISTORY_INTERVAL = int(os.getenv('METRICS_INSTANCE_HISTORY_INTERVAL', '60'))
+    METRICS_INSTANCE_RETENTION_DAYS = int(os.getenv('METRICS_INSTANCE_RETENTION_DAYS', '7'))
+    # Exportador Prometheus/OpenMetrics (/metrics)
+    # Si PROMETHEUS_TOKEN está definido se exige 'Authorization: Bearer <token>';
+    # si no, solo se aceptan scrapes directos desde localhost (no vía nginx)
+    PROMETHEUS_TOKEN = os.getenv('PROMETHEUS_TOKEN', '')
+    # Segundos entre lecturas del estado de instancias y backups (proceso escritor)
+    METRICS_PANEL_REFRESH_INTERVAL = int(os.getenv('METRICS_PANEL_REFRESH_INTERVAL', '30'))
+    # Estado de servicios systemd: 'systemctl' (una sola llamada a systemctl show) o 'fake'
+    SERVICE_STATUS_BACKEND = os.getenv('SERVICE_STATUS_BACKEND', 'systemctl')
+    SERVICE_STATUS_FAKE_FILE = os.getenv('SERVICE_STATUS_FAKE_FILE', '')  # JSON servicio -> estado (backend fake)
+    SERVICE_STATUS_CACHE_SECONDS = float(os.getenv('SERVICE_STATUS_CACHE_SECONDS', '2'))
+    # Jobs (scripts de creación, update-db, backups...): máximo simultáneo y directorio de códigos de salida
+    JOBS_MAX_CONCURRENT = int(os.getenv('JOBS_MAX_CONCURRENT', '2'))
+    JOBS_DIR = os.getenv('JOBS_DIR', f'{DATA_PATH}/jobs')
+    # Control de admisión: máximo por clase de recurso y umbrales del muestreador para lanzar más
+    JOBS_CLASS_LIMITS = os.getenv('JOBS_CLASS_LIMITS', 'io=1,cpu=1,db=1')
+    JOBS_MAX_LOAD_PER_CPU = float(os.getenv('JOBS_MAX_LOAD_PER_CPU', '1.5'))  # load average 1 min / CPUs
+    JOBS_MAX_IOWAIT = float(os.getenv('JOBS_MAX_IOWAIT', '25'))  # % (frena jobs io y db)
+    JOBS_ADMISSION_MAX_HOLD = int(os.getenv('JOBS_ADMISSION_MAX_HOLD', '900'))  # Segundos máximos de espera por carga sin jobs corriendo
+    JOBS_DEFAULT_ESTIMATE = int(os.getenv('JOBS_DEFAULT_ESTIMATE', '300'))  # Duración supuesta sin historial (ETA)
+    # Clonado de la BD de producción en instancias de desarrollo: auto, template o dump (ver clone-database.sh)
+    DB_CLONE_METHOD = os.getenv('DB_CLONE_METHOD', 'auto')
+    # Journal de las instancias: 'journalctl' (-o json con cursores) o 'fake'
+    JOURNAL_BACKEND = os.getenv('JOURNAL_BACKEND', 'journalctl')
+    JOURNAL_FAKE_FILE = os.getenv('JOURNAL_FAKE_FILE', '')  # JSON servicio -> lista de entradas (backend fake)
+    JOURNAL_FOLLOW_INTERVAL = float(os.getenv('JOURNAL_FOLLOW_INTERVAL', '2'))  # Segundos entre lecturas de una unidad (compartidas por los streams de cada worker)
+    # Eventos de instancias (/api/instances/events): segundos entre comparaciones y eventos guardados
+    INSTANCE_EVENTS_POLL_INTERVAL = float(os.getenv('INSTANCE_EVENTS_POLL_INTERVAL', '2'))
+    INSTANCE_EVENTS_BUFFER = int(os.getenv('INSTANCE_EVENTS_BUFFER', '100'))
+    
+    # Logs de nginx: índice incremental por dominio (lo mantiene el proceso escritor)
+    NGINX_ACCESS_LOG = os.getenv('NGINX_ACCESS_LOG', '/var/log/nginx/access.log')
+    NGINX_ERROR_LOG = os.getenv('NGINX_ERROR_LOG', '/var/log/nginx/error.log')
+    NGINX_LOG_INDEX_DIR = os.getenv('NGINX_LOG_INDEX_DIR', f'{DATA_PATH}/nginx-index')
+    NGINX_LOG_INDEX_INTERVAL = int(os.getenv('NGINX_LOG_INDEX_INTERVAL', '5'))
+    NGINX_LOG_RING_LINES = int(os.getenv('NGINX_LOG_RING_LINES', '500'))  # Líneas en memoria por dominio
+    NGINX_LOG_INDEX_BACKFILL_MB = int(os.getenv('NGINX_LOG_INDEX_BACKFILL_MB', '256'))  # Al indexar por primera vez
+    NGINX_ANALYTICS_WINDOW = int(os.getenv('NGINX_ANALYTICS_WINDOW', '60'))  # Segundos por ventana de métricas de tráfico
+    
+    # Alertas sobre el stream de métricas
+    ALERTS_ENABLED = os.getenv('ALERTS_ENABLED', 'true').lower() == 'true'
+    ALERT_RULES_FILE = os.getenv('ALERT_RULES_FILE', '')  # JSON con la lista de reglas (reemplaza las por defecto)
+    ALERT_WEBHOOK_URL = os.getenv('ALERT_WEBHOOK_URL', '')
+    
     # GitHub OAuth (opcional - para futuras mejoras con OAuth flow)
     GITHUB_CLIENT_ID = os.getenv('GITHUB_CLIENT_ID', '')
     GITHUB_CLIENT_SECRET = os.getenv('GITHUB_CLIENT_SECRET', '')
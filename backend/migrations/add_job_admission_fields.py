@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Migration: Add admission control fields to jobs
+Date: 2026-10-18
+"""
+
+import sys
+import os
+
+# Agregar el directorio backend al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from models import db
+
+def migrate():
+    """Agrega clase de recurso, prioridad y motivo de espera a la tabla jobs"""
+    app = create_app()
+    
+    with app.app_context():
+        try:
+            db.session.execute(db.text("""
+                ALTER TABLE jobs 
+                ADD COLUMN IF NOT EXISTS job_class VARCHAR(10) NOT NULL DEFAULT 'cpu'
+            """))
+            
+            db.session.execute(db.text("""
+                ALTER TABLE jobs 
+                ADD COLUMN IF NOT EXISTS priority INTEGER NOT NULL DEFAULT 1
+            """))
+            
+            db.session.execute(db.text("""
+                ALTER TABLE jobs 
+                ADD COLUMN IF NOT EXISTS wait_reason VARCHAR(255)
+            """))
+            
+            db.session.commit()
+            
+            print("✅ Migración completada exitosamente")
+            print("   - job_class agregado")
+            print("   - priority agregado")
+            print("   - wait_reason agregado")
+            
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error en migración: {e}")
+            raise
+
+if __name__ == '__main__':
+    migrate()
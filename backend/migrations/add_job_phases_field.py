@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Migration: Add per-phase timings to jobs
+Date: 2026-10-18
+"""
+
+import sys
+import os
+
+# Agregar el directorio backend al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from models import db
+
+def migrate():
+    """Agrega los tiempos por fase informados por los scripts a la tabla jobs"""
+    app = create_app()
+    
+    with app.app_context():
+        try:
+            db.session.execute(db.text("""
+                ALTER TABLE jobs 
+                ADD COLUMN IF NOT EXISTS phases TEXT
+            """))
+            
+            db.session.commit()
+            
+            print("✅ Migración completada exitosamente")
+            print("   - phases agregado")
+        
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error en migración: {e}")
+            raise
+
+if __name__ == '__main__':
+    migrate()
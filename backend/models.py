@@ -1,5 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+import json
 import bcrypt
 
 db = SQLAlchemy()
@@ -151,3 +152,213 @@ class MetricsHistory(db.Model):
             'network_sent_mb': self.network_sent_mb,
             'network_recv_mb': self.network_recv_mb
         }
+
+class MetricsRollupMixin:
+    """Columnas comunes de los niveles de agregación de métricas
+    
+    Cada fila resume un bucket de tiempo (`bucket_start`) con mínimo, promedio
+    y máximo de cada métrica de MetricsHistory.
+    """
+    
+    id = db.Column(db.Integer, primary_key=True)
+    bucket_start = db.Column(db.DateTime, nullable=False, unique=True, index=True)
+    sample_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    cpu_percent_min = db.Column(db.Float)
+    cpu_percent_avg = db.Column(db.Float)
+    cpu_percent_max = db.Column(db.Float)
+    ram_percent_min = db.Column(db.Float)
+    ram_percent_avg = db.Column(db.Float)
+    ram_percent_max = db.Column(db.Float)
+    ram_used_gb_min = db.Column(db.Float)
+    ram_used_gb_avg = db.Column(db.Float)
+    ram_used_gb_max = db.Column(db.Float)
+    disk_percent_min = db.Column(db.Float)
+    disk_percent_avg = db.Column(db.Float)
+    disk_percent_max = db.Column(db.Float)
+    disk_used_gb_min = db.Column(db.Float)
+    disk_used_gb_avg = db.Column(db.Float)
+    disk_used_gb_max = db.Column(db.Float)
+    network_sent_mb_min = db.Column(db.Float)
+    network_sent_mb_avg = db.Column(db.Float)
+    network_sent_mb_max = db.Column(db.Float)
+    network_recv_mb_min = db.Column(db.Float)
+    network_recv_mb_avg = db.Column(db.Float)
+    network_recv_mb_max = db.Column(db.Float)
+    
+    # Totales: no varían dentro de un bucket, se guarda el último valor
+    ram_total_gb = db.Column(db.Float)
+    disk_total_gb = db.Column(db.Float)
+    
+    # Métricas agregadas (mismo nombre que las columnas de MetricsHistory)
+    FIELDS = [
+        'cpu_percent', 'ram_percent', 'ram_used_gb', 'disk_percent',
+        'disk_used_gb', 'network_sent_mb', 'network_recv_mb'
+    ]
+    
+    def to_dict(self):
+        """Mismo formato que MetricsHistory (promedios) más los campos _min/_max"""
+        data = {
+            'timestamp': self.bucket_start.isoformat() if self.bucket_start else None,
+            'sample_count': self.sample_count,
+            'ram_total_gb': self.ram_total_gb,
+            'disk_total_gb': self.disk_total_gb
+        }
+        for field in self.FIELDS:
+            data[field] = getattr(self, f'{field}_avg')
+            data[f'{field}_min'] = getattr(self, f'{field}_min')
+            data[f'{field}_max'] = getattr(self, f'{field}_max')
+        return data
+
+class MetricsRollup1m(MetricsRollupMixin, db.Model):
+    __tablename__ = 'metrics_rollup_1m'
+
+class MetricsRollup15m(MetricsRollupMixin, db.Model):
+    __tablename__ = 'metrics_rollup_15m'
+
+class MetricsRollup1h(MetricsRollupMixin, db.Model):
+    __tablename__ = 'metrics_rollup_1h'
+
+class InstanceMetricsHistory(db.Model):
+    __tablename__ = 'instance_metrics_history'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    instance_name = db.Column(db.String(100), nullable=False, index=True)
+    cpu_percent = db.Column(db.Float)  # Porcentaje del total del host
+    memory_mb = db.Column(db.Float)
+    rss_mb = db.Column(db.Float)
+    io_read_mb_s = db.Column(db.Float)
+    io_write_mb_s = db.Column(db.Float)
+    
+    def to_dict(self):
+        return {
+            'timestamp': self.timestamp.isoformat() if self.timestamp else None,
+            'instance_name': self.instance_name,
+            'cpu_percent': self.cpu_percent,
+            'memory_mb': self.memory_mb,
+            'rss_mb': self.rss_mb,
+            'io_read_mb_s': self.io_read_mb_s,
+            'io_write_mb_s': self.io_write_mb_s
+        }
+
+class NginxMetricsHistory(db.Model):
+    __tablename__ = 'nginx_metrics_history'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)  # Fin de la ventana
+    domain = db.Column(db.String(255), nullable=False, index=True)
+    instance_name = db.Column(db.String(100), index=True)
+    requests = db.Column(db.Integer)
+    rps = db.Column(db.Float)
+    bytes_sent = db.Column(db.BigInteger)
+    status_2xx = db.Column(db.Integer)
+    status_3xx = db.Column(db.Integer)
+    status_4xx = db.Column(db.Integer)
+    status_5xx = db.Column(db.Integer)
+    error_rate = db.Column(db.Float)  # Porcentaje de 5xx
+    p50_ms = db.Column(db.Float)
+    p95_ms = db.Column(db.Float)
+    p99_ms = db.Column(db.Float)
+    avg_ms = db.Column(db.Float)
+    upstream_p95_ms = db.Column(db.Float)
+    
+    def to_dict(self):
+        return {
+            'timestamp': self.timestamp.isoformat() if self.timestamp else None,
+            'domain': self.domain,
+            'instance_name': self.instance_name,
+            'requests': self.requests,
+            'rps': self.rps,
+            'bytes_sent': self.bytes_sent,
+            'status_2xx': self.status_2xx,
+            'status_3xx': self.status_3xx,
+            'status_4xx': self.status_4xx,
+            'status_5xx': self.status_5xx,
+            'error_rate': self.error_rate,
+            'p50_ms': self.p50_ms,
+            'p95_ms': self.p95_ms,
+            'p99_ms': self.p99_ms,
+            'avg_ms': self.avg_ms,
+            'upstream_p95_ms': self.upstream_p95_ms
+        }
+
+class AlertEvent(db.Model):
+    __tablename__ = 'alert_events'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    rule = db.Column(db.String(100), nullable=False, index=True)
+    subject = db.Column(db.String(255), nullable=False)  # host, punto de montaje o instancia
+    state = db.Column(db.String(20), nullable=False)  # firing, resolved
+    severity = db.Column(db.String(20), default='warning')
+    value = db.Column(db.Float)
+    threshold = db.Column(db.Float)
+    message = db.Column(db.Text)
+    started_at = db.Column(db.DateTime, nullable=False)  # Inicio de la alerta
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'rule': self.rule,
+            'subject': self.subject,
+            'state': self.state,
+            'severity': self.severity,
+            'value': self.value,
+            'threshold': self.threshold,
+            'message': self.message,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'timestamp': self.timestamp.isoformat() if self.timestamp else None
+        }
+
+class Job(db.Model):
+    __tablename__ = 'jobs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    action = db.Column(db.String(50), nullable=False, index=True)  # create, update-db, backup, restore...
+    instance_name = db.Column(db.String(100), index=True)
+    job_class = db.Column(db.String(10), nullable=False, default='cpu')  # io, cpu, db: recurso que más usa
+    priority = db.Column(db.Integer, nullable=False, default=1)  # 0 alta, 1 media, 2 baja
+    wait_reason = db.Column(db.String(255))  # Por qué sigue en cola
+    command = db.Column(db.Text, nullable=False)  # JSON: lista de argumentos
+    cwd = db.Column(db.String(500))
+    stdin = db.Column(db.Text)  # Respuestas a las confirmaciones del script
+    log_file = db.Column(db.String(500))
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)  # queued, running, succeeded, failed, cancelled
+    exit_code = db.Column(db.Integer)
+    pid = db.Column(db.Integer)
+    proc_start = db.Column(db.BigInteger)  # Inicio del proceso (ticks), para no confundir PIDs reutilizados
+    error = db.Column(db.Text)
+    cancel_requested = db.Column(db.Boolean, default=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    duration = db.Column(db.Float)  # Segundos de ejecución
+    log_bytes = db.Column(db.BigInteger)
+    phases = db.Column(db.Text)  # JSON: [{name, seconds, detail}] informadas por el script (JOB_PHASES_FILE)
+    
+    def to_dict(self):
+        wait = None
+        if self.started_at and self.created_at:
+            wait = round((self.started_at - self.created_at).total_seconds(), 1)
+        return {
+            'id': self.id,
+            'action': self.action,
+            'instance_name': self.instance_name,
+            'job_class': self.job_class,
+            'priority': self.priority,
+            'status': self.status,
+            'wait_reason': self.wait_reason if self.status == 'queued' else None,
+            'exit_code': self.exit_code,
+            'pid': self.pid,
+            'log_file': self.log_file,
+            'error': self.error,
+            'cancel_requested': bool(self.cancel_requested),
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'wait_seconds': wait,
+            'duration': self.duration,
+            'log_bytes': self.log_bytes,
+            'phases': json.loads(self.phases) if self.phases else []
+        }
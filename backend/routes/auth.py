@@ -1,7 +1,8 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity
 from datetime import datetime
 from models import db, User
+from services.sse import STREAM_SCOPE
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -40,6 +41,20 @@ def refresh():
     access_token = create_access_token(identity=str(identity))
     return jsonify({'access_token': access_token}), 200
 
+@auth_bp.route('/stream-token', methods=['POST'])
+@jwt_required()
+def stream_token():
+    """Token de corta duración para abrir un stream SSE
+    
+    EventSource no permite cabeceras y el token queda en la URL: este solo
+    sirve en los endpoints SSE y vence a los STREAM_TOKEN_EXPIRES (se valida
+    al conectar; el cliente pide uno nuevo en cada reconexión).
+    """
+    expires = current_app.config['STREAM_TOKEN_EXPIRES']
+    token = create_access_token(identity=str(get_jwt_identity()), expires_delta=expires,
+                                additional_claims={'scope': STREAM_SCOPE})
+    return jsonify({'token': token, 'expires_in': int(expires.total_seconds())}), 200
+
 @auth_bp.route('/me', methods=['GET'])
 @jwt_required()
 def get_current_user():
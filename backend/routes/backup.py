@@ -2,6 +2,7 @@ from flask import Blueprint, jsonify, request, send_file
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import User, ActionLog, db
 from services.backup_manager import BackupManager
+from services.log_tail import page_args
 import os
 from datetime import datetime
 import logging
@@ -203,7 +204,7 @@ def get_backup_log():
         return jsonify({'error': 'Permisos insuficientes'}), 403
     
     try:
-        result = manager.get_backup_log()
+        result = manager.get_backup_log(**page_args(request.args))
         return jsonify(result), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -261,7 +262,7 @@ def get_restore_log():
         return jsonify({'error': 'Permisos insuficientes'}), 403
     
     try:
-        result = manager.get_restore_log()
+        result = manager.get_restore_log(**page_args(request.args))
         return jsonify(result), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
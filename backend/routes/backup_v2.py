@@ -2,6 +2,8 @@ from flask import Blueprint, jsonify, request, send_file
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import User, ActionLog, db
 from services.backup_manager_v2 import BackupManagerV2
+from services.log_tail import page_args
+from services.http_cache import make_etag, not_modified, json_with_etag
 import os
 from datetime import datetime
 import logging
@@ -35,7 +37,12 @@ def log_action(user_id, action, instance_name=None, details=None, status='succes
 @backup_v2_bp.route('/instances', methods=['GET'])
 @jwt_required()
 def list_instances():
-    """Lista todas las instancias con configuración de backup"""
+    """Lista todas las instancias con configuración de backup
+    
+    Responde 304 si el If-None-Match coincide con la versión del listado
+    (registro de instancias, mtimes de los directorios y tamaño y mtime de
+    cada backup).
+    """
     user_id = int(get_jwt_identity())
     user = User.query.get(user_id)
     
@@ -43,8 +50,14 @@ def list_instances():
         return jsonify({'error': 'Permisos insuficientes'}), 403
     
     try:
+        etag = make_etag(manager.get_listing_version())
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        
         result = manager.list_instances_with_backups()
-        return jsonify(result), 200
+        # El listado crea la configuración de las instancias nuevas: versión posterior
+        return json_with_etag(result, make_etag(manager.get_listing_version())), 200
     except Exception as e:
         logger.error(f"Error listing instances: {e}")
         return jsonify({'error': str(e)}), 500
@@ -288,7 +301,7 @@ def get_instance_backup_log(instance_name):
         return jsonify({'error': 'Permisos insuficientes'}), 403
     
     try:
-        result = manager.get_backup_log(instance_name)
+        result = manager.get_backup_log(instance_name, **page_args(request.args))
         return jsonify(result), 200
     except Exception as e:
         logger.error(f"Error getting backup log for {instance_name}: {e}")
@@ -305,7 +318,7 @@ def get_instance_restore_log(instance_name):
         return jsonify({'error': 'Permisos insuficientes'}), 403
     
     try:
-        result = manager.get_restore_log(instance_name)
+        result = manager.get_restore_log(instance_name, **page_args(request.args))
         return jsonify(result), 200
     except Exception as e:
         logger.error(f"Error getting restore log for {instance_name}: {e}")
@@ -1,6 +1,14 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, Response, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from services.instance_manager import InstanceManager
+import time
+from services.instance_manager import InstanceManager, DB_CLONE_METHODS
+from services.system_monitor import sampler
+from services.http_cache import make_etag, not_modified, json_with_etag
+from services.instance_events import events_after
+from services.sse import sse_event, SSE_HEADERS, stream_token_required
+from services.log_tail import read_incremental, page_args, DEFAULT_MAX_BYTES
+from services.journal import read_journal, get_journal_source, get_journal_follower
+from services.job_engine import job_engine
 from models import db, ActionLog, User
 
 instances_bp = Blueprint('instances', __name__)
@@ -25,13 +33,81 @@ def log_action(user_id, action, instance_name=None, details=None, status='succes
 @instances_bp.route('', methods=['GET'])
 @jwt_required()
 def list_instances():
-    """Lista todas las instancias"""
+    """Lista todas las instancias
+    
+    Con `?resources=1` agrega a cada instancia su consumo actual (cgroup v2)
+    tomado del último snapshot del muestreador.
+    
+    Responde 304 si el If-None-Match coincide: el ETag es un hash del listado
+    mismo (datos del registro, estados de systemd y consumo), así todos los
+    workers dan el mismo ETag para el mismo contenido.
+    """
     try:
         instances = manager.list_instances()
-        return jsonify({'instances': instances, 'count': len(instances)}), 200
+        if request.args.get('resources') in ('1', 'true'):
+            usage = sampler.get_snapshot().get('instances', {})
+            for instance in instances:
+                instance['resources'] = usage.get(instance['name'])
+        etag = make_etag(instances)
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        return json_with_etag({'instances': instances, 'count': len(instances)}, etag), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@instances_bp.route('/events', methods=['GET'])
+@stream_token_required
+def instance_events_stream():
+    """Stream SSE de eventos de instancias
+    
+    Emite un evento por instancia agregada (`added`), eliminada (`removed`),
+    cambio de ActiveState (`state_changed`) u operación en segundo plano
+    terminada (`operation_finished`). Los eventos los genera una sola vez el
+    proceso escritor del muestreador; cada stream solo reenvía los nuevos.
+    
+    Al reconectar se reenvían los eventos posteriores a Last-Event-ID (o
+    `last_event_id`, para el cliente que abre otra conexión con un token de
+    stream nuevo); si ya no están en el buffer se envía `resync` y el cliente
+    debe volver a pedir el listado. Requiere un token de stream (?jwt=...).
+    """
+    max_seconds = current_app.config.get('METRICS_STREAM_MAX_SECONDS', 600)
+    heartbeat = current_app.config.get('METRICS_STREAM_HEARTBEAT', 15)
+    last_event_id = request.headers.get('Last-Event-ID', type=int) or request.args.get('last_event_id', type=int)
+    
+    def generate():
+        deadline = time.monotonic() + max_seconds
+        version = sampler.version
+        state = sampler.get_snapshot().get('instance_events')
+        seq = (state or {}).get('seq', 0)
+        yield 'retry: 2000\n\n'
+        
+        last_id = seq if last_event_id is None else last_event_id
+        yield sse_event('ready', {'seq': seq})
+        last_sent = time.monotonic()
+        
+        while True:
+            events, complete = events_after(state, last_id)
+            if not complete:
+                yield sse_event('resync', {'seq': (state or {}).get('seq', 0)})
+                last_sent = time.monotonic()
+            for event in events:
+                yield sse_event(event['type'], event, event['id'])
+                last_sent = time.monotonic()
+            if events or not complete:
+                last_id = (state or {}).get('seq', last_id)
+            
+            if time.monotonic() >= deadline:
+                return
+            version, snapshot = sampler.wait_for_update(version, timeout=heartbeat)
+            state = (snapshot or {}).get('instance_events', state)
+            if time.monotonic() - last_sent >= heartbeat:
+                # Comentario SSE para mantener viva la conexión a través de proxies
+                yield ': keepalive\n\n'
+                last_sent = time.monotonic()
+    
+    return Response(generate(), mimetype='text/event-stream', headers=SSE_HEADERS)
+
 @instances_bp.route('/<instance_name>', methods=['GET'])
 @jwt_required()
 def get_instance(instance_name):
@@ -75,8 +151,13 @@ def create_instance():
     # Obtener opción de neutralización (por defecto True)
     neutralize = data.get('neutralize', True)
     
+    # Método de clonado de la BD: auto, template o dump (por defecto DB_CLONE_METHOD)
+    clone_method = data.get('cloneMethod')
+    if clone_method and clone_method not in DB_CLONE_METHODS:
+        return jsonify({'error': f'Método de clonado inválido: {clone_method} (usar {", ".join(DB_CLONE_METHODS)})'}), 400
+    
     try:
-        result = manager.create_dev_instance(data['name'], source_instance, neutralize)
+        result = manager.create_dev_instance(data['name'], source_instance, neutralize, clone_method)
         
         # Log
         source_msg = f" desde {source_instance}" if source_instance else ""
@@ -312,13 +393,18 @@ def update_instance_files(instance_name):
 @instances_bp.route('/<instance_name>/logs', methods=['GET'])
 @jwt_required()
 def get_instance_logs(instance_name):
-    """Obtiene los logs de una instancia"""
-    lines = request.args.get('lines', default=100, type=int)
-    lines = min(lines, 1000)  # Máximo 1000 líneas
+    """Obtiene los logs de una instancia
+    
+    Con type=odoo acepta `before` e `inode` (de la respuesta anterior) para
+    traer las líneas previas; con type=systemd, `cursor` para traer solo las
+    entradas nuevas del journal.
+    """
+    page = page_args(request.args, default_lines=100, max_lines=1000)  # Máximo 1000 líneas
     log_type = request.args.get('type', default='systemd', type=str)
     
     try:
-        result = manager.get_instance_logs(instance_name, lines, log_type)
+        result = manager.get_instance_logs(instance_name, log_type=log_type,
+                                           cursor=request.args.get('cursor') or None, **page)
         if result['success']:
             return jsonify(result), 200
         else:
@@ -326,6 +412,64 @@ def get_instance_logs(instance_name):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@instances_bp.route('/<instance_name>/logs/stream', methods=['GET'])
+@stream_token_required
+def follow_instance_journal(instance_name):
+    """Stream SSE del journal de una instancia (equivalente a journalctl -f)
+    
+    Envía un evento `entries` ({logs, count, cursor, reset}) con las últimas
+    `lines` entradas (o las posteriores a `cursor`) y luego uno por cada
+    lectura con entradas nuevas. El id de cada evento es el cursor, así
+    EventSource retoma desde ahí al reconectar (Last-Event-ID o `cursor`).
+    Las lecturas siguientes pasan por el seguimiento compartido del proceso
+    (un journalctl por unidad cada JOURNAL_FOLLOW_INTERVAL segundos, no uno
+    por conexión). Requiere un token de stream (?jwt=...).
+    """
+    instance = manager.find_instance(instance_name, with_status=False)
+    if not instance:
+        return jsonify({'error': 'Instancia no encontrada'}), 404
+    if not instance['service']:
+        return jsonify({'error': 'Servicio no encontrado'}), 404
+    
+    lines = max(1, min(request.args.get('lines', default=100, type=int), 1000))
+    cursor = request.headers.get('Last-Event-ID') or request.args.get('cursor') or None
+    source = get_journal_source(current_app.config)
+    follower = get_journal_follower(current_app.config)
+    max_seconds = current_app.config.get('METRICS_STREAM_MAX_SECONDS', 600)
+    heartbeat = current_app.config.get('METRICS_STREAM_HEARTBEAT', 15)
+    
+    def generate():
+        nonlocal cursor
+        deadline = time.monotonic() + max_seconds
+        last_sent = 0
+        first = True
+        yield 'retry: 2000\n\n'
+        
+        while True:
+            try:
+                if first:
+                    result = read_journal(source, instance['service'], lines=lines, cursor=cursor)
+                else:
+                    result = follower.read(instance['service'], cursor, lines=lines)
+            except Exception as e:
+                yield sse_event('error', {'error': str(e)})
+                return
+            # Sin cursor y sin entradas, reset solo indica que se leyó desde el final
+            if result['count'] or first or (result['reset'] and cursor is not None):
+                cursor = result['cursor']
+                yield sse_event('entries', result, cursor)
+                last_sent = time.monotonic()
+                first = False
+            elif time.monotonic() - last_sent >= heartbeat:
+                yield ': keepalive\n\n'
+                last_sent = time.monotonic()
+            
+            if time.monotonic() >= deadline:
+                return
+            time.sleep(follower.interval)
+    
+    return Response(generate(), mimetype='text/event-stream', headers=SSE_HEADERS)
+
 @instances_bp.route('/<instance_name>/restart', methods=['POST'])
 @jwt_required()
 def restart_instance(instance_name):
@@ -357,10 +501,25 @@ def restart_instance(instance_name):
         log_action(user_id, 'restart_instance', instance_name, str(e), 'error')
         return jsonify({'error': str(e)}), 500
 
+def _log_cursor():
+    """Cursor de lectura incremental del query string (offset e inode)"""
+    return request.args.get('offset', type=int), request.args.get('inode', type=int)
+
 @instances_bp.route('/creation-log/<instance_name>', methods=['GET'])
 @jwt_required()
 def get_creation_log(instance_name):
-    """Obtiene log incremental + estado + pid de creación"""
+    """Obtiene log incremental + estado + pid de creación
+    
+    El estado sale del último job `create` de la instancia: mientras está en
+    cola se informa `queued` con su posición y ETA sin leer el log (que puede
+    ser de un intento anterior); al terminar, `success` o `error` con el
+    exit_code. Los archivos .pid/.status de /tmp solo se usan si no hay job.
+    
+    Sin `offset` devuelve los últimos 5000 bytes; con `offset` (e `inode`)
+    devuelve solo lo escrito desde ahí. La respuesta trae el próximo cursor
+    (`offset`, `inode`) y `reset` si el log se reemplazó o truncó y el
+    contenido no debe agregarse al anterior.
+    """
     import os
 
     # Paths
@@ -368,64 +527,98 @@ def get_creation_log(instance_name):
     pid_file = f'/tmp/{instance_name}.pid'
     status_file = f'/tmp/{instance_name}.status'
 
-    # Si el log aún no existe
-    if not os.path.exists(log_file):
+    try:
+        job = job_engine.latest('create', instance_name)
+    except Exception as e:
+        return jsonify({'error': f'Error consultando el job: {e}'}), 500
+
+    # En cola: el log en disco, si existe, es de un intento anterior
+    if job and job['status'] == 'queued':
         return jsonify({
             'exists': False,
-            'log': 'Log no disponible aún...',
+            'log': 'En cola, esperando turno...',
             'pid': None,
-            'status': 'pending',
+            'status': 'queued',
             'finished': False,
-            'error': False
+            'error': False,
+            'job_id': job['id'],
+            'queue_position': job.get('queue_position'),
+            'eta_seconds': job.get('eta_seconds'),
+            'offset': 0,
+            'inode': None,
+            'reset': False
         }), 200
 
-    # Leer últimas 5000 bytes estilo tail
+    offset, inode = _log_cursor()
     try:
-        with open(log_file, 'rb') as f:
-            f.seek(0, os.SEEK_END)
-            size = f.tell()
-            offset = max(size - 5000, 0)
-            f.seek(offset)
-            log_content = f.read().decode(errors="replace")
+        chunk = read_incremental(log_file, offset, inode, tail_bytes=5000)
     except Exception as e:
         return jsonify({'error': f'Error leyendo log: {e}'}), 500
 
-    # Leer PID
-    pid = None
-    if os.path.exists(pid_file):
-        try:
-            with open(pid_file, 'r') as f:
-                pid = f.read().strip()
-        except:
-            pid = None
+    # Si el log aún no existe
+    if not chunk['exists']:
+        return jsonify({
+            'exists': False,
+            'log': 'Log no disponible aún...',
+            'pid': None,
+            'status': 'pending',
+            'finished': False,
+            'error': False,
+            'offset': 0,
+            'inode': None,
+            'reset': False
+        }), 200
+
+    exit_code = None
+    if job:
+        pid = job['pid']
+        exit_code = job['exit_code']
+        status = {'running': 'running', 'succeeded': 'success'}.get(job['status'], 'error')
+    else:
+        # Sin job registrado (creaciones anteriores al motor de jobs)
+        pid = None
+        if os.path.exists(pid_file):
+            try:
+                with open(pid_file, 'r') as f:
+                    pid = f.read().strip()
+            except:
+                pid = None
 
-    # Leer estado
-    status = "running"
-    if os.path.exists(status_file):
-        try:
-            with open(status_file, 'r') as f:
-                status = f.read().strip()
-        except:
-            status = "unknown"
+        status = "running"
+        if os.path.exists(status_file):
+            try:
+                with open(status_file, 'r') as f:
+                    status = f.read().strip()
+            except:
+                status = "unknown"
 
     finished = (status == "success")
     error = (status == "error")
 
     return jsonify({
         'exists': True,
-        'log': log_content,
+        'log': chunk['log'],
         'pid': pid,
         'status': status,
         'finished': finished,
-        'error': error
+        'error': error,
+        'exit_code': exit_code,
+        'job_id': job['id'] if job else None,
+        'offset': chunk['offset'],
+        'inode': chunk['inode'],
+        'size': chunk['size'],
+        'reset': chunk['reset'],
+        'more': chunk['more']
     }), 200
 
 @instances_bp.route('/update-log/<instance_name>/<action>', methods=['GET'])
 @jwt_required()
 def get_update_log(instance_name, action):
-    """Obtiene el log de actualización de una instancia"""
-    import os
+    """Obtiene el log de actualización de una instancia
     
+    Sin `offset` devuelve el log completo; con `offset` (e `inode`) solo los
+    bytes nuevos, igual que el log de creación.
+    """
     log_files = {
         'update-db': f'/tmp/odoo-update-db-{instance_name}.log',
         'update-files': f'/tmp/odoo-update-files-{instance_name}.log',
@@ -437,15 +630,15 @@ def get_update_log(instance_name, action):
     if not log_file:
         return jsonify({'error': 'Acción no válida'}), 400
     
-    if not os.path.exists(log_file):
-        return jsonify({'log': 'Log no disponible aún...', 'exists': False}), 200
-    
+    offset, inode = _log_cursor()
     try:
-        with open(log_file, 'r') as f:
-            content = f.read()
-        return jsonify({'log': content, 'exists': True}), 200
+        chunk = read_incremental(log_file, offset, inode, max_bytes=None if offset is None else DEFAULT_MAX_BYTES)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+    
+    if not chunk['exists']:
+        return jsonify({'log': 'Log no disponible aún...', 'exists': False, 'offset': 0, 'inode': None, 'reset': False}), 200
+    return jsonify(chunk), 200
 
 @instances_bp.route('/<instance_name>/sync-filestore', methods=['POST'])
 @jwt_required()
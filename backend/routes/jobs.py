@@ -0,0 +1,121 @@
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from services.job_engine import job_engine
+from services.log_tail import read_incremental
+from models import db, Job, ActionLog, User
+
+jobs_bp = Blueprint('jobs', __name__)
+
+@jobs_bp.route('', methods=['GET'])
+@jwt_required()
+def list_jobs():
+    """Lista los jobs, más recientes primero (filtros: status, instance, action)"""
+    try:
+        status = request.args.get('status')
+        instance = request.args.get('instance')
+        action = request.args.get('action')
+        limit = max(1, min(request.args.get('limit', default=50, type=int), 500))
+        
+        query = Job.query
+        if status:
+            query = query.filter(Job.status.in_(status.split(',')))
+        if instance:
+            query = query.filter(Job.instance_name == instance)
+        if action:
+            query = query.filter(Job.action == action)
+        
+        jobs = query.order_by(Job.id.desc()).limit(limit).all()
+        return jsonify({
+            'jobs': job_engine.annotate([job.to_dict() for job in jobs]),
+            'count': len(jobs)
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@jobs_bp.route('/stats', methods=['GET'])
+@jwt_required()
+def get_jobs_stats():
+    """Jobs en cola y en ejecución, y duración/éxito por acción de las últimas horas"""
+    try:
+        hours = max(1, min(request.args.get('hours', default=24, type=int), 24 * 30))
+        return jsonify(job_engine.stats(hours)), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@jobs_bp.route('/queue', methods=['GET'])
+@jwt_required()
+def get_jobs_queue():
+    """Jobs en cola en orden de despacho, con posición, ETA y motivo de espera"""
+    try:
+        queued = job_engine.queue()
+        return jsonify({
+            'jobs': queued,
+            'count': len(queued),
+            'admission': job_engine.pressure()
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@jobs_bp.route('/<int:job_id>', methods=['GET'])
+@jwt_required()
+def get_job(job_id):
+    """Obtiene un job"""
+    try:
+        job = Job.query.get(job_id)
+        if not job:
+            return jsonify({'error': 'Job no encontrado'}), 404
+        return jsonify(job_engine.annotate([job.to_dict()])[0]), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@jobs_bp.route('/<int:job_id>/log', methods=['GET'])
+@jwt_required()
+def get_job_log(job_id):
+    """Log de un job desde un byte
+    
+    Sin `offset` lee desde el principio; con `offset` (e `inode`) solo lo
+    escrito desde ahí. Devuelve como mucho 256 KB por llamada: si `more` es
+    true hay que volver a pedir con el `offset` devuelto.
+    """
+    try:
+        job = Job.query.get(job_id)
+        if not job:
+            return jsonify({'error': 'Job no encontrado'}), 404
+        
+        offset = request.args.get('offset', default=0, type=int)
+        chunk = read_incremental(job.log_file, offset, request.args.get('inode', type=int))
+        chunk.update({'job_id': job.id, 'status': job.status})
+        return jsonify(chunk), 200
+    except Exception as e:
+        return jsonify({'error': f'Error leyendo log: {e}'}), 500
+
+@jobs_bp.route('/<int:job_id>/cancel', methods=['POST'])
+@jwt_required()
+def cancel_job(job_id):
+    """Cancela un job encolado o termina uno en ejecución (SIGTERM al grupo)"""
+    user_id = int(get_jwt_identity())
+    user = User.query.get(user_id)
+    
+    # Verificar permisos
+    if user.role not in ['admin', 'developer']:
+        return jsonify({'error': 'Permisos insuficientes'}), 403
+    
+    try:
+        result = job_engine.cancel(job_id)
+        
+        job = result.get('job') or {}
+        db.session.add(ActionLog(
+            user_id=user_id,
+            action='cancel_job',
+            instance_name=job.get('instance_name'),
+            details=result.get('message') or result.get('error'),
+            status='success' if result['success'] else 'error'
+        ))
+        db.session.commit()
+        
+        if result['success']:
+            return jsonify(result), 200
+        return jsonify(result), 404 if result['error'] == 'Job no encontrado' else 409
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
@@ -1,69 +1,291 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, Response, current_app
 from flask_jwt_extended import jwt_required
-from datetime import datetime, timedelta
-from services.system_monitor import SystemMonitor
-from models import db, MetricsHistory
+from datetime import datetime, timedelta, timezone
+import time
+from services.system_monitor import sampler, metrics_delta
+from services.metrics_rollup import MetricsRollupManager
+from services.metrics_writer import metrics_writer
+from services.metrics_encoding import negotiate, respond, rows_to_columns
+from services.sse import sse_event, SSE_HEADERS, stream_token_required
+from models import InstanceMetricsHistory, NginxMetricsHistory, AlertEvent
 
 metrics_bp = Blueprint('metrics', __name__)
-monitor = SystemMonitor()
+rollup_manager = MetricsRollupManager()
+
+QUERY_AGGREGATIONS = ('avg', 'min', 'max', 'p95')
+QUERY_DEFAULT_BUCKETS = 300
 
 @metrics_bp.route('/current', methods=['GET'])
 @jwt_required()
 def get_current_metrics():
-    """Obtiene las métricas actuales del sistema"""
+    """Obtiene las métricas actuales del sistema (último snapshot del muestreador)"""
     try:
-        metrics = monitor.get_all_metrics()
+        metrics = sampler.get_snapshot()
         return jsonify(metrics), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@metrics_bp.route('/stream', methods=['GET'])
+@stream_token_required
+def stream_metrics():
+    """Stream SSE de métricas en vivo
+    
+    Al conectar envía un evento `snapshot` con la muestra completa y luego un
+    evento `delta` por cada muestra nueva con solo los campos que cambiaron.
+    EventSource no permite cabeceras: se autentica con un token de stream en
+    el query string (?jwt=..., ver POST /api/auth/stream-token). La conexión
+    se cierra tras METRICS_STREAM_MAX_SECONDS y el cliente reconecta con un
+    token nuevo.
+    
+    Requiere workers de gunicorn con hilos (gthread) o asíncronos: cada
+    cliente conectado ocupa un hilo mientras dura el stream.
+    """
+    max_seconds = current_app.config.get('METRICS_STREAM_MAX_SECONDS', 600)
+    heartbeat = current_app.config.get('METRICS_STREAM_HEARTBEAT', 15)
+    
+    def generate():
+        deadline = time.monotonic() + max_seconds
+        # Versión y muestra leídas juntas: el primer delta parte de esta muestra
+        version, snapshot = sampler.get_versioned_snapshot()
+        yield 'retry: 2000\n\n'
+        yield sse_event('snapshot', snapshot, version)
+        
+        while time.monotonic() < deadline:
+            new_version, current = sampler.wait_for_update(version, timeout=heartbeat)
+            if new_version == version or current is None:
+                # Comentario SSE para mantener viva la conexión a través de proxies
+                yield ': keepalive\n\n'
+                continue
+            
+            delta = metrics_delta(snapshot, current)
+            version, snapshot = new_version, current
+            if delta:
+                yield sse_event('delta', delta, version)
+    
+    return Response(generate(), mimetype='text/event-stream', headers=SSE_HEADERS)
+
 @metrics_bp.route('/history', methods=['GET'])
 @jwt_required()
 def get_metrics_history():
-    """Obtiene el historial de métricas"""
+    """Obtiene el historial de métricas
+    
+    Según la ventana pedida se lee de los datos crudos o del nivel de
+    agregación (1m, 15m, 1h) que la cubre con una cantidad acotada de filas.
+    Los niveles agregados devuelven el promedio en cada campo y además
+    `<campo>_min` / `<campo>_max`.
+    
+    Con `Accept: application/vnd.serverpanel.columnar+json` (o MessagePack si
+    está instalado) devuelve la serie columnar compacta.
+    """
     try:
         # Parámetros
         minutes = request.args.get('minutes', default=60, type=int)
-        limit = min(minutes, 1440)  # Máximo 24 horas
+        minutes = max(1, min(minutes, 365 * 24 * 60))  # Máximo 1 año
         
-        # Calcular timestamp de inicio
-        start_time = datetime.utcnow() - timedelta(minutes=limit)
+        # Elegir nivel según la ventana
+        tier = rollup_manager.choose_tier(minutes * 60)
+        start_time = datetime.utcnow() - timedelta(minutes=minutes)
+        rows = [m.to_dict() for m in rollup_manager.query(tier, start_time)]
         
-        # Consultar historial
-        metrics = MetricsHistory.query.filter(
-            MetricsHistory.timestamp >= start_time
-        ).order_by(MetricsHistory.timestamp.desc()).limit(limit).all()
+        fmt = negotiate(request.accept_mimetypes)
+        timestamps = columns = None
+        if fmt != 'json':
+            fields = [k for k in (rows[0] if rows else {}) if k != 'timestamp']
+            timestamps, columns = rows_to_columns(rows, fields)
+        return respond(fmt, {
+            'metrics': rows,
+            'count': len(rows),
+            'resolution': tier.name
+        }, timestamps, columns, resolution=tier.name), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def _parse_time(value, default):
+    """Acepta epoch en segundos o ISO 8601 (UTC); None -> default"""
+    if value in (None, ''):
+        return default
+    try:
+        return datetime.utcfromtimestamp(float(value))
+    except ValueError:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        return parsed
+
+@metrics_bp.route('/query', methods=['GET'])
+@jwt_required()
+def query_metrics():
+    """Serie temporal agregada en buckets, en formato columnar
+    
+    Parámetros:
+        from, to: epoch o ISO 8601 (por defecto la última hora)
+        step: segundos por bucket (por defecto ~300 buckets en la ventana)
+        fields: lista separada por comas (por defecto cpu_percent,ram_percent,disk_percent)
+        agg: avg | min | max | p95
+    
+    El GROUP BY se hace en la base, sobre el nivel de agregación más grueso
+    que respeta el step pedido. Admite las mismas codificaciones compactas
+    que /history según el Accept.
+    """
+    try:
+        try:
+            end = _parse_time(request.args.get('to'), datetime.utcnow())
+            start = _parse_time(request.args.get('from'), end - timedelta(hours=1))
+        except ValueError:
+            return jsonify({'error': 'from/to deben ser epoch o ISO 8601'}), 400
+        if start >= end:
+            return jsonify({'error': 'from debe ser anterior a to'}), 400
+        
+        window = (end - start).total_seconds()
+        step = request.args.get('step', type=int) or max(10, int(window // QUERY_DEFAULT_BUCKETS))
+        if step < 1:
+            return jsonify({'error': 'step debe ser mayor a 0'}), 400
+        if window / step > rollup_manager.max_points:
+            return jsonify({
+                'error': f'Demasiados buckets ({int(window / step)}); máximo {rollup_manager.max_points}'
+            }), 400
+        
+        fields = [f.strip() for f in request.args.get('fields', 'cpu_percent,ram_percent,disk_percent').split(',') if f.strip()]
+        invalid = [f for f in fields if f not in rollup_manager.FIELDS]
+        if not fields or invalid:
+            return jsonify({
+                'error': f'Campos inválidos: {", ".join(invalid)}' if invalid else 'Debe indicar al menos un campo',
+                'available_fields': rollup_manager.FIELDS
+            }), 400
         
+        agg = request.args.get('agg', 'avg')
+        if agg not in QUERY_AGGREGATIONS:
+            return jsonify({'error': f'agg debe ser uno de: {", ".join(QUERY_AGGREGATIONS)}'}), 400
+        
+        result = rollup_manager.bucketed_query(start, end, step, fields, agg)
+        meta = {
+            'from': int(start.replace(tzinfo=timezone.utc).timestamp()),
+            'to': int(end.replace(tzinfo=timezone.utc).timestamp()),
+            'step': step,
+            'agg': agg,
+            'resolution': result['resolution']
+        }
+        columns = {field: result[field] for field in fields}
+        return respond(negotiate(request.accept_mimetypes), dict(
+            meta,
+            count=len(result['timestamps']),
+            timestamps=result['timestamps'],
+            fields=columns
+        ), result['timestamps'], columns, **meta), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@metrics_bp.route('/instances', methods=['GET'])
+@jwt_required()
+def get_instances_metrics():
+    """Consumo actual por instancia (CPU, memoria, RSS, IO) leído de cgroup v2"""
+    try:
+        snapshot = sampler.get_snapshot()
+        instances = snapshot.get('instances', {})
         return jsonify({
-            'metrics': [m.to_dict() for m in reversed(metrics)],
-            'count': len(metrics)
+            'instances': instances,
+            'count': len(instances),
+            'timestamp': snapshot.get('timestamp')
         }), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@metrics_bp.route('/save', methods=['POST'])
-def save_current_metrics():
-    """Guarda las métricas actuales en el historial (llamado por cron)"""
+@metrics_bp.route('/instances/<instance_name>/history', methods=['GET'])
+@jwt_required()
+def get_instance_metrics_history(instance_name):
+    """Historial de consumo de una instancia"""
     try:
-        metrics = monitor.get_all_metrics()
+        minutes = request.args.get('minutes', default=60, type=int)
+        minutes = max(1, min(minutes, 30 * 24 * 60))  # Máximo 30 días
+        start_time = datetime.utcnow() - timedelta(minutes=minutes)
+        
+        metrics = InstanceMetricsHistory.query.filter(
+            InstanceMetricsHistory.instance_name == instance_name,
+            InstanceMetricsHistory.timestamp >= start_time
+        ).order_by(InstanceMetricsHistory.timestamp.asc()).all()
         
-        # Crear registro
-        history = MetricsHistory(
-            cpu_percent=metrics['cpu']['percent'],
-            ram_percent=metrics['memory']['percent'],
-            ram_used_gb=metrics['memory']['used_gb'],
-            ram_total_gb=metrics['memory']['total_gb'],
-            disk_percent=metrics['disk'][0]['percent'] if metrics['disk'] else None,
-            disk_used_gb=metrics['disk'][0]['used_gb'] if metrics['disk'] else None,
-            disk_total_gb=metrics['disk'][0]['total_gb'] if metrics['disk'] else None,
-            network_sent_mb=metrics['network']['mb_sent'],
-            network_recv_mb=metrics['network']['mb_recv']
-        )
+        return jsonify({
+            'instance': instance_name,
+            'metrics': [m.to_dict() for m in metrics],
+            'count': len(metrics)
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@metrics_bp.route('/nginx', methods=['GET'])
+@jwt_required()
+def get_nginx_metrics():
+    """Tráfico por dominio de la última ventana cerrada (peticiones/s, errores, latencias)"""
+    try:
+        nginx = sampler.get_snapshot().get('nginx') or {}
+        return jsonify({
+            'window_seconds': nginx.get('window_seconds'),
+            'window_end': nginx.get('window_end'),
+            'domains': nginx.get('domains', {})
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@metrics_bp.route('/nginx/<instance_name>/history', methods=['GET'])
+@jwt_required()
+def get_nginx_metrics_history(instance_name):
+    """Historial de tráfico de una instancia (una fila por ventana y dominio)"""
+    try:
+        minutes = request.args.get('minutes', default=60, type=int)
+        minutes = max(1, min(minutes, 30 * 24 * 60))  # Máximo 30 días
+        start_time = datetime.utcnow() - timedelta(minutes=minutes)
         
-        db.session.add(history)
-        db.session.commit()
+        metrics = NginxMetricsHistory.query.filter(
+            NginxMetricsHistory.instance_name == instance_name,
+            NginxMetricsHistory.timestamp >= start_time
+        ).order_by(NginxMetricsHistory.timestamp.asc()).all()
         
-        return jsonify({'message': 'Métricas guardadas', 'id': history.id}), 201
+        return jsonify({
+            'instance': instance_name,
+            'metrics': [m.to_dict() for m in metrics],
+            'count': len(metrics)
+        }), 200
     except Exception as e:
-        db.session.rollback()
         return jsonify({'error': str(e)}), 500
+
+@metrics_bp.route('/alerts', methods=['GET'])
+@jwt_required()
+def get_alerts():
+    """Alertas activas (del último snapshot) y reglas configuradas"""
+    try:
+        from services.alert_engine import alert_engine
+        active = sampler.get_snapshot().get('alerts', [])
+        return jsonify({
+            'active': active,
+            'count': len(active),
+            'rules': [rule.to_dict() for rule in alert_engine.rules]
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@metrics_bp.route('/alerts/events', methods=['GET'])
+@jwt_required()
+def get_alert_events():
+    """Historial de eventos de alerta (firing/resolved), más recientes primero"""
+    try:
+        limit = max(1, min(request.args.get('limit', default=100, type=int), 1000))
+        query = AlertEvent.query
+        if request.args.get('rule'):
+            query = query.filter(AlertEvent.rule == request.args.get('rule'))
+        events = query.order_by(AlertEvent.timestamp.desc()).limit(limit).all()
+        return jsonify({'events': [e.to_dict() for e in events], 'count': len(events)}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@metrics_bp.route('/save', methods=['POST'])
+def save_current_metrics():
+    """Obsoleto: el historial lo guarda el escritor en lote dentro del proceso
+    
+    Se mantiene para que los cron existentes no fallen; no vuelve a medir ni
+    escribe filas (evita duplicados con el escritor).
+    """
+    return jsonify({
+        'message': 'Las métricas se guardan automáticamente; este endpoint ya no es necesario',
+        'deprecated': True,
+        'pending': metrics_writer.pending()
+    }), 200
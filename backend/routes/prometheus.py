@@ -0,0 +1,36 @@
+import hmac
+from flask import Blueprint, jsonify, request, Response, current_app
+from services.prometheus_exporter import exporter, OPENMETRICS_CONTENT_TYPE, TEXT_CONTENT_TYPE
+
+prometheus_bp = Blueprint('prometheus', __name__)
+
+LOCAL_ADDRESSES = ('127.0.0.1', '::1')
+
+def _scrape_allowed():
+    """Con PROMETHEUS_TOKEN se exige el Bearer token; sin él, solo scrapes locales directos"""
+    token = current_app.config.get('PROMETHEUS_TOKEN')
+    if token:
+        auth = request.headers.get('Authorization', '')
+        return hmac.compare_digest(auth, f'Bearer {token}')
+    # Un pedido reenviado por nginx también llega desde 127.0.0.1: se rechaza
+    proxied = request.headers.get('X-Forwarded-For') or request.headers.get('X-Real-IP')
+    return request.remote_addr in LOCAL_ADDRESSES and not proxied
+
+@prometheus_bp.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Métricas en formato OpenMetrics (o texto 0.0.4 según Accept)
+    
+    El texto se genera una vez por muestra del muestreador y se sirve desde
+    caché. Requiere PROMETHEUS_TOKEN como Bearer token; si no está
+    configurado solo se aceptan pedidos directos desde localhost.
+    """
+    if not _scrape_allowed():
+        return jsonify({'error': 'No autorizado'}), 401
+    
+    try:
+        openmetrics = 'application/openmetrics-text' in request.headers.get('Accept', '')
+        body = exporter.render(openmetrics=openmetrics)
+        content_type = OPENMETRICS_CONTENT_TYPE if openmetrics else TEXT_CONTENT_TYPE
+        return Response(body, content_type=content_type)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Encola el backup programado de una instancia en el job engine
+
+Lo llama el crontab que arma BackupManagerV2._update_crontab: así los
+backups automáticos pasan por la misma cola que los manuales (límite de la
+clase db, control de carga e IO-wait y prioridad configurada de la
+instancia) en vez de correr backup-instance.sh directo desde cron.
+
+Uso: run_scheduled_backup.py <instancia>
+"""
+import sys
+import os
+
+# Agregar el directorio backend al path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app
+from services.backup_manager_v2 import BackupManagerV2
+
+def main():
+    if len(sys.argv) != 2:
+        print("Uso: run_scheduled_backup.py <instancia>")
+        return 1
+    
+    instance_name = sys.argv[1]
+    app = create_app()
+    with app.app_context():
+        result = BackupManagerV2().create_backup(instance_name)
+    
+    if not result['success']:
+        print(f"❌ Backup programado de {instance_name} no encolado: {result['error']}")
+        return 1
+    print(f"✅ Backup programado de {instance_name} encolado (job {result['job_id']}, "
+          f"posición {result.get('queue_position') or '-'})")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
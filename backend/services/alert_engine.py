@@ -0,0 +1,380 @@
+import json
+import time
+import queue
+import logging
+import operator
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+OPERATORS = {
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le
+}
+
+# Puntos por ventana: fija la memoria de cada serie sin importar su duración
+WINDOW_POINTS = 360
+
+DEFAULT_RULES = [
+    {
+        'name': 'disk_full', 'metric': 'disk_percent', 'type': 'threshold',
+        'op': '>', 'threshold': 90, 'for': 300, 'severity': 'critical'
+    },
+    {
+        'name': 'instance_rss_growth', 'metric': 'instance_rss_mb', 'type': 'rate',
+        'op': '>', 'threshold': 50, 'window': 3600, 'severity': 'warning'
+    },
+    {
+        'name': 'cpu_p95_high', 'metric': 'cpu_percent', 'type': 'percentile', 'percentile': 95,
+        'op': '>', 'threshold': 85, 'window': 900, 'severity': 'warning'
+    }
+]
+
+
+def extract_metric(snapshot, metric):
+    """Valores de una métrica del snapshot por sujeto
+    
+    Returns:
+        dict: sujeto (host, punto de montaje o instancia) -> valor
+    """
+    if metric == 'cpu_percent':
+        return {'host': snapshot.get('cpu', {}).get('percent')}
+    if metric == 'ram_percent':
+        return {'host': snapshot.get('memory', {}).get('percent')}
+    if metric == 'swap_percent':
+        return {'host': snapshot.get('memory', {}).get('swap_percent')}
+    if metric == 'disk_percent':
+        return {d['mountpoint']: d.get('percent') for d in snapshot.get('disk', [])}
+    if metric.startswith('instance_'):
+        field = metric[len('instance_'):]
+        return {name: usage.get(field) for name, usage in (snapshot.get('instances') or {}).items()}
+    return {}
+
+
+class RingBuffer:
+    """Ventana de (instante, valor) de tamaño fijo
+    
+    Solo guarda un punto cada `spacing` segundos, así una ventana de una hora
+    ocupa lo mismo que una de cinco minutos.
+    """
+    
+    def __init__(self, capacity, spacing=0):
+        self._items = deque(maxlen=capacity)
+        self.spacing = spacing
+    
+    def append(self, t, value):
+        if self._items and t - self._items[-1][0] < self.spacing:
+            return
+        self._items.append((t, value))
+    
+    def window(self, seconds, now):
+        """Puntos dentro de los últimos `seconds` segundos"""
+        start = now - seconds
+        return [item for item in self._items if item[0] >= start]
+    
+    def oldest(self):
+        return self._items[0][0] if self._items else None
+    
+    def latest(self):
+        return self._items[-1] if self._items else None
+
+
+class AlertRule:
+    """Regla evaluada sobre una ventana deslizante
+    
+    Tipos:
+        threshold: todos los puntos de los últimos `for` segundos cumplen la
+            condición (p. ej. disco > 90% durante 5 minutos)
+        rate: pendiente (unidades por hora, mínimos cuadrados) dentro de `window`
+        percentile: percentil `percentile` de los puntos de `window`
+    """
+    
+    TYPES = ('threshold', 'rate', 'percentile')
+    
+    def __init__(self, name, metric, type='threshold', op='>', threshold=0, severity='warning',
+                 subject=None, percentile=95, window=None, **kwargs):
+        if type not in self.TYPES:
+            raise ValueError(f"Tipo de regla inválido: {type}")
+        if op not in OPERATORS:
+            raise ValueError(f"Operador inválido: {op}")
+        self.name = name
+        self.metric = metric
+        self.type = type
+        self.op = op
+        self.threshold = float(threshold)
+        self.severity = severity
+        self.subject = subject  # None = todos los sujetos de la métrica
+        self.percentile = percentile
+        self.window = float(kwargs.get('for') or window or 300)
+    
+    def to_dict(self):
+        data = {
+            'name': self.name, 'metric': self.metric, 'type': self.type, 'op': self.op,
+            'threshold': self.threshold, 'severity': self.severity, 'subject': self.subject
+        }
+        data['for' if self.type == 'threshold' else 'window'] = self.window
+        if self.type == 'percentile':
+            data['percentile'] = self.percentile
+        return data
+    
+    def new_buffer(self):
+        return RingBuffer(WINDOW_POINTS + 1, spacing=self.window / WINDOW_POINTS)
+    
+    def evaluate(self, buffer, now, tolerance):
+        """Evalúa la regla sobre la ventana
+        
+        Returns:
+            (bool, float) si la condición se cumple y el valor calculado, o
+            None si todavía no hay datos suficientes para decidir
+        """
+        points = buffer.window(self.window, now)
+        if not points:
+            return None
+        compare = OPERATORS[self.op]
+        covered = buffer.oldest() <= now - self.window + tolerance
+        
+        if self.type == 'threshold':
+            latest = points[-1][1]
+            if not compare(latest, self.threshold):
+                return False, latest
+            if not covered:
+                return None
+            return all(compare(v, self.threshold) for _, v in points), latest
+        
+        if not covered or len(points) < 2:
+            return None
+        
+        if self.type == 'rate':
+            value = self._slope_per_hour(points)
+        else:
+            value = self._percentile(sorted(v for _, v in points), self.percentile / 100)
+        return compare(value, self.threshold), round(value, 2)
+    
+    @staticmethod
+    def _slope_per_hour(points):
+        """Pendiente por mínimos cuadrados en unidades por hora"""
+        t0 = points[0][0]
+        xs = [t - t0 for t, _ in points]
+        ys = [v for _, v in points]
+        mean_x = sum(xs) / len(xs)
+        mean_y = sum(ys) / len(ys)
+        var_x = sum((x - mean_x) ** 2 for x in xs)
+        if var_x == 0:
+            return 0.0
+        cov = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+        return cov / var_x * 3600
+    
+    @staticmethod
+    def _percentile(values, quantile):
+        position = (len(values) - 1) * quantile
+        lower = int(position)
+        upper = min(lower + 1, len(values) - 1)
+        return values[lower] + (values[upper] - values[lower]) * (position - lower)
+    
+    def describe(self, subject, value, state='firing'):
+        """Mensaje legible de la alerta"""
+        if state == 'resolved':
+            return f"{self.metric} de {subject} volvió a {value} (regla: {self.op} {self.threshold:g})"
+        if self.type == 'threshold':
+            detail = f"durante {int(self.window)}s"
+        elif self.type == 'rate':
+            detail = f"por hora en los últimos {int(self.window)}s"
+        else:
+            detail = f"(p{self.percentile} de los últimos {int(self.window)}s)"
+        return f"{self.metric} de {subject} = {value} {self.op} {self.threshold:g} {detail}"
+
+
+class AlertNotifier(ABC):
+    """Destino de los eventos de alerta (extender y registrar con add_notifier)"""
+    
+    @abstractmethod
+    def notify(self, event):
+        """Entrega un evento (dict de AlertEvent); los errores solo se loguean"""
+
+
+class LogNotifier(AlertNotifier):
+    """Escribe los eventos en el log de la aplicación"""
+    
+    def notify(self, event):
+        log = logger.warning if event['state'] == 'firing' else logger.info
+        log(f"Alert {event['state']}: [{event['severity']}] {event['rule']} - {event['message']}")
+
+
+class WebhookNotifier(AlertNotifier):
+    """Envía cada evento como JSON por POST a una URL"""
+    
+    def __init__(self, url, timeout=10):
+        self.url = url
+        self.timeout = timeout
+    
+    def notify(self, event):
+        import requests
+        response = requests.post(self.url, json=event, timeout=self.timeout)
+        response.raise_for_status()
+
+
+class AlertEngine:
+    """Evalúa reglas de alerta sobre cada muestra del muestreador
+    
+    Corre como listener del muestreador (solo en el proceso escritor). Cada
+    par regla/sujeto mantiene su ventana en un RingBuffer en memoria; los
+    cambios de estado (firing/resolved) se guardan en alert_events y se envían
+    a los notificadores desde un hilo propio para no demorar el muestreo.
+    Las alertas activas se publican en el snapshot (clave 'alerts').
+    """
+    
+    def __init__(self, rules=None):
+        self.app = None
+        self.rules = [AlertRule(**r) for r in (rules or DEFAULT_RULES)]
+        self.notifiers = [LogNotifier()]
+        self.tolerance = 10
+        self._buffers = {}
+        self._active = {}
+        self._events = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+    
+    def init_app(self, app):
+        """Carga reglas y notificadores desde la configuración"""
+        self.app = app
+        self.tolerance = max(2 * app.config.get('METRICS_SAMPLE_INTERVAL', 2), 5)
+        
+        rules_file = app.config.get('ALERT_RULES_FILE')
+        if rules_file:
+            try:
+                with open(rules_file, 'r') as f:
+                    self.set_rules(json.load(f))
+            except Exception as e:
+                logger.error(f"Error loading alert rules from {rules_file}, using defaults: {e}")
+        
+        if app.config.get('ALERT_WEBHOOK_URL'):
+            self.add_notifier(WebhookNotifier(app.config['ALERT_WEBHOOK_URL']))
+    
+    def set_rules(self, rules):
+        """Reemplaza las reglas (lista de dicts) y descarta las ventanas"""
+        parsed = [AlertRule(**r) for r in rules]
+        with self._lock:
+            self.rules = parsed
+            self._buffers = {}
+            self._active = {}
+    
+    def add_notifier(self, notifier):
+        """Registra un notificador adicional"""
+        self.notifiers.append(notifier)
+    
+    def evaluate(self, snapshot, now=None):
+        """Agrega la muestra a las ventanas y evalúa todas las reglas"""
+        now = now if now is not None else time.time()
+        with self._lock:
+            for rule in self.rules:
+                for subject, value in extract_metric(snapshot, rule.metric).items():
+                    if value is None or (rule.subject and subject != rule.subject):
+                        continue
+                    key = (rule.name, subject)
+                    buffer = self._buffers.get(key)
+                    if buffer is None:
+                        buffer = self._buffers[key] = rule.new_buffer()
+                    buffer.append(now, float(value))
+                    
+                    result = rule.evaluate(buffer, now, self.tolerance)
+                    if result is None:
+                        continue
+                    firing, current = result
+                    if firing and key not in self._active:
+                        self._active[key] = self._event(rule, subject, 'firing', current, now)
+                        self._emit(self._active[key])
+                    elif firing:
+                        self._active[key]['value'] = current
+                    elif not firing and key in self._active:
+                        started = self._active.pop(key)['started_at']
+                        event = self._event(rule, subject, 'resolved', current, now)
+                        event['started_at'] = started
+                        self._emit(event)
+            
+            self._prune(now)
+    
+    def _prune(self, now):
+        """Olvida los sujetos sin datos durante una ventana completa (p. ej.
+        una instancia eliminada); si tenían una alerta activa se resuelve"""
+        rules = {rule.name: rule for rule in self.rules}
+        for key, buffer in list(self._buffers.items()):
+            rule = rules.get(key[0])
+            latest = buffer.latest()
+            if rule is None or latest is None or now - latest[0] <= rule.window + self.tolerance:
+                continue
+            del self._buffers[key]
+            if key in self._active:
+                started = self._active.pop(key)['started_at']
+                event = self._event(rule, key[1], 'resolved', None, now)
+                event['message'] = f"{rule.metric} de {key[1]}: sin datos"
+                event['started_at'] = started
+                self._emit(event)
+    
+    def active(self):
+        """Alertas activas (colector del snapshot)"""
+        with self._lock:
+            return [dict(event) for event in self._active.values()]
+    
+    @staticmethod
+    def _event(rule, subject, state, value, now):
+        return {
+            'rule': rule.name,
+            'subject': subject,
+            'state': state,
+            'severity': rule.severity,
+            'value': value,
+            'threshold': rule.threshold,
+            'message': rule.describe(subject, value, state),
+            'started_at': datetime.utcfromtimestamp(now).isoformat()
+        }
+    
+    def _emit(self, event):
+        """Encola el evento para guardarlo y notificarlo en segundo plano"""
+        self._events.put(dict(event))
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._deliver_loop, name='alert-notifier', daemon=True)
+            self._thread.start()
+    
+    def _deliver_loop(self):
+        while True:
+            event = self._events.get()
+            self._store(event)
+            for notifier in self.notifiers:
+                try:
+                    notifier.notify(event)
+                except Exception as e:
+                    logger.error(f"Error in alert notifier {type(notifier).__name__}: {e}")
+    
+    def _store(self, event):
+        """Guarda el evento en alert_events"""
+        if self.app is None:
+            return
+        from models import db, AlertEvent
+        
+        with self.app.app_context():
+            try:
+                db.session.add(AlertEvent(
+                    rule=event['rule'],
+                    subject=event['subject'],
+                    state=event['state'],
+                    severity=event['severity'],
+                    value=event['value'],
+                    threshold=event['threshold'],
+                    message=event['message'],
+                    started_at=datetime.fromisoformat(event['started_at'])
+                ))
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Error saving alert event: {e}")
+            finally:
+                db.session.remove()
+
+
+# Motor compartido (evalúa en el proceso escritor del muestreador)
+alert_engine = AlertEngine()
@@ -6,6 +6,7 @@ import glob
 import logging
 
 from config import Config
+from services.log_tail import tail_lines
 
 # Configurar logging
 logger = logging.getLogger(__name__)
@@ -186,19 +187,21 @@ class BackupManager:
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
-    def get_backup_log(self):
-        """Obtiene el log del último backup"""
-        log_file = '/tmp/odoo-backup-latest.log'
+    def get_backup_log(self, lines=1000, before=None, inode=None):
+        """Obtiene el log del último backup
         
-        if not os.path.exists(log_file):
-            return {'log': 'No hay log disponible', 'exists': False}
+        Devuelve las últimas `lines` líneas; con `before` (el `start` de una
+        respuesta anterior) e `inode` pagina hacia atrás.
+        """
+        log_file = '/tmp/odoo-backup-latest.log'
         
         try:
-            with open(log_file, 'r') as f:
-                log_content = f.read()
-            return {'log': log_content, 'exists': True}
+            result = tail_lines(log_file, lines, before=before, inode=inode)
         except Exception as e:
             return {'log': f'Error al leer log: {str(e)}', 'exists': False}
+        if not result['exists']:
+            return {'log': 'No hay log disponible', 'exists': False}
+        return result
     
     def restore_backup(self, filename):
         """Restaura un backup de producción"""
@@ -236,19 +239,21 @@ class BackupManager:
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
-    def get_restore_log(self):
-        """Obtiene el log de la última restauración"""
-        log_file = '/tmp/odoo-restore-latest.log'
+    def get_restore_log(self, lines=1000, before=None, inode=None):
+        """Obtiene el log de la última restauración
         
-        if not os.path.exists(log_file):
-            return {'log': 'No hay log de restauración disponible', 'exists': False}
+        Devuelve las últimas `lines` líneas; con `before` (el `start` de una
+        respuesta anterior) e `inode` pagina hacia atrás.
+        """
+        log_file = '/tmp/odoo-restore-latest.log'
         
         try:
-            with open(log_file, 'r') as f:
-                log_content = f.read()
-            return {'log': log_content, 'exists': True}
+            result = tail_lines(log_file, lines, before=before, inode=inode)
         except Exception as e:
             return {'log': f'Error al leer log: {str(e)}', 'exists': False}
+        if not result['exists']:
+            return {'log': 'No hay log de restauración disponible', 'exists': False}
+        return result
     
     def upload_backup(self, file):
         """Sube un archivo de backup (.tar.gz o .zip)"""
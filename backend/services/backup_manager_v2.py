@@ -1,11 +1,15 @@
 import os
+import sys
 import json
 import subprocess
 from datetime import datetime
 import glob
+import fnmatch
 import logging
 
 from config import Config
+from services.log_tail import tail_lines
+from services.job_engine import job_engine
 
 # Configurar logging
 logger = logging.getLogger(__name__)
@@ -97,18 +101,17 @@ class BackupManagerV2:
             json.dump(config, f, indent=2)
     
     def _get_all_production_instances(self):
-        """Obtiene todas las instancias de producción del sistema usando el mismo método que instance_manager"""
+        """Obtiene todas las instancias de producción del sistema desde el registro compartido de instancias"""
         prod_instances = []
         
-        # Importar instance_manager para usar su método de listado
+        # Mismo registro en memoria que usa InstanceManager (sin consultar systemd)
         try:
-            from services.instance_manager import InstanceManager
-            manager = InstanceManager()
-            instances = manager.list_production_instances()
+            from services.instance_manager import shared_registry
+            instances = shared_registry().production()
             
             # Extraer solo los nombres de las instancias
             prod_instances = [inst['name'] for inst in instances]
-            logger.info(f"Found {len(prod_instances)} production instances: {prod_instances}")
+            logger.debug(f"Found {len(prod_instances)} production instances: {prod_instances}")
         except Exception as e:
             logger.error(f"Error getting production instances: {e}")
             # Fallback: buscar en rutas conocidas
@@ -172,6 +175,40 @@ class BackupManagerV2:
             'total_count': len(instances)
         }
     
+    def get_listing_version(self):
+        """Versión barata de list_instances_with_backups (stat, sin leer archivos)
+        
+        Cambia cuando cambian las instancias de producción, se modifica la
+        configuración de una instancia o cambia algún backup: alta, baja o
+        tamaño y mtime (un backup en curso crece sin tocar el mtime del
+        directorio, pero sí el tamaño total del listado).
+        """
+        version = [self._get_all_production_instances()]
+        for path in [self.instances_dir] + [self._get_instance_dir(n) for n in version[0]]:
+            for target in (path, os.path.join(path, 'config.json')):
+                try:
+                    st = os.stat(target)
+                    version.append((st.st_mtime_ns, st.st_size))
+                except OSError:
+                    version.append(None)
+            version.append(sorted(self._backup_file_stats(path)))
+        return version
+    
+    @staticmethod
+    def _backup_file_stats(path):
+        """(nombre, tamaño, mtime) de los backup_*.tar.gz de un directorio"""
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if fnmatch.fnmatch(entry.name, 'backup_*.tar.gz'):
+                        try:
+                            st = entry.stat()
+                        except OSError:
+                            continue
+                        yield entry.name, st.st_size, st.st_mtime_ns
+        except OSError:
+            return
+    
     def get_instance_config(self, instance_name):
         """Obtiene la configuración de una instancia"""
         config = self._load_instance_config(instance_name)
@@ -229,22 +266,20 @@ class BackupManagerV2:
         config = self._load_instance_config(instance_name)
         
         try:
-            # Ejecutar script en background
+            # Encolar el script como job
             log_file = f'/tmp/odoo-backup-{instance_name}-latest.log'
-            cmd = f"/bin/bash {script_path} {instance_name} > {log_file} 2>&1 &"
-            subprocess.Popen(
-                cmd,
-                shell=True,
-                stdin=subprocess.DEVNULL,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-                start_new_session=True
-            )
+            result = job_engine.submit('backup', ['/bin/bash', script_path, instance_name], instance_name,
+                                       log_file=log_file, priority=config.get('priority'))
+            if not result['success']:
+                return result
             
             return {
                 'success': True,
                 'message': f'Backup de {instance_name} iniciado',
-                'log_file': log_file
+                'log_file': log_file,
+                'job_id': result['job']['id'],
+                'queue_position': result['job'].get('queue_position'),
+                'eta_seconds': result['job'].get('eta_seconds')
             }
         except Exception as e:
             logger.error(f"Error creating backup for {instance_name}: {e}")
@@ -316,19 +351,21 @@ class BackupManagerV2:
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
-    def get_backup_log(self, instance_name):
-        """Obtiene el log del último backup de una instancia"""
-        log_file = f'/tmp/odoo-backup-{instance_name}-latest.log'
+    def get_backup_log(self, instance_name, lines=1000, before=None, inode=None):
+        """Obtiene el log del último backup de una instancia
         
-        if not os.path.exists(log_file):
-            return {'log': 'No hay log disponible', 'exists': False}
+        Devuelve las últimas `lines` líneas; con `before` (el `start` de una
+        respuesta anterior) e `inode` pagina hacia atrás.
+        """
+        log_file = f'/tmp/odoo-backup-{instance_name}-latest.log'
         
         try:
-            with open(log_file, 'r') as f:
-                log_content = f.read()
-            return {'log': log_content, 'exists': True}
+            result = tail_lines(log_file, lines, before=before, inode=inode)
         except Exception as e:
             return {'log': f'Error al leer log: {str(e)}', 'exists': False}
+        if not result['exists']:
+            return {'log': 'No hay log disponible', 'exists': False}
+        return result
     
     def restore_backup(self, instance_name, filename):
         """Restaura un backup de una instancia"""
@@ -347,40 +384,40 @@ class BackupManagerV2:
             return {'success': False, 'error': 'Script de restauración no encontrado'}
         
         try:
-            # Ejecutar script de restauración en background
+            # Encolar el script de restauración como job
             log_file = f'/tmp/odoo-restore-{instance_name}-latest.log'
-            cmd = f"/bin/bash {script_path} {instance_name} {backup_path} > {log_file} 2>&1 &"
-            subprocess.Popen(
-                cmd,
-                shell=True,
-                stdin=subprocess.DEVNULL,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-                start_new_session=True
-            )
+            result = job_engine.submit('restore', ['/bin/bash', script_path, instance_name, backup_path], instance_name,
+                                       log_file=log_file, priority=self._load_instance_config(instance_name).get('priority'))
+            if not result['success']:
+                return result
             
             return {
                 'success': True,
                 'message': f'Restauración de {instance_name} iniciada',
                 'log_file': log_file,
-                'backup_file': filename
+                'backup_file': filename,
+                'job_id': result['job']['id'],
+                'queue_position': result['job'].get('queue_position'),
+                'eta_seconds': result['job'].get('eta_seconds')
             }
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
-    def get_restore_log(self, instance_name):
-        """Obtiene el log de la última restauración de una instancia"""
-        log_file = f'/tmp/odoo-restore-{instance_name}-latest.log'
+    def get_restore_log(self, instance_name, lines=1000, before=None, inode=None):
+        """Obtiene el log de la última restauración de una instancia
         
-        if not os.path.exists(log_file):
-            return {'log': 'No hay log de restauración disponible', 'exists': False}
+        Devuelve las últimas `lines` líneas; con `before` (el `start` de una
+        respuesta anterior) e `inode` pagina hacia atrás.
+        """
+        log_file = f'/tmp/odoo-restore-{instance_name}-latest.log'
         
         try:
-            with open(log_file, 'r') as f:
-                log_content = f.read()
-            return {'log': log_content, 'exists': True}
+            result = tail_lines(log_file, lines, before=before, inode=inode)
         except Exception as e:
             return {'log': f'Error al leer log: {str(e)}', 'exists': False}
+        if not result['exists']:
+            return {'log': 'No hay log de restauración disponible', 'exists': False}
+        return result
     
     def get_global_stats(self):
         """Obtiene estadísticas globales de todos los backups"""
@@ -402,9 +439,59 @@ class BackupManagerV2:
             'instances': instances
         }
     
+    def get_backup_metrics(self):
+        """Resumen liviano por instancia para el exportador de métricas
+        
+        Solo lee los directorios de backup existentes (no crea configuración
+        para instancias nuevas).
+        
+        Returns:
+            dict: nombre -> count, total_size_bytes, last_success (epoch del
+                backup más reciente o None), last_backup_status
+        """
+        result = {}
+        if not os.path.exists(self.instances_dir):
+            return result
+        
+        for instance_name in os.listdir(self.instances_dir):
+            instance_dir = self._get_instance_dir(instance_name)
+            if not os.path.isdir(instance_dir):
+                continue
+            
+            sizes = []
+            last_success = None
+            for backup_file in glob.glob(os.path.join(instance_dir, 'backup_*.tar.gz')):
+                try:
+                    stat = os.stat(backup_file)
+                except OSError:
+                    continue
+                sizes.append(stat.st_size)
+                last_success = max(last_success or 0, stat.st_mtime)
+            
+            status = None
+            config_file = self._get_instance_config_file(instance_name)
+            if os.path.exists(config_file):
+                try:
+                    with open(config_file, 'r') as f:
+                        status = json.load(f).get('last_backup_status')
+                except (OSError, ValueError):
+                    pass
+            
+            result[instance_name] = {
+                'count': len(sizes),
+                'total_size_bytes': sum(sizes),
+                'last_success': last_success,
+                'last_backup_status': status
+            }
+        
+        return result
+    
     def _update_crontab(self):
         """Actualiza el crontab con todas las instancias habilitadas"""
         cron_comment = "# Odoo Backups - Managed by API-DEV"
+        # Cron solo encola el backup: corre como job (cola, límites y prioridad)
+        runner_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'run_scheduled_backup.py')
+        # Entradas anteriores que llamaban al script directo
         script_path = os.path.join(self.scripts_path, 'odoo/backup-instance.sh')
         cron_log = os.path.join(self.backup_dir, 'cron.log')
         
@@ -418,13 +505,8 @@ class BackupManagerV2:
         
         # Eliminar líneas antiguas de backups
         lines = []
-        skip_next = False
         for line in current_cron.split('\n'):
-            if cron_comment in line:
-                skip_next = True
-                continue
-            if skip_next and script_path in line:
-                skip_next = False
+            if cron_comment in line or runner_path in line or script_path in line:
                 continue
             if line.strip():
                 lines.append(line)
@@ -438,7 +520,7 @@ class BackupManagerV2:
             for instance in enabled_instances:
                 schedule = instance['schedule']
                 instance_name = instance['name']
-                lines.append(f"{schedule} {script_path} {instance_name} >> {cron_log} 2>&1")
+                lines.append(f"{schedule} {sys.executable} {runner_path} {instance_name} >> {cron_log} 2>&1")
         
         # Escribir nuevo crontab
         new_cron = '\n'.join(lines) + '\n'
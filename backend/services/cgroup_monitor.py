@@ -0,0 +1,191 @@
+import os
+import time
+import logging
+import psutil
+
+logger = logging.getLogger(__name__)
+
+
+class CgroupMonitor:
+    """Consumo de recursos por servicio systemd leído de cgroup v2
+    
+    Lee `cpu.stat`, `memory.current`, `memory.stat` e `io.stat` del cgroup de
+    cada unidad y calcula CPU% e IO por segundo contra la lectura anterior.
+    La raíz es configurable para poder apuntarla a un árbol sysfs falso.
+    """
+    
+    def __init__(self, cgroup_root='/sys/fs/cgroup', slice_name='system.slice'):
+        self.cgroup_root = cgroup_root
+        self.slice_name = slice_name
+        self.cpu_count = psutil.cpu_count() or 1
+        self._last = {}
+    
+    def unit_path(self, service):
+        """Ruta del cgroup de una unidad systemd"""
+        unit = service if service.endswith('.service') else f'{service}.service'
+        return os.path.join(self.cgroup_root, self.slice_name, unit)
+    
+    @staticmethod
+    def _read_keyed(path):
+        """Lee un archivo 'clave valor' por línea (cpu.stat, memory.stat)"""
+        values = {}
+        with open(path, 'r') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 2:
+                    values[parts[0]] = int(parts[1])
+        return values
+    
+    @staticmethod
+    def _read_io(path):
+        """Suma rbytes/wbytes de todos los dispositivos de io.stat"""
+        rbytes = wbytes = 0
+        with open(path, 'r') as f:
+            for line in f:
+                for field in line.split()[1:]:
+                    key, _, value = field.partition('=')
+                    if key == 'rbytes':
+                        rbytes += int(value)
+                    elif key == 'wbytes':
+                        wbytes += int(value)
+        return rbytes, wbytes
+    
+    def read_unit(self, service):
+        """Lee los contadores crudos de una unidad (None si no tiene cgroup)"""
+        path = self.unit_path(service)
+        if not os.path.isdir(path):
+            return None
+        
+        counters = {'cpu_usage_usec': None, 'memory_bytes': None, 'rss_bytes': None,
+                    'io_read_bytes': None, 'io_write_bytes': None}
+        try:
+            counters['cpu_usage_usec'] = self._read_keyed(os.path.join(path, 'cpu.stat')).get('usage_usec')
+        except (OSError, ValueError):
+            pass
+        try:
+            with open(os.path.join(path, 'memory.current'), 'r') as f:
+                counters['memory_bytes'] = int(f.read().strip())
+        except (OSError, ValueError):
+            pass
+        try:
+            counters['rss_bytes'] = self._read_keyed(os.path.join(path, 'memory.stat')).get('anon')
+        except (OSError, ValueError):
+            pass
+        try:
+            counters['io_read_bytes'], counters['io_write_bytes'] = self._read_io(os.path.join(path, 'io.stat'))
+        except (OSError, ValueError):
+            pass
+        return counters
+    
+    def collect(self, services):
+        """Calcula el consumo actual de cada instancia
+        
+        Args:
+            services: dict nombre de instancia -> servicio systemd
+        
+        Returns:
+            dict: nombre -> cpu_percent (del total del host), cpu_cores,
+                memory_mb, rss_mb, io_read_mb_s, io_write_mb_s
+        """
+        now = time.monotonic()
+        result = {}
+        current = {}
+        
+        for name, service in services.items():
+            if not service:
+                continue
+            counters = self.read_unit(service)
+            if counters is None:
+                continue
+            current[name] = (now, counters)
+            
+            usage = {
+                'service': service,
+                'cpu_percent': None,
+                'cpu_cores': None,
+                'memory_mb': self._mb(counters['memory_bytes']),
+                'rss_mb': self._mb(counters['rss_bytes']),
+                'io_read_mb_s': None,
+                'io_write_mb_s': None
+            }
+            
+            previous = self._last.get(name)
+            if previous:
+                elapsed = now - previous[0]
+                last = previous[1]
+                if elapsed > 0:
+                    cpu_delta = self._delta(counters, last, 'cpu_usage_usec')
+                    if cpu_delta is not None:
+                        cores = cpu_delta / (elapsed * 1_000_000)
+                        usage['cpu_cores'] = round(cores, 3)
+                        usage['cpu_percent'] = round(cores / self.cpu_count * 100, 2)
+                    for key, out in (('io_read_bytes', 'io_read_mb_s'), ('io_write_bytes', 'io_write_mb_s')):
+                        io_delta = self._delta(counters, last, key)
+                        if io_delta is not None:
+                            usage[out] = round(io_delta / elapsed / (1024 ** 2), 3)
+            
+            result[name] = usage
+        
+        # Las instancias que desaparecen se olvidan
+        self._last = current
+        return result
+    
+    @staticmethod
+    def _delta(current, previous, key):
+        """Diferencia entre contadores (None si falta alguno o se reinició)"""
+        if current.get(key) is None or previous.get(key) is None:
+            return None
+        delta = current[key] - previous[key]
+        return delta if delta >= 0 else None
+    
+    @staticmethod
+    def _mb(value):
+        """Bytes a MB redondeado"""
+        return round(value / (1024 ** 2), 2) if value is not None else None
+
+
+class InstanceResourceCollector:
+    """Colector del muestreador: consumo por instancia Odoo
+    
+    Obtiene el mapa instancia -> servicio del InstanceManager (sin consultar
+    systemctl) y lo refresca cada `refresh_interval` segundos.
+    """
+    
+    def __init__(self, refresh_interval=60):
+        self.app = None
+        self.monitor = None
+        self.refresh_interval = refresh_interval
+        self._services = {}
+        self._services_at = 0
+    
+    def init_app(self, app):
+        """Toma la configuración de la app"""
+        self.app = app
+        self.monitor = CgroupMonitor(
+            cgroup_root=app.config.get('CGROUP_ROOT', '/sys/fs/cgroup'),
+            slice_name=app.config.get('CGROUP_SLICE', 'system.slice')
+        )
+    
+    def _refresh_services(self):
+        """Actualiza el mapa de servicios de las instancias"""
+        from services.instance_manager import InstanceManager
+        
+        with self.app.app_context():
+            instances = InstanceManager().list_instances(with_status=False)
+        self._services = {i['name']: i['service'] for i in instances if i.get('service')}
+        self._services_at = time.monotonic()
+    
+    def __call__(self):
+        if self.app is None:
+            return {}
+        if time.monotonic() - self._services_at > self.refresh_interval:
+            try:
+                self._refresh_services()
+            except Exception as e:
+                logger.error(f"Error discovering instance services: {e}")
+                self._services_at = time.monotonic()
+        return self.monitor.collect(self._services)
+
+
+# Colector compartido (lo invoca el muestreador en el proceso escritor)
+instance_resources = InstanceResourceCollector()
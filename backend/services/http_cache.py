@@ -0,0 +1,25 @@
+import hashlib
+from flask import request, jsonify, Response
+
+
+def make_etag(*parts):
+    """ETag corto a partir de valores baratos de calcular (generaciones, estados, mtimes)"""
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()[:24]
+
+
+def not_modified(etag):
+    """Respuesta 304 si el cliente ya tiene esta versión (If-None-Match), si no None"""
+    if etag in request.if_none_match:
+        response = Response(status=304)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return None
+
+
+def json_with_etag(payload, etag):
+    """jsonify con ETag; no-cache obliga al navegador a revalidar en cada pedido"""
+    response = jsonify(payload)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
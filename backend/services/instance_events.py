@@ -0,0 +1,245 @@
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+
+from services.metrics_store import SharedMetricsStore
+
+logger = logging.getLogger(__name__)
+
+# Campos del estado de una instancia cuyo cambio genera un evento
+TRACKED_FIELDS = ('status', 'active_state')
+
+
+def proc_start_time(pid):
+    """Momento de inicio del proceso (ticks desde el arranque) o None si no existe o es zombie"""
+    try:
+        with open(f'/proc/{pid}/stat', 'r') as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # El nombre del comando va entre paréntesis y puede contener espacios
+    fields = stat[stat.rindex(')') + 2:].split()
+    if fields[0] == 'Z':
+        return None
+    return int(fields[19])
+
+
+class OperationTracker:
+    """Operaciones en segundo plano lanzadas por el panel (creación, update-db...)
+    
+    Los scripts se lanzan desacoplados desde cualquier worker (hoy como jobs
+    del job engine, que registra cada uno al lanzarlo), así que cada
+    operación queda registrada en un archivo JSON dentro de `directory`; el
+    proceso escritor revisa en cada ciclo si el proceso terminó. Se guarda el
+    momento de inicio del proceso para no confundirlo con otro que reutilice
+    el mismo PID.
+    """
+    
+    def __init__(self, directory=None):
+        self.directory = directory
+    
+    def init_app(self, app):
+        """Ubica el directorio junto al segmento de métricas"""
+        base = app.config.get('METRICS_SHM_PATH') or SharedMetricsStore.default_path()
+        self.directory = f'{base}-operations'
+    
+    def register(self, instance, action, pid, log_file=None, status_file=None, job_id=None):
+        """Registra una operación recién lanzada (los errores solo se loguean)"""
+        if not self.directory:
+            return None
+        operation = {
+            'id': uuid.uuid4().hex[:12],
+            'instance': instance,
+            'action': action,
+            'pid': pid,
+            'start_time': proc_start_time(pid),
+            'log_file': log_file,
+            'status_file': status_file,
+            'job_id': job_id,
+            'started_at': time.time()
+        }
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"{operation['id']}.json")
+            with open(f'{path}.tmp', 'w') as f:
+                json.dump(operation, f)
+            os.replace(f'{path}.tmp', path)
+        except OSError as e:
+            logger.error(f"Cannot register operation {action} of {instance}: {e}")
+            return None
+        return operation
+    
+    def running(self):
+        """Operaciones registradas (terminadas o no)"""
+        if not self.directory or not os.path.isdir(self.directory):
+            return []
+        operations = []
+        for filename in os.listdir(self.directory):
+            if not filename.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, filename), 'r') as f:
+                    operations.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return operations
+    
+    @staticmethod
+    def _read_status(operation):
+        """Estado final informado por el script (archivo .status), si lo hay"""
+        if not operation.get('status_file'):
+            return None
+        try:
+            with open(operation['status_file'], 'r') as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+    
+    def collect_finished(self):
+        """Quita y devuelve las operaciones cuyo proceso ya terminó
+        
+        Las lanzadas como job toman estado, código de salida y duración de la
+        fila del job, una vez que el job engine la cerró.
+        """
+        from services.job_engine import job_engine
+        
+        finished = []
+        for operation in self.running():
+            start_time = proc_start_time(operation['pid'])
+            if start_time is not None and start_time == operation.get('start_time'):
+                continue
+            operation['finished_at'] = time.time()
+            if operation.get('job_id') is not None:
+                result = job_engine.job_result(operation['job_id'])
+                if result is None:
+                    continue  # El job engine aún no registró el fin
+                operation.update(result)
+            else:
+                operation['status'] = self._read_status(operation)
+            try:
+                os.remove(os.path.join(self.directory, f"{operation['id']}.json"))
+            except OSError:
+                pass
+            finished.append(operation)
+        return finished
+
+
+class InstanceEventCollector:
+    """Colector del muestreador: cambios de instancias como eventos numerados
+    
+    En el proceso escritor compara cada `poll_interval` segundos el estado de
+    las instancias (registro + una sola consulta a systemd) con el anterior y
+    genera un evento por alta, baja o cambio de ActiveState, más uno por cada
+    operación en segundo plano que termina. Los últimos `max_events` eventos
+    viajan en el snapshot compartido (clave 'instance_events'); los streams
+    SSE de todos los workers solo reenvían los que aún no mandaron.
+    
+    `source` permite reemplazar la lectura de estados (p.ej. por una
+    suscripción D-Bus): función sin argumentos que devuelve nombre -> estado.
+    """
+    
+    def __init__(self, poll_interval=2, max_events=100, tracker=None, source=None):
+        self.app = None
+        self.poll_interval = poll_interval
+        self.max_events = max_events
+        self.tracker = tracker
+        self.source = source
+        self._states = None
+        self._events = []
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._polled_at = 0
+    
+    def init_app(self, app):
+        """Toma la configuración de la app"""
+        self.app = app
+        self.poll_interval = app.config.get('INSTANCE_EVENTS_POLL_INTERVAL', self.poll_interval)
+        self.max_events = app.config.get('INSTANCE_EVENTS_BUFFER', self.max_events)
+    
+    def _read_states(self):
+        """Estado actual de las instancias: nombre -> campos relevantes"""
+        if self.source is not None:
+            return self.source()
+        
+        from services.instance_manager import InstanceManager
+        
+        with self.app.app_context():
+            return {
+                instance['name']: {
+                    'type': instance.get('type'),
+                    'status': instance.get('status'),
+                    'active_state': instance.get('active_state'),
+                    'sub_state': instance.get('sub_state')
+                }
+                for instance in InstanceManager().list_instances()
+            }
+    
+    def _emit(self, event_type, instance, **data):
+        self._seq += 1
+        event = {'id': self._seq, 'type': event_type, 'instance': instance, 'time': time.time()}
+        event.update(data)
+        self._events.append(event)
+    
+    def diff(self, previous, current):
+        """Genera los eventos que llevan de `previous` a `current`"""
+        for name in sorted(previous.keys() - current.keys()):
+            self._emit('removed', name)
+        for name in sorted(current.keys() - previous.keys()):
+            self._emit('added', name, state=current[name])
+        for name in sorted(current.keys() & previous.keys()):
+            before, after = previous[name], current[name]
+            if any(before.get(field) != after.get(field) for field in TRACKED_FIELDS):
+                self._emit('state_changed', name, state=after,
+                           previous={field: before.get(field) for field in TRACKED_FIELDS})
+    
+    def poll(self):
+        """Un ciclo de detección; la primera lectura solo fija la referencia"""
+        try:
+            states = self._read_states()
+        except Exception as e:
+            logger.error(f"Error reading instance states for events: {e}")
+            states = None
+        
+        with self._lock:
+            if states is not None:
+                if self._states is not None:
+                    self.diff(self._states, states)
+                self._states = states
+            if self.tracker is not None:
+                for operation in self.tracker.collect_finished():
+                    self._emit('operation_finished', operation['instance'], action=operation['action'],
+                               status=operation.get('status'), operation_id=operation['id'],
+                               job_id=operation.get('job_id'), exit_code=operation.get('exit_code'),
+                               duration=operation.get('duration') or round(operation['finished_at'] - operation['started_at'], 1))
+            del self._events[:-self.max_events]
+    
+    def __call__(self):
+        if self.app is None and self.source is None:
+            return {}
+        if time.monotonic() - self._polled_at >= self.poll_interval:
+            self._polled_at = time.monotonic()
+            self.poll()
+        with self._lock:
+            return {'seq': self._seq, 'events': list(self._events)}
+
+
+def events_after(state, last_id):
+    """Eventos de `state` (clave 'instance_events' del snapshot) posteriores a `last_id`
+    
+    Returns:
+        tuple: (eventos, completo). `completo` es False si hay eventos que ya
+            salieron del buffer y el cliente debe releer el listado.
+    """
+    events = (state or {}).get('events') or []
+    pending = [e for e in events if e['id'] > last_id]
+    if not pending:
+        # Un seq menor al conocido indica que el escritor se reinició
+        return [], (state or {}).get('seq', last_id) >= last_id
+    return pending, pending[0]['id'] == last_id + 1
+
+
+operation_tracker = OperationTracker()
+instance_events = InstanceEventCollector(tracker=operation_tracker)
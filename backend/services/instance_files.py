@@ -0,0 +1,118 @@
+import os
+import re
+import logging
+import threading
+import configparser
+
+logger = logging.getLogger(__name__)
+
+# Claves de odoo.conf que se exponen (nunca contraseñas)
+CONF_INT_KEYS = ('workers', 'max_cron_threads', 'http_port', 'gevent_port', 'longpolling_port', 'db_port', 'db_maxconn')
+CONF_STR_KEYS = ('db_name', 'db_host', 'db_user', 'logfile', 'data_dir', 'log_level', 'http_interface', 'dbfilter')
+
+
+class ParsedFileCache:
+    """Resultado del parseo de archivos, cacheado por (ruta, mtime, tamaño)
+    
+    Un acierto cuesta un solo `stat`; si el archivo cambió (o desapareció) se
+    vuelve a parsear (o se descarta).
+    """
+    
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, path, parser):
+        """Devuelve parser(contenido) del archivo, o None si no existe"""
+        try:
+            st = os.stat(path)
+        except OSError:
+            with self._lock:
+                self._entries.pop(path, None)
+            return None
+        
+        key = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry and entry[0] == key:
+                self.hits += 1
+                return entry[1]
+        
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            parsed = parser(f.read())
+        with self._lock:
+            self.misses += 1
+            self._entries[path] = (key, parsed)
+        return parsed
+
+
+def parse_info_file(content):
+    """Extrae puerto, dominio, base de datos y servicio de info-instancia.txt"""
+    info = {'port': None, 'domain': None, 'database': None, 'service': None}
+    
+    # Extraer información con regex (soporta formato con y sin emojis)
+    port_match = re.search(r'Puerto(?:\s+HTTP)?:\s*(\d+)', content)
+    if port_match:
+        info['port'] = int(port_match.group(1))
+    
+    domain_match = re.search(r'Dominio:\s*https?://([^\s]+)', content)
+    if domain_match:
+        info['domain'] = domain_match.group(1)
+    
+    db_match = re.search(r'Base de datos:\s*([^\s]+)', content)
+    if db_match:
+        info['database'] = db_match.group(1)
+    
+    # Buscar servicio con varios formatos posibles
+    service_match = re.search(r'(?:Servicio(?:\s+systemd)?|🧩\s+Servicio):\s*([^\s]+)', content)
+    if service_match:
+        info['service'] = service_match.group(1)
+    
+    return info
+
+
+def parse_odoo_conf(content):
+    """Extrae de odoo.conf la base, workers, puertos, addons_path y logfile
+    
+    Returns:
+        dict: claves de CONF_INT_KEYS / CONF_STR_KEYS presentes y
+            addons_path como lista
+    """
+    parser = configparser.ConfigParser(interpolation=None, strict=False)
+    parser.read_string(content)
+    if not parser.has_section('options'):
+        return {}
+    options = parser['options']
+    
+    config = {}
+    for key in CONF_STR_KEYS:
+        value = options.get(key, '').strip()
+        if value and value.lower() != 'false':
+            config[key] = value
+    for key in CONF_INT_KEYS:
+        try:
+            config[key] = int(options.get(key, '').strip())
+        except ValueError:
+            pass
+    if options.get('addons_path'):
+        config['addons_path'] = [p.strip() for p in options['addons_path'].split(',') if p.strip()]
+    return config
+
+
+file_cache = ParsedFileCache()
+
+
+def read_info_file(instance_path):
+    """Datos de info-instancia.txt de una instancia (None si no existe)"""
+    return file_cache.get(os.path.join(instance_path, 'info-instancia.txt'), parse_info_file)
+
+
+def read_odoo_conf(instance_path):
+    """Configuración parseada de odoo.conf de una instancia (None si no existe)"""
+    try:
+        return file_cache.get(os.path.join(instance_path, 'odoo.conf'), parse_odoo_conf)
+    except configparser.Error as e:
+        logger.warning(f"Cannot parse odoo.conf of {instance_path}: {e}")
+        return None
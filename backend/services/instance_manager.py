@@ -1,13 +1,30 @@
 import os
 import subprocess
 import re
-import sys
 import logging
 from datetime import datetime
 from flask import current_app
 
+from services.service_status import get_status_backend, status_from_state
+from services.instance_registry import get_instance_registry
+from services.instance_files import read_info_file, read_odoo_conf
+from services.job_engine import job_engine
+from services.log_tail import tail_lines
+from services.nginx_log_index import nginx_log_indexer
+from services.journal import read_journal, get_journal_source
+
 logger = logging.getLogger(__name__)
 
+# Métodos de clonado de la BD de producción (scripts/odoo/clone-database.sh)
+DB_CLONE_METHODS = ('auto', 'template', 'dump')
+
+def shared_registry(prod_root=None, dev_root=None):
+    """Registro de instancias del proceso (por defecto con las rutas de la app)"""
+    if prod_root is None:
+        prod_root = current_app.config['PROD_ROOT']
+        dev_root = current_app.config['DEV_ROOT']
+    return get_instance_registry(prod_root, dev_root, InstanceManager._get_instance_info)
+
 class InstanceManager:
     """Gestor de instancias Odoo"""
     
@@ -17,6 +34,7 @@ class InstanceManager:
         self.scripts_path = None
         self.puertos_file = None
         self.dev_instances_file = None
+        self.registry = None
     
     def _init_paths(self):
         """Inicializa las rutas desde la configuración"""
@@ -26,48 +44,41 @@ class InstanceManager:
             self.scripts_path = current_app.config['SCRIPTS_PATH']
             self.puertos_file = current_app.config['PUERTOS_FILE']
             self.dev_instances_file = current_app.config['DEV_INSTANCES_FILE']
+        if not self.registry:
+            self.registry = shared_registry(self.prod_root, self.dev_root)
     
-    def list_instances(self):
-        """Lista todas las instancias (producción y desarrollo)"""
+    def list_instances(self, with_status=True):
+        """Lista todas las instancias (producción y desarrollo)
+        
+        Args:
+            with_status: Si False no consulta systemd (solo datos de info-instancia.txt)
+        """
         self._init_paths()
-        instances = []
-        
-        # Instancias de producción
-        if os.path.exists(self.prod_root):
-            for name in os.listdir(self.prod_root):
-                path = os.path.join(self.prod_root, name)
-                if os.path.isdir(path):
-                    info = self._get_instance_info(name, path, 'production')
-                    instances.append(info)
-        
-        # Instancias de desarrollo
-        if os.path.exists(self.dev_root):
-            for name in os.listdir(self.dev_root):
-                path = os.path.join(self.dev_root, name)
-                if os.path.isdir(path):
-                    info = self._get_instance_info(name, path, 'development')
-                    instances.append(info)
+        instances = self.registry.all()
+        
+        if with_status:
+            self._apply_service_status(instances)
         
         return instances
     
     def list_production_instances(self):
         """Lista solo las instancias de producción válidas para clonar"""
         self._init_paths()
-        instances = []
-        
-        if os.path.exists(self.prod_root):
-            for name in os.listdir(self.prod_root):
-                path = os.path.join(self.prod_root, name)
-                # Filtrar solo directorios válidos con odoo.conf
-                if os.path.isdir(path) and os.path.exists(os.path.join(path, 'odoo.conf')):
-                    # Excluir directorios especiales
-                    if name not in ['temp', 'backups']:
-                        info = self._get_instance_info(name, path, 'production')
-                        instances.append(info)
-        
+        # Solo directorios con odoo.conf, excluyendo los especiales (temp, backups)
+        instances = self.registry.production()
+        self._apply_service_status(instances)
         return instances
     
-    def _get_instance_info(self, name, path, env_type):
+    def find_instance(self, instance_name, with_status=True):
+        """Busca una instancia por nombre en el registro (None si no existe)"""
+        self._init_paths()
+        instance = self.registry.get(instance_name)
+        if instance and with_status:
+            self._apply_service_status([instance])
+        return instance
+    
+    @staticmethod
+    def _get_instance_info(name, path, env_type):
         """Obtiene información de una instancia"""
         info = {
             'name': name,
@@ -80,74 +91,48 @@ class InstanceManager:
             'service': None
         }
         
-        # Leer archivo info-instancia.txt si existe
-        info_file = os.path.join(path, 'info-instancia.txt')
-        if os.path.exists(info_file):
-            try:
-                with open(info_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    
-                    # Extraer información con regex (soporta formato con y sin emojis)
-                    port_match = re.search(r'Puerto(?:\s+HTTP)?:\s*(\d+)', content)
-                    if port_match:
-                        info['port'] = int(port_match.group(1))
-                    
-                    domain_match = re.search(r'Dominio:\s*https?://([^\s]+)', content)
-                    if domain_match:
-                        info['domain'] = domain_match.group(1)
-                    
-                    db_match = re.search(r'Base de datos:\s*([^\s]+)', content)
-                    if db_match:
-                        info['database'] = db_match.group(1)
-                    
-                    # Buscar servicio con varios formatos posibles
-                    service_match = re.search(r'(?:Servicio(?:\s+systemd)?|🧩\s+Servicio):\s*([^\s]+)', content)
-                    if service_match:
-                        info['service'] = service_match.group(1)
-            except Exception as e:
-                print(f"Error leyendo info de {name}: {e}")
+        # info-instancia.txt y odoo.conf se parsean una vez por versión del archivo
+        try:
+            parsed = read_info_file(path)
+            if parsed:
+                info.update(parsed)
+        except Exception as e:
+            print(f"Error leyendo info de {name}: {e}")
         
-        # Verificar estado del servicio
-        if info['service']:
-            try:
-                info['status'] = self._get_service_status(info['service'])
-                print(f"Service {info['service']} status: {info['status']}", file=sys.stderr, flush=True)
-            except Exception as e:
-                print(f"Error getting status for {info['service']}: {e}", file=sys.stderr, flush=True)
-                info['status'] = 'unknown'
+        config = read_odoo_conf(path)
+        if config:
+            info['config'] = dict(config, addons_path=list(config.get('addons_path', [])))
+            if not info['database']:
+                info['database'] = config.get('db_name')
         
         return info
     
+    def _apply_service_status(self, instances):
+        """Completa el estado de todas las instancias con una sola consulta a systemd"""
+        services = [i['service'] for i in instances if i['service']]
+        if not services:
+            return
+        
+        states = get_status_backend(current_app.config).get_states(services)
+        for instance in instances:
+            if not instance['service']:
+                continue
+            state = states.get(instance['service'])
+            instance['status'] = status_from_state(state)
+            instance['active_state'] = state.get('active_state') if state else None
+            instance['sub_state'] = state.get('sub_state') if state else None
+            instance['main_pid'] = state.get('main_pid') if state else None
+            if state and state.get('load_state') == 'not-found':
+                logger.warning(f"Service {instance['service']} of instance {instance['name']} not found")
+    
     def _get_service_status(self, service_name):
         """Obtiene el estado de un servicio systemd"""
-        try:
-            result = subprocess.run(
-                ['/usr/bin/systemctl', 'is-active', service_name],
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
-            status = result.stdout.strip()
-            logger.info(f"Service check: {service_name} -> stdout='{status}', returncode={result.returncode}")
-            
-            # Retornar el estado tal como lo devuelve systemctl
-            if status == 'active':
-                return 'active'
-            elif status == 'inactive':
-                return 'inactive'
-            elif status == 'failed':
-                return 'inactive'
-            else:
-                logger.warning(f"Unknown status '{status}' for service {service_name}")
-                return 'unknown'
-        except Exception as e:
-            logger.error(f"Error checking service status for {service_name}: {e}")
-            return 'unknown'
+        state = get_status_backend(current_app.config).get_states([service_name]).get(service_name)
+        return status_from_state(state)
     
     def get_instance_status(self, instance_name):
         """Obtiene el estado detallado de una instancia"""
-        instances = self.list_instances()
-        instance = next((i for i in instances if i['name'] == instance_name), None)
+        instance = self.find_instance(instance_name)
         
         if not instance:
             return None
@@ -167,13 +152,18 @@ class InstanceManager:
         
         return instance
     
-    def create_dev_instance(self, name, source_instance=None, neutralize=True):
+    def create_dev_instance(self, name, source_instance=None, neutralize=True, clone_method=None):
         """Crea una nueva instancia de desarrollo
         
         Args:
             name: Nombre de la instancia de desarrollo
             source_instance: Instancia de producción a clonar (opcional, usa default del .env si no se especifica)
             neutralize: Si True, neutraliza la base de datos (elimina licencia, desactiva crons/correos)
+            clone_method: Cómo copiar la BD: 'auto' (snapshot de producción con
+                CREATE DATABASE ... TEMPLATE si está vigente, si no dump), 'template'
+                (snapshot aunque esté vencido) o 'dump' (pg_dump/pg_restore en
+                paralelo). Por defecto DB_CLONE_METHOD. Los tiempos de cada fase
+                quedan en el job.
         """
         self._init_paths()
         script_path = os.path.join(self.scripts_path, 'odoo/create-dev-instance.sh')
@@ -181,9 +171,13 @@ class InstanceManager:
         if not os.path.exists(script_path):
             return {'success': False, 'error': 'Script de creación no encontrado'}
         
+        clone_method = clone_method or current_app.config.get('DB_CLONE_METHOD', 'auto')
+        if clone_method not in DB_CLONE_METHODS:
+            return {'success': False, 'error': f'Método de clonado inválido: {clone_method} (usar {", ".join(DB_CLONE_METHODS)})'}
+        
         try:
-            # Preparar argumentos del script
-            script_args = ['/bin/bash', script_path, name]
+            # Preparar argumentos del script (el método de clonado va por entorno)
+            script_args = ['/usr/bin/env', f'DB_CLONE_METHOD={clone_method}', '/bin/bash', script_path, name]
             
             # Si se especificó una instancia de producción, agregarla como segundo argumento
             if source_instance:
@@ -197,27 +191,22 @@ class InstanceManager:
             instance_name = f'dev-{name}'
             log_file_path = f'/tmp/odoo-create-{instance_name}.log'
             
-            # Ejecutar script en background desacoplado del proceso padre
-            with open(log_file_path, 'w') as log_file:
-                process = subprocess.Popen(
-                    script_args,
-                    stdin=subprocess.PIPE,
-                    stdout=log_file,
-                    stderr=subprocess.STDOUT,
-                    start_new_session=True,
-                    text=True,
-                    bufsize=1
-                )
-                # Enviar confirmación
-                process.stdin.write('s\n')
-                process.stdin.close()
-            logger.info(f"Process started for dev instance {instance_name} from source {source_instance or 'default'} (neutralize={neutralize})")
+            # Encolar el script (con la confirmación por stdin) como job
+            result = job_engine.submit('create', script_args, instance_name, log_file=log_file_path, stdin='s\n')
+            if not result['success']:
+                return result
+            logger.info(f"Job {result['job']['id']} queued for dev instance {instance_name} from source {source_instance or 'default'} "
+                        f"(neutralize={neutralize}, clone={clone_method})")
             
             return {
                 'success': True,
                 'message': f'Creación de instancia {instance_name} iniciada. Ver logs: {log_file_path}',
                 'log_file': log_file_path,
-                'instance_name': instance_name  # Devolver el nombre completo de la instancia
+                'instance_name': instance_name,  # Devolver el nombre completo de la instancia
+                'clone_method': clone_method,
+                'job_id': result['job']['id'],
+                'queue_position': result['job'].get('queue_position'),
+                'eta_seconds': result['job'].get('eta_seconds')
             }
         except Exception as e:
             return {'success': False, 'error': str(e)}
@@ -268,7 +257,6 @@ class InstanceManager:
         
         try:
             instance_name = f'prod-{name.lower()}'
-            pid_file = f"/tmp/{instance_name}.pid"
             status_file = f"/tmp/{instance_name}.status"
             log_file_path = f'/tmp/odoo-create-{instance_name}.log'
             
@@ -276,25 +264,13 @@ class InstanceManager:
             ssl_map = {'letsencrypt': '1', 'cloudflare': '2', 'http': '3'}
             ssl_arg = ssl_map.get(ssl_method, '1')
 
-            # Ejecutar script en background desacoplado del proceso padre
+            # Encolar el script como job (escribe su propio .pid y .status)
             # Argumentos: nombre, version, edition, ssl_method
-            log_fd = os.open(log_file_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC)
-            process = subprocess.Popen(
-                ['/bin/bash', script_path, name, version, edition, ssl_arg],
-                stdout=log_fd,
-                stderr=subprocess.STDOUT,
-                start_new_session=True,
-                text=True,
-                bufsize=1
-            )
-            os.close(log_fd)
-
-            # Guardar PID y estado inicial
-            with open(pid_file, 'w') as f:
-                f.write(str(process.pid))
-
-            with open(status_file, 'w') as f:
-                f.write("running")
+            result = job_engine.submit('create', ['/bin/bash', script_path, name, version, edition, ssl_arg],
+                                       instance_name, log_file=log_file_path, job_class='cpu')
+            if not result['success']:
+                return result
+            job = result['job']
             
             logger.info(f"Production instance creation started: {instance_name} (Odoo {version} {edition})")
             
@@ -306,8 +282,10 @@ class InstanceManager:
                 'domain': f'{name}.{domain_root}',
                 'version': version,
                 'edition': edition,
-                'pid': process.pid,
-                'status_file': status_file
+                'status_file': status_file,
+                'job_id': job['id'],
+                'queue_position': job.get('queue_position'),
+                'eta_seconds': job.get('eta_seconds')
             }
         except Exception as e:
             logger.error(f"Error creating production instance: {e}")
@@ -408,26 +386,22 @@ class InstanceManager:
         try:
             # Responder automáticamente: s para continuar, s/n para neutralizar
             neutralize_answer = 's' if neutralize else 'n'
-            with open(f'/tmp/odoo-update-db-{instance_name}.log', 'w') as log_file:
-                process = subprocess.Popen(
-                    ['/bin/bash', script_path],
-                    stdin=subprocess.PIPE,
-                    stdout=log_file,
-                    stderr=subprocess.STDOUT,
-                    start_new_session=True,
-                    cwd=instance_path,
-                    text=True
-                )
-                # Enviar confirmación para continuar y para neutralizar
-                process.stdin.write(f's\n{neutralize_answer}\n')
-                process.stdin.close()
+            # Confirmación para continuar y para neutralizar
+            result = job_engine.submit('update-db', ['/bin/bash', script_path], instance_name,
+                                       log_file=f'/tmp/odoo-update-db-{instance_name}.log', cwd=instance_path,
+                                       stdin=f's\n{neutralize_answer}\n')
+            if not result['success']:
+                return result
             
             neutralize_msg = " (con neutralización)" if neutralize else " (sin neutralización)"
             return {
                 'success': True,
                 'message': f'Actualización de BD iniciada{neutralize_msg}. Ver logs: /tmp/odoo-update-db-{instance_name}.log',
                 'log_file': f'/tmp/odoo-update-db-{instance_name}.log',
-                'neutralize': neutralize
+                'neutralize': neutralize,
+                'job_id': result['job']['id'],
+                'queue_position': result['job'].get('queue_position'),
+                'eta_seconds': result['job'].get('eta_seconds')
             }
         except Exception as e:
             return {'success': False, 'error': str(e)}
@@ -442,33 +416,31 @@ class InstanceManager:
             return {'success': False, 'error': 'Script update-files.sh no encontrado'}
         
         try:
-            # Ejecutar script en background con log
-            with open(f'/tmp/odoo-update-files-{instance_name}.log', 'w') as log_file:
-                process = subprocess.Popen(
-                    ['/bin/bash', script_path],
-                    stdin=subprocess.PIPE,
-                    stdout=log_file,
-                    stderr=subprocess.STDOUT,
-                    start_new_session=True,
-                    cwd=instance_path,
-                    text=True
-                )
-                # Enviar confirmación
-                process.stdin.write('s\n')
-                process.stdin.close()
+            # Encolar el script (con la confirmación por stdin) como job
+            result = job_engine.submit('update-files', ['/bin/bash', script_path], instance_name,
+                                       log_file=f'/tmp/odoo-update-files-{instance_name}.log', cwd=instance_path, stdin='s\n')
+            if not result['success']:
+                return result
             
             return {
                 'success': True,
                 'message': f'Actualización de archivos iniciada. Ver logs: /tmp/odoo-update-files-{instance_name}.log',
-                'log_file': f'/tmp/odoo-update-files-{instance_name}.log'
+                'log_file': f'/tmp/odoo-update-files-{instance_name}.log',
+                'job_id': result['job']['id'],
+                'queue_position': result['job'].get('queue_position'),
+                'eta_seconds': result['job'].get('eta_seconds')
             }
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
-    def get_instance_logs(self, instance_name, lines=100, log_type='systemd'):
-        """Obtiene los logs de una instancia según el tipo especificado"""
-        instances = self.list_instances()
-        instance = next((i for i in instances if i['name'] == instance_name), None)
+    def get_instance_logs(self, instance_name, lines=100, log_type='systemd', before=None, inode=None, cursor=None):
+        """Obtiene los logs de una instancia según el tipo especificado
+        
+        Para el log de Odoo, `before` (el `start` de una respuesta anterior) e
+        `inode` permiten paginar hacia atrás en el archivo. Para el journal,
+        `cursor` (de la respuesta anterior) trae solo las entradas nuevas.
+        """
+        instance = self.find_instance(instance_name, with_status=False)
         
         if not instance:
             return {'success': False, 'error': 'Instancia no encontrada'}
@@ -479,94 +451,54 @@ class InstanceManager:
                 if not instance['service']:
                     return {'success': False, 'error': 'Servicio no encontrado'}
                 
-                result = subprocess.run(
-                    ['/usr/bin/journalctl', '-u', instance['service'], '-n', str(lines), '--no-pager'],
-                    capture_output=True,
-                    text=True,
-                    timeout=10
-                )
+                result = read_journal(get_journal_source(current_app.config), instance['service'],
+                                      lines=lines, cursor=cursor)
                 return {
                     'success': True,
-                    'logs': result.stdout,
+                    'logs': result['logs'],
                     'lines': lines,
-                    'type': 'systemd'
+                    'type': 'systemd',
+                    'count': result['count'],
+                    'cursor': result['cursor'],
+                    'reset': result['reset']
                 }
             
             elif log_type == 'odoo':
-                # Log file de Odoo
-                log_file = os.path.join(instance['path'], 'odoo.log')
-                if not os.path.exists(log_file):
-                    return {'success': False, 'error': 'Archivo odoo.log no encontrado'}
-                
-                result = subprocess.run(
-                    ['/usr/bin/tail', '-n', str(lines), log_file],
-                    capture_output=True,
-                    text=True,
-                    timeout=10
-                )
-                
-                if result.returncode != 0:
-                    return {'success': False, 'error': f'Error al leer log: {result.stderr}'}
+                # Log file de Odoo (el logfile de odoo.conf o odoo.log en la instancia)
+                log_file = instance.get('config', {}).get('logfile') or 'odoo.log'
+                log_file = os.path.join(instance['path'], log_file)
+                result = tail_lines(log_file, lines, before=before, inode=inode)
+                if not result['exists']:
+                    return {'success': False, 'error': f'Archivo {os.path.basename(log_file)} no encontrado'}
                 
                 return {
                     'success': True,
-                    'logs': result.stdout if result.stdout else 'No hay logs disponibles',
+                    'logs': result['log'] if result['log'] or before is not None else 'No hay logs disponibles',
                     'lines': lines,
-                    'type': 'odoo'
+                    'type': 'odoo',
+                    'start': result['start'],
+                    'inode': result['inode'],
+                    'has_more': result['has_more'],
+                    'reset': result['reset']
                 }
             
-            elif log_type == 'nginx-access':
-                # Logs de acceso de Nginx filtrados por dominio
+            elif log_type in ('nginx-access', 'nginx-error'):
+                # Logs de Nginx filtrados por dominio (índice incremental, sin recorrer el log)
                 if not instance['domain']:
                     return {'success': False, 'error': 'Dominio no encontrado'}
                 
-                result = subprocess.run(
-                    f"/usr/bin/grep '{instance['domain']}' /var/log/nginx/access.log | /usr/bin/tail -n {lines}",
-                    shell=True,
-                    capture_output=True,
-                    text=True,
-                    timeout=10
-                )
-                
-                if result.returncode == 0 and result.stdout:
-                    logs_text = result.stdout
-                elif result.returncode == 1:  # grep no encontró coincidencias
-                    logs_text = f'No hay logs de acceso para el dominio {instance["domain"]}'
+                log_lines = nginx_log_indexer.last_lines(log_type, instance['domain'], lines)
+                if log_lines:
+                    logs_text = '\n'.join(log_lines) + '\n'
                 else:
-                    logs_text = f'Error al leer logs: {result.stderr}'
+                    kind = 'acceso' if log_type == 'nginx-access' else 'error'
+                    logs_text = f'No hay logs de {kind} para el dominio {instance["domain"]}'
                 
                 return {
                     'success': True,
                     'logs': logs_text,
                     'lines': lines,
-                    'type': 'nginx-access'
-                }
-            
-            elif log_type == 'nginx-error':
-                # Logs de error de Nginx filtrados por dominio
-                if not instance['domain']:
-                    return {'success': False, 'error': 'Dominio no encontrado'}
-                
-                result = subprocess.run(
-                    f"/usr/bin/grep '{instance['domain']}' /var/log/nginx/error.log | /usr/bin/tail -n {lines}",
-                    shell=True,
-                    capture_output=True,
-                    text=True,
-                    timeout=10
-                )
-                
-                if result.returncode == 0 and result.stdout:
-                    logs_text = result.stdout
-                elif result.returncode == 1:  # grep no encontró coincidencias
-                    logs_text = f'No hay logs de error para el dominio {instance["domain"]}'
-                else:
-                    logs_text = f'Error al leer logs: {result.stderr}'
-                
-                return {
-                    'success': True,
-                    'logs': logs_text,
-                    'lines': lines,
-                    'type': 'nginx-error'
+                    'type': log_type
                 }
             
             else:
@@ -577,8 +509,7 @@ class InstanceManager:
     
     def restart_instance(self, instance_name):
         """Reinicia una instancia"""
-        instances = self.list_instances()
-        instance = next((i for i in instances if i['name'] == instance_name), None)
+        instance = self.find_instance(instance_name, with_status=False)
         
         if not instance or not instance['service']:
             return {'success': False, 'error': 'Instancia o servicio no encontrado'}
@@ -603,25 +534,19 @@ class InstanceManager:
             return {'success': False, 'error': 'Script sync-filestore.sh no encontrado'}
         
         try:
-            # Ejecutar script en background con log
-            with open(f'/tmp/odoo-sync-filestore-{instance_name}.log', 'w') as log_file:
-                process = subprocess.Popen(
-                    ['/bin/bash', script_path],
-                    stdin=subprocess.PIPE,
-                    stdout=log_file,
-                    stderr=subprocess.STDOUT,
-                    start_new_session=True,
-                    cwd=instance_path,
-                    text=True
-                )
-                # Enviar confirmación
-                process.stdin.write('s\n')
-                process.stdin.close()
+            # Encolar el script (con la confirmación por stdin) como job
+            result = job_engine.submit('sync-filestore', ['/bin/bash', script_path], instance_name,
+                                       log_file=f'/tmp/odoo-sync-filestore-{instance_name}.log', cwd=instance_path, stdin='s\n')
+            if not result['success']:
+                return result
             
             return {
                 'success': True,
                 'message': f'Sincronización de filestore iniciada. Ver logs: /tmp/odoo-sync-filestore-{instance_name}.log',
-                'log_file': f'/tmp/odoo-sync-filestore-{instance_name}.log'
+                'log_file': f'/tmp/odoo-sync-filestore-{instance_name}.log',
+                'job_id': result['job']['id'],
+                'queue_position': result['job'].get('queue_position'),
+                'eta_seconds': result['job'].get('eta_seconds')
             }
         except Exception as e:
             return {'success': False, 'error': str(e)}
@@ -636,25 +561,19 @@ class InstanceManager:
             return {'success': False, 'error': 'Script regenerate-assets.sh no encontrado'}
         
         try:
-            # Ejecutar script en background con log
-            with open(f'/tmp/odoo-regenerate-assets-{instance_name}.log', 'w') as log_file:
-                process = subprocess.Popen(
-                    ['/bin/bash', script_path],
-                    stdin=subprocess.PIPE,
-                    stdout=log_file,
-                    stderr=subprocess.STDOUT,
-                    start_new_session=True,
-                    cwd=instance_path,
-                    text=True
-                )
-                # Enviar confirmación
-                process.stdin.write('s\n')
-                process.stdin.close()
+            # Encolar el script (con la confirmación por stdin) como job
+            result = job_engine.submit('regenerate-assets', ['/bin/bash', script_path], instance_name,
+                                       log_file=f'/tmp/odoo-regenerate-assets-{instance_name}.log', cwd=instance_path, stdin='s\n')
+            if not result['success']:
+                return result
             
             return {
                 'success': True,
                 'message': f'Regeneración de assets iniciada. Ver logs: /tmp/odoo-regenerate-assets-{instance_name}.log',
-                'log_file': f'/tmp/odoo-regenerate-assets-{instance_name}.log'
+                'log_file': f'/tmp/odoo-regenerate-assets-{instance_name}.log',
+                'job_id': result['job']['id'],
+                'queue_position': result['job'].get('queue_position'),
+                'eta_seconds': result['job'].get('eta_seconds')
             }
         except Exception as e:
             return {'success': False, 'error': str(e)}
@@ -0,0 +1,309 @@
+import os
+import errno
+import ctypes
+import ctypes.util
+import struct
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Archivos de una instancia cuyo cambio obliga a releerla
+WATCHED_FILES = ('info-instancia.txt', 'odoo.conf')
+# Directorios dentro de PROD_ROOT que no son instancias
+EXCLUDED_DIRS = ('temp', 'backups')
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+ROOT_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF
+INSTANCE_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_CREATE | IN_DELETE | IN_ATTRIB
+
+EVENT_HEADER = struct.Struct('iIII')
+
+
+class InotifyWatcher:
+    """Acceso mínimo a inotify vía ctypes, en modo no bloqueante
+    
+    No usa hilos: quien consulta el registro drena los eventos pendientes.
+    """
+    
+    def __init__(self):
+        libc_name = ctypes.util.find_library('c')
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self._libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self._paths = {}
+    
+    def add_watch(self, path, mask):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f'inotify_add_watch {path}: {os.strerror(err)}')
+        self._paths[wd] = path
+        return wd
+    
+    def read_events(self):
+        """Devuelve [(ruta vigilada, máscara, nombre)] pendientes (lista vacía si no hay)"""
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return events
+            except OSError as e:
+                if e.errno == errno.EAGAIN:
+                    return events
+                raise
+            offset = 0
+            while offset + EVENT_HEADER.size <= len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b'\0').decode('utf-8', 'replace')
+                offset += length
+                path = self._paths.get(wd)
+                if mask & IN_IGNORED:
+                    self._paths.pop(wd, None)
+                events.append((path, mask, name))
+    
+    def close(self):
+        os.close(self.fd)
+
+
+class InstanceRegistry:
+    """Registro en memoria de las instancias Odoo de PROD_ROOT y DEV_ROOT
+    
+    Guarda la información leída de cada instancia (sin estado de systemd) con
+    índices por nombre, dominio, puerto y servicio, así buscar una instancia
+    no recorre los directorios. Se mantiene al día con inotify sobre las
+    raíces y cada directorio de instancia; si inotify no está disponible
+    compara mtimes cada `poll_interval` segundos.
+    """
+    
+    def __init__(self, prod_root, dev_root, loader, poll_interval=2):
+        self.roots = {'production': prod_root, 'development': dev_root}
+        self.loader = loader  # (name, path, env_type) -> dict
+        self.poll_interval = poll_interval
+        self._records = {}
+        self._signatures = {}
+        self._with_conf = set()
+        self._by_domain = {}
+        self._by_port = {}
+        self._by_service = {}
+        self._lock = threading.RLock()
+        self._watcher = None
+        self._watched_roots = set()
+        self._last_poll = 0
+        self._pid = None
+    
+    def _signature(self, path):
+        """Firma de los archivos de una instancia (mtime y tamaño)"""
+        signature = []
+        for filename in WATCHED_FILES:
+            try:
+                st = os.stat(os.path.join(path, filename))
+                signature.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+    
+    def _scan_dirs(self):
+        """Directorios de instancia actuales: nombre -> (ruta, entorno)"""
+        found = {}
+        for env_type, root in self.roots.items():
+            if not root or not os.path.isdir(root):
+                continue
+            for name in os.listdir(root):
+                path = os.path.join(root, name)
+                if os.path.isdir(path) and name not in found:
+                    found[name] = (path, env_type)
+        return found
+    
+    def _load(self, name, path, env_type):
+        """Lee (o relee) una instancia y la registra en los índices"""
+        self._unindex(name)
+        if self._watcher is not None:
+            # Vigilar antes de leer: un cambio durante la lectura no se pierde
+            try:
+                self._watcher.add_watch(path, INSTANCE_MASK)
+            except OSError as e:
+                logger.warning(f"Cannot watch instance directory {path}: {e}")
+        info = self.loader(name, path, env_type)
+        self._records[name] = info
+        self._signatures[name] = self._signature(path)
+        if os.path.exists(os.path.join(path, 'odoo.conf')):
+            self._with_conf.add(name)
+        if info.get('domain'):
+            self._by_domain[info['domain']] = name
+        if info.get('port'):
+            self._by_port[info['port']] = name
+        if info.get('service'):
+            self._by_service[info['service']] = name
+    
+    def _unindex(self, name):
+        info = self._records.pop(name, None)
+        self._signatures.pop(name, None)
+        self._with_conf.discard(name)
+        if not info:
+            return
+        for index, key in ((self._by_domain, info.get('domain')), (self._by_port, info.get('port')),
+                           (self._by_service, info.get('service'))):
+            if key is not None and index.get(key) == name:
+                del index[key]
+    
+    def _full_scan(self):
+        """Relee todas las instancias"""
+        found = self._scan_dirs()
+        for name in list(self._records):
+            if name not in found:
+                self._unindex(name)
+        for name, (path, env_type) in found.items():
+            self._load(name, path, env_type)
+    
+    def _sync(self, names=None):
+        """Relee solo lo que cambió (altas, bajas y firmas distintas)"""
+        found = self._scan_dirs()
+        for name in list(self._records):
+            if name not in found:
+                self._unindex(name)
+        for name, (path, env_type) in found.items():
+            record = self._records.get(name)
+            stale = (
+                record is None
+                or record.get('path') != path
+                or ((names is None or name in names) and self._signatures.get(name) != self._signature(path))
+            )
+            if stale:
+                self._load(name, path, env_type)
+    
+    def _start_watching(self):
+        """Intenta vigilar las raíces con inotify (si no, queda el polling)"""
+        try:
+            watcher = InotifyWatcher()
+        except (OSError, AttributeError) as e:
+            logger.info(f"inotify not available, instance registry will poll mtimes: {e}")
+            return
+        try:
+            for root in self.roots.values():
+                if root and os.path.isdir(root):
+                    watcher.add_watch(root, ROOT_MASK)
+                    self._watched_roots.add(root)
+        except OSError as e:
+            logger.warning(f"Cannot watch instance roots, instance registry will poll mtimes: {e}")
+            watcher.close()
+            self._watched_roots.clear()
+            return
+        self._watcher = watcher
+    
+    def _ensure_fresh(self):
+        """Aplica los cambios pendientes antes de responder"""
+        if self._pid != os.getpid():
+            # Primera consulta en este proceso (o tras un fork): carga completa
+            self._pid = os.getpid()
+            if self._watcher is not None:
+                self._watcher.close()
+            self._watcher = None
+            self._watched_roots = set()
+            self._start_watching()
+            self._full_scan()
+            self._last_poll = time.monotonic()
+            return
+        
+        if self._watcher is not None:
+            # Una raíz creada después del arranque se vigila en cuanto aparece
+            missing_root = any(r and r not in self._watched_roots and os.path.isdir(r) for r in self.roots.values())
+            events = self._watcher.read_events()
+            if missing_root or any(mask & (IN_Q_OVERFLOW | IN_DELETE_SELF | IN_MOVE_SELF) for _, mask, _ in events):
+                self._pid = None
+                self._ensure_fresh()
+                return
+            if events:
+                roots = set(self.roots.values())
+                dirty = set()
+                for path, mask, name in events:
+                    if path in roots:
+                        dirty.add(name)
+                    elif path and name in WATCHED_FILES:
+                        dirty.add(os.path.basename(path))
+                self._sync(dirty)
+            return
+        
+        if time.monotonic() - self._last_poll >= self.poll_interval:
+            self._last_poll = time.monotonic()
+            self._sync()
+    
+    def all(self, env_type=None):
+        """Copias de todas las instancias (producción primero, luego por nombre)"""
+        with self._lock:
+            self._ensure_fresh()
+            records = [r for r in self._records.values() if env_type is None or r.get('type') == env_type]
+            records.sort(key=lambda r: (r.get('type') != 'production', r['name']))
+            return [dict(r) for r in records]
+    
+    def production(self):
+        """Instancias de producción válidas (con odoo.conf, sin directorios especiales)"""
+        with self._lock:
+            self._ensure_fresh()
+            return [
+                dict(r) for name, r in sorted(self._records.items())
+                if r.get('type') == 'production' and name in self._with_conf and name not in EXCLUDED_DIRS
+            ]
+    
+    def get(self, name):
+        """Instancia por nombre (copia) o None"""
+        with self._lock:
+            self._ensure_fresh()
+            record = self._records.get(name)
+            return dict(record) if record else None
+    
+    def _lookup(self, index, key):
+        with self._lock:
+            self._ensure_fresh()
+            name = index.get(key)
+            return dict(self._records[name]) if name in self._records else None
+    
+    def by_domain(self, domain):
+        return self._lookup(self._by_domain, domain)
+    
+    def by_port(self, port):
+        return self._lookup(self._by_port, port)
+    
+    def by_service(self, service):
+        return self._lookup(self._by_service, service)
+    
+    def invalidate(self, name=None):
+        """Fuerza a releer una instancia (o todas) en la próxima consulta"""
+        with self._lock:
+            if name is None:
+                self._pid = None
+            else:
+                self._signatures.pop(name, None)
+                self._sync({name})
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def get_instance_registry(prod_root, dev_root, loader):
+    """Registro compartido del proceso para un par de raíces"""
+    key = (prod_root, dev_root)
+    with _registries_lock:
+        if key not in _registries:
+            _registries[key] = InstanceRegistry(prod_root, dev_root, loader)
+        return _registries[key]
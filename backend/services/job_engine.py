@@ -0,0 +1,558 @@
+import os
+import json
+import fcntl
+import signal
+import bisect
+import logging
+import subprocess
+from collections import Counter
+from datetime import datetime, timedelta
+
+from models import db, Job
+from services.instance_events import operation_tracker, proc_start_time
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATES = ('queued', 'running')
+FINISHED_STATES = ('succeeded', 'failed', 'cancelled')
+
+# Recurso que más usa cada operación (la creación de producción pasa 'cpu': pip sin copia de BD)
+ACTION_CLASSES = {
+    'create': 'db',
+    'update-db': 'db',
+    'backup': 'db',
+    'restore': 'db',
+    'update-files': 'io',
+    'sync-filestore': 'io',
+    'regenerate-assets': 'cpu'
+}
+# Las que el IO-wait alto también frena
+IO_CLASSES = ('io', 'db')
+
+# Prioridad de backups de la instancia (config 'priority' de BackupManagerV2) -> orden en la cola
+PRIORITY_LEVELS = {'high': 0, 'medium': 1, 'low': 2, 'manual': 1}
+DEFAULT_PRIORITY = 1
+
+
+def parse_class_limits(value):
+    """Límites por clase desde 'io=1,cpu=1,db=1' (clases sin límite se omiten)"""
+    limits = {}
+    for item in (value or '').split(','):
+        name, _, limit = item.partition('=')
+        if name.strip() and limit.strip().isdigit():
+            limits[name.strip()] = int(limit)
+    return limits
+
+# Ejecuta el comando y deja su código de salida en $0 (escritura atómica)
+EXIT_CODE_WRAPPER = '"$@"; code=$?; echo "$code" > "$0.tmp" && mv "$0.tmp" "$0"; exit $code'
+
+
+def read_phases(path):
+    """Fases informadas por un script: líneas "nombre<TAB>milisegundos<TAB>detalle"
+    
+    Returns:
+        list: [{name, seconds, detail}] en el orden en que terminaron
+    """
+    phases = []
+    try:
+        with open(path, 'r') as f:
+            for line in f:
+                name, _, rest = line.rstrip('\n').partition('\t')
+                milliseconds, _, detail = rest.partition('\t')
+                if name and milliseconds.isdigit():
+                    phases.append({'name': name, 'seconds': round(int(milliseconds) / 1000, 1), 'detail': detail or None})
+    except OSError:
+        pass
+    return phases
+
+
+def percentile(values, q):
+    """Percentil por rango más cercano de una lista (None si está vacía)"""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+class JobEngine:
+    """Operaciones largas (scripts de creación, update-db, backups...) como jobs
+    
+    Cualquier worker encola un job (fila en `jobs`); el despachador registra
+    el fin de los que terminaron y lanza los encolados por prioridad y orden
+    de llegada mientras haya lugar: hasta `max_concurrent` en total, hasta
+    `class_limits` por clase (io, cpu, db) y solo si la muestra más reciente
+    del muestreador no indica carga o IO-wait altos (ver `_admission`). Corre al encolar y en cada muestra del proceso escritor
+    (listener del muestreador), protegido por un flock para que un solo
+    proceso despache a la vez.
+    
+    Cada script se lanza desacoplado (sobrevive a un reinicio de gunicorn)
+    dentro de un wrapper de bash que escribe el código de salida en
+    `directory`/<id>.exit; la salida va al log del job, que conserva la ruta
+    de /tmp que ya usaban los endpoints de logs. Los scripts que usan
+    scripts/utils/job-phases.sh informan la duración de cada fase en
+    `directory`/<id>.phases (variable JOB_PHASES_FILE), que queda en el job.
+    """
+    
+    def __init__(self, max_concurrent=2, directory=None, class_limits=None, max_load_per_cpu=1.5,
+                 max_iowait=25.0, max_hold=900, default_estimate=300):
+        self.app = None
+        self.max_concurrent = max_concurrent
+        self.directory = directory
+        self.class_limits = class_limits if class_limits is not None else {'io': 1, 'cpu': 1, 'db': 1}
+        self.max_load_per_cpu = max_load_per_cpu
+        self.max_iowait = max_iowait
+        self.max_hold = max_hold
+        self.default_estimate = default_estimate
+    
+    def init_app(self, app):
+        """Toma la configuración de la app"""
+        self.app = app
+        self.max_concurrent = app.config.get('JOBS_MAX_CONCURRENT', self.max_concurrent)
+        self.directory = app.config.get('JOBS_DIR') or self.directory
+        if app.config.get('JOBS_CLASS_LIMITS') is not None:
+            self.class_limits = parse_class_limits(app.config['JOBS_CLASS_LIMITS'])
+        self.max_load_per_cpu = app.config.get('JOBS_MAX_LOAD_PER_CPU', self.max_load_per_cpu)
+        self.max_iowait = app.config.get('JOBS_MAX_IOWAIT', self.max_iowait)
+        self.max_hold = app.config.get('JOBS_ADMISSION_MAX_HOLD', self.max_hold)
+        self.default_estimate = app.config.get('JOBS_DEFAULT_ESTIMATE', self.default_estimate)
+    
+    def _path(self, job_id, suffix):
+        return os.path.join(self.directory, f'{job_id}.{suffix}')
+    
+    # --- encolado ---
+    
+    def submit(self, action, command, instance_name=None, log_file=None, cwd=None, stdin=None,
+               job_class=None, priority=None):
+        """Encola un job y lo lanza si hay lugar
+        
+        Args:
+            action: Tipo de operación (create, update-db, backup...)
+            command: Lista de argumentos del script
+            instance_name: Instancia afectada
+            log_file: Ruta del log (por defecto <directory>/<id>.log)
+            cwd: Directorio de trabajo
+            stdin: Texto enviado a la entrada estándar (confirmaciones)
+            job_class: io, cpu o db (por defecto según ACTION_CLASSES)
+            priority: high, medium o low (o 0-2); por defecto media
+        
+        Returns:
+            dict: Resultado con el job ('success', 'job') o el error. Si
+                quedó en cola el job trae queue_position y eta_seconds.
+        """
+        if instance_name:
+            active = Job.query.filter(
+                Job.action == action,
+                Job.instance_name == instance_name,
+                Job.status.in_(ACTIVE_STATES)
+            ).first()
+            if active:
+                return {
+                    'success': False,
+                    'error': f'Ya hay una operación {action} en curso para {instance_name} (job {active.id})',
+                    'job': active.to_dict()
+                }
+        
+        if not isinstance(priority, int):
+            priority = PRIORITY_LEVELS.get(priority, DEFAULT_PRIORITY)
+        job = Job(action=action, instance_name=instance_name, command=json.dumps(list(command)),
+                  cwd=cwd, stdin=stdin, log_file=log_file, status='queued',
+                  job_class=job_class or ACTION_CLASSES.get(action, 'cpu'), priority=priority)
+        db.session.add(job)
+        db.session.commit()
+        if not job.log_file:
+            job.log_file = self._path(job.id, 'log')
+            db.session.commit()
+        
+        self.dispatch()
+        db.session.refresh(job)
+        return {'success': True, 'job': self.annotate([job.to_dict()])[0]}
+    
+    # --- despacho ---
+    
+    def dispatch(self, metrics=None):
+        """Registra los jobs terminados y lanza los encolados que entren
+        
+        Sirve de listener del muestreador: la muestra recibida se usa para el
+        control de admisión (sin ella se lee el último snapshot). Si otro
+        proceso está despachando no hace nada.
+        """
+        if self.app is None or not self.directory:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            lock_file = open(os.path.join(self.directory, '.dispatch.lock'), 'w')
+        except OSError as e:
+            logger.error(f"Cannot open jobs directory {self.directory}: {e}")
+            return
+        
+        with lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return
+            try:
+                with self.app.app_context():
+                    self._reap()
+                    self._start_queued(self.pressure(metrics))
+            except Exception as e:
+                logger.error(f"Error dispatching jobs: {e}")
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def _reap(self):
+        """Cierra los jobs cuyo proceso ya terminó"""
+        # Tomados por un despacho que se cortó antes de lanzar el proceso
+        stale = datetime.utcnow() - timedelta(minutes=1)
+        for job in Job.query.filter(Job.status == 'running', Job.pid.is_(None), Job.started_at < stale).all():
+            job.status = 'failed'
+            job.error = 'El job no llegó a lanzarse'
+            job.finished_at = datetime.utcnow()
+        db.session.commit()
+        
+        for job in Job.query.filter(Job.status == 'running', Job.pid.isnot(None)).all():
+            if proc_start_time(job.pid) == job.proc_start and job.proc_start is not None:
+                continue
+            
+            exit_code = None
+            try:
+                with open(self._path(job.id, 'exit'), 'r') as f:
+                    exit_code = int(f.read().strip())
+                os.remove(self._path(job.id, 'exit'))
+            except (OSError, ValueError):
+                pass
+            
+            phases = read_phases(self._path(job.id, 'phases'))
+            if phases:
+                job.phases = json.dumps(phases)
+            try:
+                os.remove(self._path(job.id, 'phases'))
+            except OSError:
+                pass
+            
+            job.exit_code = exit_code
+            job.finished_at = datetime.utcnow()
+            job.duration = round((job.finished_at - job.started_at).total_seconds(), 1) if job.started_at else None
+            try:
+                job.log_bytes = os.path.getsize(job.log_file)
+            except (OSError, TypeError):
+                pass
+            if job.cancel_requested and exit_code != 0:
+                job.status = 'cancelled'
+            elif exit_code == 0:
+                job.status = 'succeeded'
+            else:
+                job.status = 'failed'
+                if exit_code is None:
+                    job.error = 'El proceso terminó sin registrar código de salida'
+            db.session.commit()
+            logger.info(f"Job {job.id} ({job.action} {job.instance_name or ''}) {job.status} "
+                        f"exit={exit_code} in {job.duration}s")
+    
+    # --- admisión ---
+    
+    def pressure(self, metrics=None):
+        """Carga por CPU e IO-wait de una muestra del muestreador (o del último snapshot, o medida en el momento)"""
+        if metrics is None:
+            # Sin get_snapshot(): desde cron iniciaría el muestreador y podría ganar el lock de escritor
+            from services.system_monitor import sampler
+            metrics = sampler.peek_snapshot() or {'cpu': sampler.monitor.get_cpu_info()}
+        cpu = (metrics or {}).get('cpu') or {}
+        load = cpu.get('load_avg') or [None]
+        count = cpu.get('count_logical') or cpu.get('count') or 1
+        return {
+            'load_per_cpu': round(load[0] / count, 2) if load[0] is not None else None,
+            'iowait': cpu.get('iowait')
+        }
+    
+    def _admission(self, job, free, in_use, pressure, idle):
+        """Motivo por el que el job no puede arrancar ahora (None si puede)
+        
+        Los límites de concurrencia se respetan siempre. La carga y el IO-wait
+        solo retienen un job mientras haya otros corriendo o hasta que lleve
+        `max_hold` segundos en cola: la carga puede venir de producción y no
+        debe dejar la cola frenada para siempre.
+        """
+        if free <= 0:
+            return f'Límite de jobs simultáneos ({self.max_concurrent})'
+        limit = self.class_limits.get(job.job_class)
+        if limit is not None and in_use[job.job_class] >= limit:
+            return f'Límite de la clase {job.job_class} ({limit})'
+        
+        held = not idle or (datetime.utcnow() - job.created_at).total_seconds() < self.max_hold
+        load = pressure.get('load_per_cpu')
+        if held and load is not None and load > self.max_load_per_cpu:
+            return f'Carga del sistema alta ({load} por CPU, máximo {self.max_load_per_cpu})'
+        iowait = pressure.get('iowait')
+        if held and job.job_class in IO_CLASSES and iowait is not None and iowait > self.max_iowait:
+            return f'IO-wait alto ({iowait}%, máximo {self.max_iowait}%)'
+        return None
+    
+    def _queued(self):
+        """Jobs en cola en el orden en que se despachan"""
+        return Job.query.filter_by(status='queued').order_by(Job.priority, Job.id).all()
+    
+    def _start_queued(self, pressure):
+        """Lanza los jobs en cola que pasan la admisión, por prioridad y llegada
+        
+        Un job frenado por el límite de su clase no frena a los de otra clase
+        que vienen detrás.
+        """
+        running = Job.query.filter_by(status='running').all()
+        in_use = Counter(job.job_class for job in running)
+        free = self.max_concurrent - len(running)
+        
+        for job in self._queued():
+            reason = self._admission(job, free, in_use, pressure, idle=not running and not in_use)
+            if reason:
+                if job.wait_reason != reason:
+                    job.wait_reason = reason
+                    db.session.commit()
+                continue
+            
+            # Tomar el job solo si nadie lo canceló mientras tanto
+            claimed = Job.query.filter_by(id=job.id, status='queued').update(
+                {'status': 'running', 'started_at': datetime.utcnow()}, synchronize_session=False)
+            db.session.commit()
+            if not claimed:
+                continue
+            db.session.refresh(job)
+            try:
+                process = self._launch(job)
+            except Exception as e:
+                job.status = 'failed'
+                job.error = str(e)
+                job.finished_at = datetime.utcnow()
+                db.session.commit()
+                logger.error(f"Cannot start job {job.id} ({job.action}): {e}")
+                continue
+            
+            free -= 1
+            in_use[job.job_class] += 1
+            job.pid = process.pid
+            job.proc_start = proc_start_time(process.pid)
+            job.wait_reason = None
+            db.session.commit()
+            logger.info(f"Job {job.id} started: {job.action} {job.instance_name or ''} "
+                        f"[{job.job_class}, priority {job.priority}] (pid={process.pid})")
+            # El fin del proceso llega al stream de eventos de instancias
+            operation_tracker.register(job.instance_name, job.action, process.pid, job.log_file, job_id=job.id)
+            
+            db.session.refresh(job)
+            if job.cancel_requested:
+                self._kill(job)
+    
+    def _launch(self, job):
+        """Lanza el script del job desacoplado del proceso padre"""
+        exit_file = self._path(job.id, 'exit')
+        phases_file = self._path(job.id, 'phases')
+        for path in (exit_file, phases_file):
+            if os.path.exists(path):
+                os.remove(path)
+        
+        env = dict(os.environ, JOB_ID=str(job.id), JOB_PHASES_FILE=phases_file)
+        log_fd = os.open(job.log_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            process = subprocess.Popen(
+                ['/bin/bash', '-c', EXIT_CODE_WRAPPER, exit_file, *json.loads(job.command)],
+                stdin=subprocess.PIPE if job.stdin else subprocess.DEVNULL,
+                stdout=log_fd,
+                stderr=subprocess.STDOUT,
+                cwd=job.cwd or None,
+                env=env,
+                start_new_session=True,
+                text=True
+            )
+        finally:
+            os.close(log_fd)
+        if job.stdin:
+            try:
+                process.stdin.write(job.stdin)
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+        return process
+    
+    # --- posición y ETA ---
+    
+    def estimates(self, samples=20):
+        """Duración esperada por acción: promedio de los últimos `samples` jobs exitosos"""
+        durations = {}
+        recent = Job.query.filter(Job.status == 'succeeded', Job.duration.isnot(None)).order_by(
+            Job.id.desc()).limit(samples * 10).all()
+        for job in recent:
+            values = durations.setdefault(job.action, [])
+            if len(values) < samples:
+                values.append(job.duration)
+        return {action: sum(values) / len(values) for action, values in durations.items()}
+    
+    def queue(self):
+        """Jobs en cola con su posición y el tiempo estimado hasta que arranquen
+        
+        Simula el despacho: los lugares (global y por clase) se liberan cuando
+        termina lo que corre según la duración típica de cada acción, y cada
+        job en cola toma el primer lugar libre de su clase. No anticipa las
+        demoras por carga o IO-wait. Como el despacho, un job que espera su
+        clase no retiene el lugar global que otro puede usar antes.
+        """
+        estimates = self.estimates()
+        now = datetime.utcnow()
+        
+        def expected(job):
+            return estimates.get(job.action, self.default_estimate)
+        
+        slots = []
+        class_slots = {name: [] for name in self.class_limits}
+        for job in Job.query.filter_by(status='running').all():
+            elapsed = (now - job.started_at).total_seconds() if job.started_at else 0
+            end = max(expected(job) - elapsed, 0)
+            slots.append(end)
+            if job.job_class in class_slots:
+                class_slots[job.job_class].append(end)
+        slots = sorted(slots + [0] * (self.max_concurrent - len(slots)))[:max(self.max_concurrent, 1)]
+        for name, limit in self.class_limits.items():
+            class_slots[name] = sorted(class_slots[name] + [0] * (limit - len(class_slots[name])))[:max(limit, 1)]
+        
+        queued = []
+        for position, job in enumerate(self._queued(), 1):
+            start = slots[0]
+            own = class_slots.get(job.job_class)
+            if own is not None:
+                start = max(start, own[0])
+            end = start + expected(job)
+            # Ocupa el lugar global que se libera más tarde sin pasar de su inicio
+            slots[bisect.bisect_right(slots, start) - 1] = end
+            slots.sort()
+            if own is not None:
+                class_slots[job.job_class] = sorted(own[1:] + [end])
+            item = job.to_dict()
+            item.update({'queue_position': position, 'eta_seconds': round(start), 'estimated_duration': round(expected(job))})
+            queued.append(item)
+        return queued
+    
+    def annotate(self, jobs):
+        """Agrega queue_position, eta_seconds y estimated_duration a los jobs en cola"""
+        if not any(job['status'] == 'queued' for job in jobs):
+            return jobs
+        positions = {item['id']: item for item in self.queue()}
+        for job in jobs:
+            if job['id'] in positions:
+                item = positions[job['id']]
+                job.update({key: item[key] for key in ('queue_position', 'eta_seconds', 'estimated_duration')})
+        return jobs
+    
+    # --- cancelación ---
+    
+    @staticmethod
+    def _kill(job):
+        """Envía SIGTERM a todo el grupo de procesos del job"""
+        if job.pid and proc_start_time(job.pid) == job.proc_start:
+            try:
+                os.killpg(job.pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+    
+    def cancel(self, job_id):
+        """Cancela un job encolado o termina uno en ejecución"""
+        job = Job.query.get(job_id)
+        if not job:
+            return {'success': False, 'error': 'Job no encontrado'}
+        if job.status in FINISHED_STATES:
+            return {'success': False, 'error': f'El job ya terminó ({job.status})'}
+        
+        cancelled = Job.query.filter_by(id=job_id, status='queued').update(
+            {'status': 'cancelled', 'cancel_requested': True, 'finished_at': datetime.utcnow()},
+            synchronize_session=False)
+        db.session.commit()
+        db.session.refresh(job)
+        if not cancelled:
+            job.cancel_requested = True
+            db.session.commit()
+            try:
+                self._kill(job)
+            except PermissionError as e:
+                return {'success': False, 'error': f'No se pudo terminar el proceso: {e}'}
+        return {'success': True, 'message': f'Job {job_id} cancelado', 'job': job.to_dict()}
+    
+    # --- resultados ---
+    
+    def job_result(self, job_id):
+        """Resultado de un job ya cerrado por _reap (None si sigue en cola o corriendo)"""
+        if self.app is None:
+            return {'status': None, 'exit_code': None, 'duration': None}
+        with self.app.app_context():
+            try:
+                job = Job.query.get(job_id)
+                if job is None:
+                    return {'status': None, 'exit_code': None, 'duration': None}
+                if job.status not in FINISHED_STATES:
+                    return None
+                return {'status': job.status, 'exit_code': job.exit_code, 'duration': job.duration}
+            finally:
+                db.session.remove()
+    
+    def latest(self, action, instance_name):
+        """Último job de una acción para una instancia (con posición y ETA si está en cola) o None"""
+        job = Job.query.filter_by(action=action, instance_name=instance_name).order_by(Job.id.desc()).first()
+        return self.annotate([job.to_dict()])[0] if job else None
+
+    # --- estadísticas ---
+    
+    def stats(self, hours=24):
+        """Conteos actuales y rendimiento por acción de los jobs de las últimas `hours` horas"""
+        since = datetime.utcnow() - timedelta(hours=hours)
+        counts = dict(db.session.query(Job.status, db.func.count(Job.id)).filter(
+            db.or_(Job.created_at >= since, Job.status.in_(ACTIVE_STATES))
+        ).group_by(Job.status).all())
+        
+        by_action = {}
+        for job in Job.query.filter(Job.status.in_(FINISHED_STATES), Job.finished_at >= since).all():
+            entry = by_action.setdefault(job.action, {'jobs': [], 'durations': [], 'waits': [], 'phases': {}})
+            entry['jobs'].append(job)
+            if job.duration is not None:
+                entry['durations'].append(job.duration)
+            if job.started_at and job.created_at:
+                entry['waits'].append((job.started_at - job.created_at).total_seconds())
+            if job.status == 'succeeded' and job.phases:
+                for phase in json.loads(job.phases):
+                    entry['phases'].setdefault(phase['name'], []).append(phase['seconds'])
+        
+        actions = {}
+        for action, entry in by_action.items():
+            jobs, durations, waits = entry['jobs'], entry['durations'], entry['waits']
+            succeeded = sum(1 for job in jobs if job.status == 'succeeded')
+            actions[action] = {
+                'finished': len(jobs),
+                'succeeded': succeeded,
+                'failed': sum(1 for job in jobs if job.status == 'failed'),
+                'cancelled': sum(1 for job in jobs if job.status == 'cancelled'),
+                'success_rate': round(100 * succeeded / len(jobs), 1),
+                'avg_duration': round(sum(durations) / len(durations), 1) if durations else None,
+                'p95_duration': percentile(durations, 0.95),
+                'total_duration': round(sum(durations), 1),
+                'avg_wait': round(sum(waits) / len(waits), 1) if waits else None,
+                'log_bytes': sum(job.log_bytes or 0 for job in jobs),
+                # Duración por fase de los jobs exitosos (p. ej. db_template contra db_dump + db_restore)
+                'phases': {
+                    name: {'runs': len(values), 'avg_seconds': round(sum(values) / len(values), 1),
+                           'p95_seconds': percentile(values, 0.95)}
+                    for name, values in entry['phases'].items()
+                }
+            }
+        
+        in_use = Counter(job.job_class for job in Job.query.filter_by(status='running').all())
+        return {
+            'hours': hours,
+            'max_concurrent': self.max_concurrent,
+            'queued': counts.get('queued', 0),
+            'running': counts.get('running', 0),
+            'by_status': counts,
+            'by_action': actions,
+            'classes': {
+                name: {'limit': limit, 'running': in_use.get(name, 0)}
+                for name, limit in self.class_limits.items()
+            },
+            'admission': dict(self.pressure(), max_load_per_cpu=self.max_load_per_cpu, max_iowait=self.max_iowait)
+        }
+
+
+job_engine = JobEngine()
@@ -0,0 +1,280 @@
+import json
+import time
+import logging
+import threading
+import subprocess
+from collections import deque
+from datetime import datetime
+
+from services.service_status import unit_name
+
+logger = logging.getLogger(__name__)
+
+# Máximo de entradas devueltas por lectura incremental
+DEFAULT_MAX_ENTRIES = 1000
+
+
+class InvalidCursor(ValueError):
+    """El cursor no corresponde a ninguna entrada del journal (rotado o de otra máquina)"""
+
+
+def _message(value):
+    """MESSAGE del journal: texto o, si no es UTF-8 válido, lista de bytes"""
+    if isinstance(value, list):
+        return bytes(value).decode('utf-8', errors='replace')
+    return value or ''
+
+
+def format_entry(entry):
+    """Línea de texto de una entrada, en el formato `short` de journalctl"""
+    timestamp = datetime.fromtimestamp(entry['timestamp']).strftime('%b %d %H:%M:%S')
+    ident = entry.get('identifier') or ''
+    if entry.get('pid'):
+        ident = f"{ident}[{entry['pid']}]"
+    return f"{timestamp} {ident}: {entry['message']}"
+
+
+class JournalctlSource:
+    """Entradas del journal de una unidad vía `journalctl -o json`
+    
+    Cada entrada trae su cursor (__CURSOR); con `--after-cursor` journalctl
+    devuelve solo las posteriores, sin volver a leer las ya enviadas.
+    """
+    
+    def __init__(self, journalctl='/usr/bin/journalctl', timeout=10):
+        self.journalctl = journalctl
+        self.timeout = timeout
+    
+    @staticmethod
+    def _parse(line):
+        record = json.loads(line)
+        return {
+            'cursor': record['__CURSOR'],
+            'timestamp': int(record.get('__REALTIME_TIMESTAMP') or 0) / 1e6,
+            'identifier': record.get('SYSLOG_IDENTIFIER') or record.get('_COMM'),
+            'pid': record.get('_PID') or record.get('SYSLOG_PID'),
+            'priority': int(record['PRIORITY']) if record.get('PRIORITY') else None,
+            'message': _message(record.get('MESSAGE'))
+        }
+    
+    def entries(self, service, lines=100, after_cursor=None):
+        """Últimas `lines` entradas de la unidad; con `after_cursor`, las primeras
+        `lines` posteriores al cursor (así responde journalctl)
+        
+        Raises:
+            InvalidCursor: Si journalctl no encuentra el cursor
+        """
+        command = [self.journalctl, '-u', unit_name(service), '-o', 'json', '-n', str(lines), '--no-pager']
+        if after_cursor:
+            command.append(f'--after-cursor={after_cursor}')
+        result = subprocess.run(command, capture_output=True, text=True, timeout=self.timeout)
+        if result.returncode != 0 and not result.stdout:
+            error = result.stderr.strip()
+            if after_cursor and 'cursor' in error.lower():
+                raise InvalidCursor(error)
+            raise RuntimeError(error or f'journalctl exited with {result.returncode}')
+        
+        entries = []
+        for line in result.stdout.splitlines():
+            try:
+                entries.append(self._parse(line))
+            except (ValueError, KeyError):
+                continue
+        return entries
+
+
+class FakeJournalSource:
+    """Journal falso para pruebas y desarrollo sin systemd
+    
+    Las entradas se toman del dict `journal` (servicio -> lista de mensajes o
+    de dicts de entrada) o de un archivo JSON con el mismo formato; el cursor
+    es la posición de la entrada. `append` agrega entradas en memoria.
+    """
+    
+    def __init__(self, journal=None, journal_file=None):
+        self.journal = journal or {}
+        self.journal_file = journal_file
+        self.calls = 0
+    
+    def _load(self):
+        if not self.journal_file:
+            return self.journal
+        try:
+            with open(self.journal_file, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return self.journal
+    
+    def append(self, service, message, **fields):
+        """Agrega una entrada al journal en memoria"""
+        fields.setdefault('timestamp', time.time())
+        self.journal.setdefault(service, []).append(dict(fields, message=message))
+    
+    def entries(self, service, lines=100, after_cursor=None):
+        self.calls += 1
+        records = self._load()
+        records = records.get(service, records.get(unit_name(service), []))
+        entries = []
+        for position, record in enumerate(records, 1):
+            if not isinstance(record, dict):
+                record = {'message': record}
+            entries.append({
+                'cursor': f'fake;{service};{position}',
+                'timestamp': record.get('timestamp', 0),
+                'identifier': record.get('identifier', service),
+                'pid': record.get('pid'),
+                'priority': record.get('priority', 6),
+                'message': record.get('message', '')
+            })
+        
+        if after_cursor:
+            prefix, _, position = after_cursor.rpartition(';')
+            if prefix != f'fake;{service}' or not position.isdigit() or int(position) > len(entries):
+                raise InvalidCursor(f'Failed to seek to cursor: {after_cursor}')
+            # Como journalctl con --after-cursor: las primeras `lines` posteriores
+            return entries[int(position):][:lines]
+        return entries[-lines:] if lines else []
+
+
+def _read_entries(source, service, lines, cursor, max_entries):
+    """Entradas desde un cursor (ver read_journal): (entradas, cursor, reset)"""
+    reset = cursor is None
+    if cursor is not None:
+        try:
+            entries = source.entries(service, lines=max_entries, after_cursor=cursor)
+            if len(entries) >= max_entries:
+                # Son las primeras posteriores al cursor (viejas): se salta al final
+                logger.info(f"Journal of {service} has {max_entries}+ new entries, reading from the end")
+                cursor = None
+                reset = True
+        except InvalidCursor as e:
+            logger.warning(f"Journal cursor of {service} no longer valid, reading from the end: {e}")
+            cursor = None
+            reset = True
+    if cursor is None:
+        entries = source.entries(service, lines=lines)
+    return entries, entries[-1]['cursor'] if entries else cursor, reset
+
+
+def _result(entries, cursor, reset):
+    return {
+        'logs': ''.join(f'{format_entry(entry)}\n' for entry in entries),
+        'count': len(entries),
+        'cursor': cursor,
+        'reset': reset
+    }
+
+
+def read_journal(source, service, lines=100, cursor=None, max_entries=DEFAULT_MAX_ENTRIES):
+    """Lee el journal de una unidad desde un cursor
+    
+    Args:
+        source: Fuente del journal (JournalctlSource o FakeJournalSource)
+        service: Nombre del servicio
+        lines: Entradas a devolver si no hay cursor
+        cursor: Cursor de la lectura anterior; None lee las últimas `lines`
+        max_entries: Máximo de entradas nuevas por lectura
+    
+    Returns:
+        dict: logs (texto), count, cursor (para la próxima lectura; el mismo
+            si no hubo entradas nuevas) y reset (el texto reemplaza al
+            anterior: no había cursor, no era válido o hubo `max_entries` o
+            más entradas nuevas; en esos casos se leen las últimas `lines`)
+    """
+    return _result(*_read_entries(source, service, lines, cursor, max_entries))
+
+
+class _UnitFeed:
+    """Entradas recientes de una unidad leídas por el seguimiento compartido"""
+    
+    def __init__(self, size):
+        self.lock = threading.Lock()
+        self.cursor = None
+        self.polled_at = None
+        self.entries = deque(maxlen=size)  # (secuencia, entrada)
+        self.positions = {}  # cursor -> secuencia
+        self.seq = 0
+    
+    def add(self, entries, reset):
+        if reset:
+            self.entries.clear()
+            self.positions.clear()
+        for entry in entries:
+            if len(self.entries) == self.entries.maxlen:
+                self.positions.pop(self.entries[0][1]['cursor'], None)
+            self.seq += 1
+            self.entries.append((self.seq, entry))
+            self.positions[entry['cursor']] = self.seq
+    
+    def after(self, cursor):
+        """Entradas posteriores a `cursor` (None si el cursor no está en el buffer)"""
+        if cursor == self.cursor:
+            return []
+        seq = self.positions.get(cursor)
+        if seq is None:
+            return None
+        return [entry for position, entry in self.entries if position > seq]
+
+
+class JournalFollower:
+    """Seguimiento del journal compartido entre los streams SSE de un proceso
+    
+    Cada unidad se lee a lo sumo una vez cada `interval` segundos (un solo
+    journalctl para todos los streams que la siguen); las entradas nuevas
+    quedan en un buffer de `max_entries` y cada stream toma las posteriores a
+    su cursor. Un stream cuyo cursor no está en el buffer (se conectó entre
+    dos lecturas o quedó muy atrás) lee por su cuenta hasta alcanzarlo.
+    """
+    
+    def __init__(self, source, interval=2, max_entries=DEFAULT_MAX_ENTRIES):
+        self.source = source
+        self.interval = interval
+        self.max_entries = max_entries
+        self._feeds = {}
+        self._lock = threading.Lock()
+    
+    def _feed(self, service):
+        with self._lock:
+            if service not in self._feeds:
+                self._feeds[service] = _UnitFeed(self.max_entries)
+            return self._feeds[service]
+    
+    def read(self, service, cursor, lines=100):
+        """Entradas posteriores a `cursor`, con el formato de read_journal"""
+        feed = self._feed(service)
+        with feed.lock:
+            now = time.monotonic()
+            if feed.polled_at is None or now - feed.polled_at >= self.interval:
+                feed.polled_at = now
+                # La primera lectura solo fija la posición (la última entrada)
+                entries, feed.cursor, reset = _read_entries(
+                    self.source, service, 1, feed.cursor, self.max_entries)
+                feed.add(entries, reset)
+            entries = feed.after(cursor)
+        
+        if entries is None:
+            return read_journal(self.source, service, lines=lines, cursor=cursor, max_entries=self.max_entries)
+        return _result(entries, entries[-1]['cursor'] if entries else cursor, False)
+
+
+_sources = {}
+_followers = {}
+
+
+def get_journal_source(config):
+    """Fuente del journal configurada (JOURNAL_BACKEND), una por proceso"""
+    name = config.get('JOURNAL_BACKEND', 'journalctl')
+    if name not in _sources:
+        if name == 'fake':
+            _sources[name] = FakeJournalSource(journal_file=config.get('JOURNAL_FAKE_FILE') or None)
+        else:
+            _sources[name] = JournalctlSource()
+    return _sources[name]
+
+
+def get_journal_follower(config):
+    """Seguimiento compartido de la fuente configurada, uno por proceso"""
+    source = get_journal_source(config)
+    if id(source) not in _followers:
+        _followers[id(source)] = JournalFollower(source, interval=config.get('JOURNAL_FOLLOW_INTERVAL', 2))
+    return _followers[id(source)]
@@ -0,0 +1,177 @@
+import os
+
+# Máximo de bytes devueltos por lectura incremental
+DEFAULT_MAX_BYTES = 256 * 1024
+
+
+def complete_utf8_length(data):
+    """Largo del prefijo de `data` que no corta un carácter UTF-8 multibyte
+    
+    El script puede estar a mitad de escribir un carácter (los logs usan
+    emojis); los bytes incompletos se dejan para la próxima lectura.
+    """
+    for back in range(1, min(4, len(data)) + 1):
+        byte = data[-back]
+        if byte & 0xC0 == 0x80:
+            continue  # Byte de continuación: seguir buscando el inicial
+        if byte >= 0xC0:
+            needed = 2 if byte < 0xE0 else 3 if byte < 0xF0 else 4
+            if needed > back:
+                return len(data) - back
+        return len(data)
+    return len(data)
+
+
+def read_incremental(path, offset=None, inode=None, tail_bytes=None, max_bytes=DEFAULT_MAX_BYTES):
+    """Lee de un log solo los bytes nuevos desde un cursor
+    
+    Args:
+        path: Ruta del log
+        offset: Byte desde el que leer (cursor devuelto por la lectura anterior).
+            None lee los últimos `tail_bytes` (o todo el archivo si es None)
+        inode: Inodo de la lectura anterior; si el archivo fue reemplazado
+            (otro inodo) o truncado (tamaño menor al offset) se relee desde 0
+        max_bytes: Máximo a devolver por llamada (None = sin límite)
+    
+    Returns:
+        dict: exists, log, offset (próximo cursor), inode, size, reset (el
+            contenido reemplaza al anterior en vez de agregarse) y more (quedan
+            bytes por leer)
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except FileNotFoundError:
+        return {'exists': False, 'log': '', 'offset': 0, 'inode': None, 'size': 0, 'reset': False, 'more': False}
+    
+    try:
+        # Inodo y tamaño del mismo descriptor que se lee
+        st = os.fstat(fd)
+        size = st.st_size
+        reset = False
+        if offset is None:
+            start = max(size - tail_bytes, 0) if tail_bytes else 0
+            reset = True
+        elif (inode is not None and inode != st.st_ino) or offset > size:
+            start = 0
+            reset = True
+        else:
+            start = max(offset, 0)
+        
+        length = size - start
+        if max_bytes is not None:
+            length = min(length, max_bytes)
+        data = os.pread(fd, length, start) if length > 0 else b''
+    finally:
+        os.close(fd)
+    
+    if offset is None and start > 0:
+        # El tail puede empezar a mitad de un carácter
+        skip = 0
+        while skip < min(3, len(data)) and data[skip] & 0xC0 == 0x80:
+            skip += 1
+        data, start = data[skip:], start + skip
+    data = data[:complete_utf8_length(data)]
+    end = start + len(data)
+    return {
+        'exists': True,
+        'log': data.decode('utf-8', errors='replace'),
+        'offset': end,
+        'inode': st.st_ino,
+        'size': size,
+        'reset': reset,
+        'more': end < size
+    }
+
+
+def page_args(args, default_lines=1000, max_lines=5000):
+    """Parámetros de tail_lines (lines, before, inode) tomados de un query string"""
+    return {
+        'lines': max(1, min(args.get('lines', default=default_lines, type=int), max_lines)),
+        'before': args.get('before', type=int),
+        'inode': args.get('inode', type=int)
+    }
+
+
+# Bloque leído en cada paso hacia atrás al buscar líneas desde el final
+TAIL_BLOCK_SIZE = 64 * 1024
+# Tope de bytes devueltos por tail_lines (líneas muy largas)
+TAIL_MAX_BYTES = 4 * 1024 * 1024
+
+
+def tail_lines(path, lines=100, before=None, inode=None, block_size=TAIL_BLOCK_SIZE, max_bytes=TAIL_MAX_BYTES):
+    """Últimas `lines` líneas de un archivo sin leerlo completo
+    
+    Lee hacia atrás desde el final en bloques de `block_size` contando saltos
+    de línea hasta juntar las pedidas; el costo depende de las líneas
+    devueltas y no del tamaño del log. Con `before` (el `start` de una
+    respuesta anterior) pagina más atrás en el historial.
+    
+    Se usa pread en lugar de mmap: si logrotate trunca el archivo (copytruncate)
+    mientras se lee, un acceso a la página mapeada mataría al worker con SIGBUS.
+    
+    Args:
+        path: Ruta del log
+        lines: Cantidad de líneas
+        before: Byte donde termina la página (exclusivo); None = fin del archivo
+        inode: Inodo de la respuesta anterior; si cambió (log rotado) se
+            ignora `before` y se lee desde el final
+        block_size: Bytes por lectura hacia atrás
+        max_bytes: Máximo de bytes devueltos
+    
+    Returns:
+        dict: exists, log, lines (cantidad), start (cursor para la página
+            anterior), end, size, inode, has_more (hay líneas antes de start)
+            y reset (se ignoró `before` porque el log rotó)
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except FileNotFoundError:
+        return {'exists': False, 'log': '', 'lines': 0, 'start': 0, 'end': 0, 'size': 0,
+                'inode': None, 'has_more': False, 'reset': False}
+    
+    try:
+        st = os.fstat(fd)
+        size = st.st_size
+        reset = before is not None and inode is not None and inode != st.st_ino
+        end = size if before is None or reset else max(min(before, size), 0)
+        
+        # Un salto de línea final cierra la última línea, no abre una vacía
+        cursor = end
+        if cursor > 0 and os.pread(fd, 1, cursor - 1) == b'\n':
+            cursor -= 1
+        
+        start = 0
+        needed = lines
+        while cursor > 0 and needed > 0:
+            block_start = max(cursor - block_size, 0)
+            block = os.pread(fd, cursor - block_start, block_start)
+            count = block.count(b'\n')
+            if count >= needed:
+                index = len(block)
+                for _ in range(needed):
+                    index = block.rfind(b'\n', 0, index)
+                start = block_start + index + 1
+                break
+            needed -= count
+            cursor = block_start
+            if end - cursor >= max_bytes:
+                start = cursor
+                break
+        
+        start = max(start, end - max_bytes)
+        data = os.pread(fd, end - start, start) if end > start else b''
+    finally:
+        os.close(fd)
+    
+    text = data.decode('utf-8', errors='replace')
+    return {
+        'exists': True,
+        'log': text,
+        'lines': text.count('\n') + (1 if text and not text.endswith('\n') else 0),
+        'start': start,
+        'end': end,
+        'size': size,
+        'inode': st.st_ino,
+        'has_more': start > 0,
+        'reset': reset
+    }
@@ -0,0 +1,100 @@
+import json
+from datetime import datetime, timezone
+
+from flask import Response, jsonify
+
+try:
+    import msgpack
+except ImportError:  # Dependencia opcional
+    msgpack = None
+
+COLUMNAR_MIMETYPE = 'application/vnd.serverpanel.columnar+json'
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack', 'application/vnd.msgpack')
+
+# Decimales con que se envían los valores en las codificaciones compactas
+DEFAULT_PRECISION = 2
+
+
+def negotiate(accept_mimetypes):
+    """Elige la codificación de la respuesta según el Accept del cliente
+    
+    Returns:
+        str: 'msgpack', 'columnar' o 'json' (formato clásico)
+    """
+    # JSON primero: ante igual calidad (p. ej. */*) se mantiene el formato clásico
+    offered = ['application/json', COLUMNAR_MIMETYPE]
+    if msgpack is not None:
+        offered += list(MSGPACK_MIMETYPES)
+    best = accept_mimetypes.best_match(offered, default='application/json')
+    if best in MSGPACK_MIMETYPES:
+        return 'msgpack'
+    if best == COLUMNAR_MIMETYPE:
+        return 'columnar'
+    return 'json'
+
+
+def _epoch(value):
+    """Segundos desde epoch de un datetime naive en UTC o de un ISO"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return int(value.replace(tzinfo=timezone.utc).timestamp())
+
+
+def rows_to_columns(rows, fields):
+    """Convierte filas (dicts con 'timestamp') en timestamps epoch y columnas"""
+    timestamps = [_epoch(row['timestamp']) for row in rows]
+    columns = {field: [row.get(field) for row in rows] for field in fields}
+    return timestamps, columns
+
+
+def encode_columns(timestamps, columns, precision=DEFAULT_PRECISION, scaled=False, **meta):
+    """Serie columnar compacta
+    
+    Los timestamps van como el primero (`t0`) más las diferencias entre
+    consecutivos (`dt`, con dt[0] = 0): con muestreo regular son enteros
+    chicos y repetidos. Los valores se redondean a `precision` decimales; con
+    `scaled` se envían como enteros multiplicados por `scale` (10^precision),
+    que en MessagePack ocupan bastante menos que un float64.
+    """
+    deltas = [0] + [b - a for a, b in zip(timestamps, timestamps[1:])] if timestamps else []
+    scale = 10 ** precision
+    
+    def encode(value):
+        if value is None:
+            return None
+        if scaled:
+            return int(round(value * scale))
+        return round(value, precision) if isinstance(value, float) else value
+    
+    payload = dict(meta)
+    payload.update({
+        'count': len(timestamps),
+        't0': timestamps[0] if timestamps else None,
+        'dt': deltas,
+        'precision': precision,
+        'fields': {field: [encode(v) for v in values] for field, values in columns.items()}
+    })
+    if scaled:
+        payload['scale'] = scale
+    return payload
+
+
+def respond(fmt, json_payload, timestamps, columns, **meta):
+    """Arma la respuesta en la codificación negociada
+    
+    Args:
+        fmt: Resultado de negotiate()
+        json_payload: Cuerpo para el formato JSON clásico
+        timestamps, columns: Serie para las codificaciones compactas
+        meta: Claves extra de las codificaciones compactas (resolution, step...)
+    """
+    if fmt == 'json':
+        response = jsonify(json_payload)
+    elif fmt == 'msgpack':
+        payload = encode_columns(timestamps, columns, scaled=True, **meta)
+        response = Response(msgpack.packb(payload, use_bin_type=True), mimetype=MSGPACK_MIMETYPES[0])
+    else:
+        payload = encode_columns(timestamps, columns, **meta)
+        response = Response(json.dumps(payload, separators=(',', ':')), mimetype=COLUMNAR_MIMETYPE)
+    response.vary.add('Accept')
+    return response
@@ -0,0 +1,308 @@
+import logging
+from datetime import datetime, timedelta
+
+from config import Config
+from models import db, MetricsHistory, MetricsRollup1m, MetricsRollup15m, MetricsRollup1h, InstanceMetricsHistory, NginxMetricsHistory
+
+logger = logging.getLogger(__name__)
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def floor_time(dt, seconds):
+    """Redondea un datetime hacia abajo al múltiplo de `seconds` (desde epoch)"""
+    step = timedelta(seconds=seconds)
+    return EPOCH + ((dt - EPOCH) // step) * step
+
+
+class RollupTier:
+    """Nivel de resolución del historial de métricas"""
+
+    def __init__(self, name, model, seconds, retention, source=None):
+        self.name = name
+        self.model = model
+        self.seconds = seconds
+        self.retention = retention
+        self.source = source  # Nivel del que se agrega (None = datos crudos)
+
+    @property
+    def time_column(self):
+        """Columna de tiempo del modelo"""
+        if self.model is MetricsHistory:
+            return MetricsHistory.timestamp
+        return self.model.bucket_start
+
+
+class MetricsRollupManager:
+    """Agregación del historial de métricas en niveles de 1m, 15m y 1h
+
+    Cada nivel se calcula desde el anterior (crudo -> 1m -> 15m -> 1h) y
+    guarda mínimo, promedio (ponderado por cantidad de muestras) y máximo.
+    Cada ejecución recalcula los últimos buckets dentro de una ventana de
+    gracia, así las muestras que llegan tarde quedan incluidas. La retención
+    de cada nivel se configura por separado.
+    """
+
+    FIELDS = MetricsRollup1m.FIELDS
+    PERCENTILE_MIN_ROWS = 15
+
+    def __init__(self, config=None):
+        config = config or Config
+        self.grace = timedelta(seconds=getattr(config, 'METRICS_ROLLUP_GRACE_SECONDS', 600))
+        self.max_points = getattr(config, 'METRICS_HISTORY_MAX_POINTS', 1500)
+
+        self.raw = RollupTier(
+            'raw', MetricsHistory, getattr(config, 'METRICS_HISTORY_INTERVAL', 60),
+            timedelta(hours=getattr(config, 'METRICS_RAW_RETENTION_HOURS', 48))
+        )
+        tier_1m = RollupTier(
+            '1m', MetricsRollup1m, 60,
+            timedelta(days=getattr(config, 'METRICS_ROLLUP_1M_RETENTION_DAYS', 7)),
+            source=self.raw
+        )
+        tier_15m = RollupTier(
+            '15m', MetricsRollup15m, 15 * 60,
+            timedelta(days=getattr(config, 'METRICS_ROLLUP_15M_RETENTION_DAYS', 90)),
+            source=tier_1m
+        )
+        tier_1h = RollupTier(
+            '1h', MetricsRollup1h, 3600,
+            timedelta(days=getattr(config, 'METRICS_ROLLUP_1H_RETENTION_DAYS', 730)),
+            source=tier_15m
+        )
+        self.rollup_tiers = [tier_1m, tier_15m, tier_1h]
+        self.tiers = [self.raw] + self.rollup_tiers
+        self.instance_retention = timedelta(days=getattr(config, 'METRICS_INSTANCE_RETENTION_DAYS', 7))
+
+    def get_tier(self, name):
+        """Obtiene un nivel por nombre ('raw', '1m', '15m', '1h')"""
+        return next((t for t in self.tiers if t.name == name), None)
+
+    def choose_tier(self, window_seconds):
+        """Elige el nivel más fino que cubre la ventana sin pasar de max_points filas"""
+        for tier in self.tiers:
+            if window_seconds <= tier.retention.total_seconds() and window_seconds / tier.seconds <= self.max_points:
+                return tier
+        return self.tiers[-1]
+
+    def run(self, now=None):
+        """Agrega los buckets cerrados de cada nivel y aplica la retención"""
+        now = now or datetime.utcnow()
+        try:
+            for tier in self.rollup_tiers:
+                self._rollup_tier(tier, now)
+            self._apply_retention(now)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    def _rollup_tier(self, tier, now):
+        """Recalcula los buckets de un nivel desde su última marca (menos la gracia)"""
+        end = floor_time(now, tier.seconds)
+        source_column = tier.source.time_column
+
+        last_bucket = db.session.query(db.func.max(tier.model.bucket_start)).scalar()
+        if last_bucket is not None:
+            start = floor_time(last_bucket - self.grace, tier.seconds)
+        else:
+            first_source = db.session.query(db.func.min(source_column)).filter(
+                source_column >= now - tier.source.retention
+            ).scalar()
+            if first_source is None:
+                return 0
+            start = floor_time(first_source, tier.seconds)
+
+        if start >= end:
+            return 0
+
+        rows = tier.source.model.query.filter(
+            source_column >= start,
+            source_column < end
+        ).order_by(source_column).all()
+
+        buckets = {}
+        for row in rows:
+            bucket = floor_time(getattr(row, source_column.key), tier.seconds)
+            buckets.setdefault(bucket, []).append(row)
+
+        # Reemplazar los buckets del rango (idempotente)
+        tier.model.query.filter(
+            tier.model.bucket_start >= start,
+            tier.model.bucket_start < end
+        ).delete(synchronize_session=False)
+
+        for bucket_start, bucket_rows in buckets.items():
+            db.session.add(self._aggregate(tier, bucket_start, bucket_rows))
+
+        return len(buckets)
+
+    def _aggregate(self, tier, bucket_start, rows):
+        """Construye la fila agregada de un bucket"""
+        from_raw = tier.source.model is MetricsHistory
+        rollup = tier.model(bucket_start=bucket_start)
+
+        counts = [1 if from_raw else (row.sample_count or 0) for row in rows]
+        rollup.sample_count = sum(counts)
+
+        for field in self.FIELDS:
+            if from_raw:
+                values = [(getattr(row, field), getattr(row, field), getattr(row, field), 1) for row in rows]
+            else:
+                values = [
+                    (getattr(row, f'{field}_min'), getattr(row, f'{field}_avg'), getattr(row, f'{field}_max'), count)
+                    for row, count in zip(rows, counts)
+                ]
+            values = [v for v in values if v[1] is not None]
+            if not values:
+                continue
+
+            weight = sum(max(v[3], 1) for v in values)
+            setattr(rollup, f'{field}_min', min(v[0] for v in values))
+            setattr(rollup, f'{field}_avg', round(sum(v[1] * max(v[3], 1) for v in values) / weight, 2))
+            setattr(rollup, f'{field}_max', max(v[2] for v in values))
+
+        last = rows[-1]
+        rollup.ram_total_gb = last.ram_total_gb
+        rollup.disk_total_gb = last.disk_total_gb
+        return rollup
+
+    def _apply_retention(self, now):
+        """Elimina de cada nivel las filas más viejas que su retención"""
+        for tier in self.tiers:
+            deleted = tier.model.query.filter(
+                tier.time_column < now - tier.retention
+            ).delete(synchronize_session=False)
+            if deleted:
+                logger.info(f"Metrics retention: {deleted} rows removed from {tier.name}")
+
+        deleted = InstanceMetricsHistory.query.filter(
+            InstanceMetricsHistory.timestamp < now - self.instance_retention
+        ).delete(synchronize_session=False)
+        if deleted:
+            logger.info(f"Metrics retention: {deleted} rows removed from instance history")
+        
+        deleted = NginxMetricsHistory.query.filter(
+            NginxMetricsHistory.timestamp < now - self.instance_retention
+        ).delete(synchronize_session=False)
+        if deleted:
+            logger.info(f"Metrics retention: {deleted} rows removed from nginx history")
+    
+    def choose_source_tier(self, start, step, min_rows=1, now=None):
+        """Nivel más grueso con al menos `min_rows` filas por bucket de `step`
+        segundos cuya retención cubre `start`
+        
+        Si ninguno entra en el step se usa el más fino que todavía tenga datos
+        desde `start` (o el de mayor retención).
+        """
+        now = now or datetime.utcnow()
+        covering = [t for t in self.tiers if start >= now - t.retention]
+        candidates = [t for t in covering if t.seconds * min_rows <= step]
+        if candidates:
+            return candidates[-1]
+        return covering[0] if covering else self.tiers[-1]
+    
+    @staticmethod
+    def _epoch_seconds(column):
+        """Expresión SQL con los segundos desde epoch de una columna DateTime (UTC)"""
+        if db.engine.dialect.name == 'postgresql':
+            return db.cast(db.func.extract('epoch', column), db.BigInteger)
+        return db.cast(db.func.strftime('%s', column), db.BigInteger)
+    
+    def _value_expression(self, tier, field, agg):
+        """Expresión de agregación de un campo según el nivel de origen
+        
+        En los niveles agregados: avg es el promedio ponderado por muestras,
+        min/max usan las columnas _min/_max y p95 se calcula sobre los
+        promedios de cada bucket (aproximación).
+        """
+        model = tier.model
+        if tier is self.raw:
+            column = getattr(model, field)
+        elif agg == 'min':
+            column = getattr(model, f'{field}_min')
+        elif agg == 'max':
+            column = getattr(model, f'{field}_max')
+        else:
+            column = getattr(model, f'{field}_avg')
+        
+        if agg == 'avg' and tier is not self.raw:
+            weight = db.case((column.isnot(None), model.sample_count), else_=0)
+            return db.func.sum(column * model.sample_count) / db.func.nullif(db.func.sum(weight), 0)
+        if agg == 'p95':
+            return db.func.percentile_cont(0.95).within_group(column)
+        return {'avg': db.func.avg, 'min': db.func.min, 'max': db.func.max}[agg](column)
+    
+    def bucketed_query(self, start, end, step, fields, agg='avg'):
+        """Agrega el historial en buckets de `step` segundos dentro de la base
+        
+        Args:
+            start, end: Rango [start, end) en UTC
+            step: Tamaño del bucket en segundos
+            fields: Campos de FIELDS a devolver
+            agg: 'avg', 'min', 'max' o 'p95'
+        
+        Returns:
+            dict: timestamps (epoch de inicio de cada bucket con datos),
+                columnas por campo y nivel de origen usado
+        """
+        # Un percentil necesita varias filas por bucket para ser representativo
+        tier = self.choose_source_tier(start, step, min_rows=self.PERCENTILE_MIN_ROWS if agg == 'p95' else 1)
+        column = tier.time_column
+        bucket = (self._epoch_seconds(column) // step) * step
+        
+        if agg == 'p95' and db.engine.dialect.name != 'postgresql':
+            columns = self._bucketed_percentile(tier, bucket, start, end, fields, 0.95)
+        else:
+            query = db.session.query(
+                bucket.label('bucket'),
+                *[self._value_expression(tier, field, agg).label(field) for field in fields]
+            ).filter(column >= start, column < end).group_by(bucket).order_by(bucket)
+            
+            columns = {'timestamps': []}
+            columns.update({field: [] for field in fields})
+            for row in query.all():
+                columns['timestamps'].append(int(row.bucket))
+                for field in fields:
+                    value = getattr(row, field)
+                    columns[field].append(round(float(value), 2) if value is not None else None)
+        
+        columns['resolution'] = tier.name
+        return columns
+    
+    def _bucketed_percentile(self, tier, bucket, start, end, fields, quantile):
+        """Percentil por bucket en Python (bases sin percentile_cont, p. ej. SQLite)"""
+        value_columns = [
+            getattr(tier.model, field if tier is self.raw else f'{field}_avg') for field in fields
+        ]
+        rows = db.session.query(bucket.label('bucket'), *value_columns).filter(
+            tier.time_column >= start, tier.time_column < end
+        ).order_by(bucket).all()
+        
+        grouped = {}
+        for row in rows:
+            grouped.setdefault(int(row[0]), []).append(row[1:])
+        
+        columns = {'timestamps': list(grouped)}
+        for i, field in enumerate(fields):
+            columns[field] = []
+            for values in grouped.values():
+                values = sorted(v[i] for v in values if v[i] is not None)
+                columns[field].append(round(self._percentile(values, quantile), 2) if values else None)
+        return columns
+    
+    @staticmethod
+    def _percentile(values, quantile):
+        """Percentil con interpolación lineal (como percentile_cont)"""
+        position = (len(values) - 1) * quantile
+        lower = int(position)
+        upper = min(lower + 1, len(values) - 1)
+        return values[lower] + (values[upper] - values[lower]) * (position - lower)
+    
+    def query(self, tier, start, end=None):
+        """Devuelve las filas de un nivel en [start, end) ordenadas por tiempo"""
+        column = tier.time_column
+        query = tier.model.query.filter(column >= start)
+        if end is not None:
+            query = query.filter(column < end)
+        return query.order_by(column.asc()).all()
@@ -0,0 +1,127 @@
+import os
+import json
+import mmap
+import fcntl
+import struct
+import logging
+import tempfile
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class SharedMetricsStore:
+    """Snapshot de métricas compartido entre workers en un segmento mmap
+
+    Un único proceso escritor (el que obtiene el lock del segmento) publica
+    cada muestra; el resto de los workers de gunicorn solo leen. Así los
+    contadores de red y las velocidades derivadas son las mismas sin importar
+    qué worker responda.
+
+    Formato del segmento: cabecera (secuencia, versión, longitud, instante de
+    escritura) seguida del snapshot en JSON. La secuencia funciona como seqlock: es impar mientras
+    el escritor está copiando y los lectores reintentan.
+    """
+
+    HEADER = struct.Struct('<QQId')
+    READ_RETRIES = 50
+
+    def __init__(self, path=None, size=1024 * 1024):
+        self.path = path or self.default_path()
+        self.size = size
+        self._mm = None
+        self._fd = None
+        self._lock_fd = None
+        self._pid = None
+
+    @staticmethod
+    def default_path():
+        """Ruta por defecto: /dev/shm si existe (tmpfs), si no el tmp del sistema"""
+        base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+        return os.path.join(base, 'server-panel-metrics')
+
+    def _open(self):
+        """Abre (o crea) el segmento en este proceso"""
+        if self._mm is not None and self._pid == os.getpid():
+            return
+
+        # Tras un fork el lock heredado pertenece al padre: soltar la copia
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+        if self._fd is not None:
+            os.close(self._fd)
+
+        self._pid = os.getpid()
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(fd).st_size < self.size:
+            os.ftruncate(fd, self.size)
+        self._fd = fd
+        self._mm = mmap.mmap(fd, self.size, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+
+    def try_acquire_writer(self):
+        """Intenta convertirse en el escritor único (no bloquea)
+
+        El lock se libera solo cuando el proceso muere, así otro worker toma
+        el relevo en su siguiente intento.
+        """
+        self._open()
+        if self._lock_fd is not None:
+            return True
+
+        fd = os.open(self.path + '.lock', os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+
+        self._lock_fd = fd
+        logger.info(f"Process {os.getpid()} is now the metrics writer ({self.path})")
+        return True
+
+    def is_writer(self):
+        """Indica si este proceso es el escritor"""
+        return self._lock_fd is not None and self._pid == os.getpid()
+
+    def write(self, snapshot):
+        """Publica un snapshot y devuelve su versión"""
+        self._open()
+        payload = json.dumps(snapshot, separators=(',', ':')).encode('utf-8')
+        if len(payload) > self.size - self.HEADER.size:
+            raise ValueError(f"Snapshot de {len(payload)} bytes no entra en el segmento ({self.size} bytes)")
+
+        seq, version, _, _ = self.HEADER.unpack_from(self._mm, 0)
+        version += 1
+        now = time.time()
+        # Secuencia impar: escritura en curso
+        self.HEADER.pack_into(self._mm, 0, seq + 1, version, len(payload), now)
+        self._mm[self.HEADER.size:self.HEADER.size + len(payload)] = payload
+        self.HEADER.pack_into(self._mm, 0, seq + 2, version, len(payload), now)
+        return version
+
+    def read_version(self):
+        """Devuelve la versión publicada (0 si nunca se escribió)"""
+        self._open()
+        return self.HEADER.unpack_from(self._mm, 0)[1]
+
+    def read(self):
+        """Devuelve (versión, instante de escritura, snapshot)
+
+        Si el segmento está vacío o no se logra una lectura consistente
+        devuelve (0, 0, None).
+        """
+        self._open()
+        for _ in range(self.READ_RETRIES):
+            seq, version, length, written_at = self.HEADER.unpack_from(self._mm, 0)
+            if seq % 2:
+                continue
+            payload = self._mm[self.HEADER.size:self.HEADER.size + length]
+            if self.HEADER.unpack_from(self._mm, 0)[0] != seq:
+                continue
+            if version == 0:
+                return 0, 0, None
+            return version, written_at, json.loads(payload)
+
+        logger.warning("Could not get a consistent metrics snapshot (writer busy)")
+        return 0, 0, None
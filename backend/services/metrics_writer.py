@@ -0,0 +1,212 @@
+import os
+import time
+import atexit
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsHistoryWriter:
+    """Escritor en lote del historial de métricas
+    
+    Recibe las muestras del muestreador (solo en el proceso escritor), guarda
+    una cada METRICS_HISTORY_INTERVAL segundos en un buffer y cada
+    METRICS_FLUSH_INTERVAL segundos las inserta todas en un único executemany.
+    Si la base de datos no está disponible las filas quedan en el buffer,
+    acotado a METRICS_WRITER_BACKLOG filas (se descartan las más viejas).
+    Después de cada flush actualiza los niveles de agregación.
+    
+    El consumo por instancia (clave 'instances' del snapshot) se guarda en
+    instance_metrics_history cada METRICS_INSTANCE_HISTORY_INTERVAL segundos y
+    el tráfico por dominio (clave 'nginx') en nginx_metrics_history una vez por
+    ventana cerrada.
+    """
+    
+    def __init__(self, history_interval=60, flush_interval=60, max_backlog=10000, instance_interval=60):
+        self.app = None
+        self.history_interval = history_interval
+        self.instance_interval = instance_interval
+        self.flush_interval = flush_interval
+        self.max_backlog = max_backlog
+        self.rollup_manager = None
+        self._buffer = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._last_record = 0
+        self._last_instance_record = 0
+        self._last_nginx_window = None
+        self._dropped = 0
+        self._thread = None
+        self._pid = None
+    
+    def init_app(self, app):
+        """Toma la configuración de la app"""
+        from services.metrics_rollup import MetricsRollupManager
+        
+        self.app = app
+        self.history_interval = app.config.get('METRICS_HISTORY_INTERVAL', self.history_interval)
+        self.flush_interval = app.config.get('METRICS_FLUSH_INTERVAL', self.flush_interval)
+        self.max_backlog = app.config.get('METRICS_WRITER_BACKLOG', self.max_backlog)
+        self.instance_interval = app.config.get('METRICS_INSTANCE_HISTORY_INTERVAL', self.instance_interval)
+        self.rollup_manager = MetricsRollupManager(app.config)
+    
+    def record(self, metrics):
+        """Agrega una muestra al buffer respetando el intervalo del historial"""
+        now = time.monotonic()
+        rows = []
+        if now - self._last_record >= self.history_interval:
+            self._last_record = now
+            rows.append(('host', self._to_row(metrics)))
+        if metrics.get('instances') and now - self._last_instance_record >= self.instance_interval:
+            self._last_instance_record = now
+            rows.extend(('instance', row) for row in self._to_instance_rows(metrics['instances']))
+        nginx = metrics.get('nginx') or {}
+        if nginx.get('window_end') and nginx['window_end'] != self._last_nginx_window:
+            self._last_nginx_window = nginx['window_end']
+            rows.extend(('nginx', row) for row in self._to_nginx_rows(nginx))
+        if not rows:
+            return
+        
+        with self._lock:
+            for item in rows:
+                if len(self._buffer) >= self.max_backlog:
+                    self._buffer.popleft()
+                    self._dropped += 1
+                    if self._dropped % 100 == 1:
+                        logger.warning(f"Metrics backlog full ({self.max_backlog} rows), {self._dropped} oldest samples dropped")
+                self._buffer.append(item)
+        
+        self._ensure_started()
+    
+    @staticmethod
+    def _to_row(metrics):
+        """Convierte un snapshot del muestreador en una fila de metrics_history"""
+        disk = metrics['disk'][0] if metrics.get('disk') else {}
+        return {
+            'timestamp': datetime.utcnow(),
+            'cpu_percent': metrics['cpu']['percent'],
+            'ram_percent': metrics['memory']['percent'],
+            'ram_used_gb': metrics['memory']['used_gb'],
+            'ram_total_gb': metrics['memory']['total_gb'],
+            'disk_percent': disk.get('percent'),
+            'disk_used_gb': disk.get('used_gb'),
+            'disk_total_gb': disk.get('total_gb'),
+            'network_sent_mb': metrics['network']['mb_sent'],
+            'network_recv_mb': metrics['network']['mb_recv']
+        }
+    
+    @staticmethod
+    def _to_instance_rows(instances):
+        """Convierte el consumo por instancia en filas de instance_metrics_history"""
+        timestamp = datetime.utcnow()
+        return [{
+            'timestamp': timestamp,
+            'instance_name': name,
+            'cpu_percent': usage.get('cpu_percent'),
+            'memory_mb': usage.get('memory_mb'),
+            'rss_mb': usage.get('rss_mb'),
+            'io_read_mb_s': usage.get('io_read_mb_s'),
+            'io_write_mb_s': usage.get('io_write_mb_s')
+        } for name, usage in instances.items()]
+    
+    @staticmethod
+    def _to_nginx_rows(nginx):
+        """Convierte la última ventana de tráfico en filas de nginx_metrics_history"""
+        timestamp = datetime.fromisoformat(nginx['window_end'])
+        return [{
+            'timestamp': timestamp,
+            'domain': domain,
+            'instance_name': stats.get('instance'),
+            'requests': stats.get('requests'),
+            'rps': stats.get('rps'),
+            'bytes_sent': stats.get('bytes_sent'),
+            'status_2xx': stats.get('status_2xx'),
+            'status_3xx': stats.get('status_3xx'),
+            'status_4xx': stats.get('status_4xx'),
+            'status_5xx': stats.get('status_5xx'),
+            'error_rate': stats.get('error_rate'),
+            'p50_ms': stats.get('p50_ms'),
+            'p95_ms': stats.get('p95_ms'),
+            'p99_ms': stats.get('p99_ms'),
+            'avg_ms': stats.get('avg_ms'),
+            'upstream_p95_ms': stats.get('upstream_p95_ms')
+        } for domain, stats in nginx.get('domains', {}).items()]
+    
+    def pending(self):
+        """Cantidad de filas esperando ser escritas"""
+        return len(self._buffer)
+    
+    def _ensure_started(self):
+        """Inicia el hilo de flush en este proceso si no está corriendo"""
+        if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='metrics-writer', daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+    
+    def _run(self):
+        """Bucle de flush periódico"""
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+    
+    def flush(self):
+        """Inserta el buffer en una sola operación y actualiza los rollups
+        
+        Returns:
+            int: Filas escritas (0 si no había o si la base falló)
+        """
+        if self.app is None:
+            return 0
+        
+        with self._flush_lock:
+            with self._lock:
+                rows = list(self._buffer)
+            if not rows:
+                return 0
+            
+            from models import db, MetricsHistory, InstanceMetricsHistory, NginxMetricsHistory
+            tables = {
+                'host': MetricsHistory.__table__,
+                'instance': InstanceMetricsHistory.__table__,
+                'nginx': NginxMetricsHistory.__table__
+            }
+            
+            with self.app.app_context():
+                try:
+                    try:
+                        # Un executemany por tabla, en la misma transacción
+                        for key, table in tables.items():
+                            table_rows = [row for kind, row in rows if kind == key]
+                            if table_rows:
+                                db.session.execute(table.insert(), table_rows)
+                        db.session.commit()
+                    except Exception as e:
+                        db.session.rollback()
+                        logger.error(f"Error writing {len(rows)} metrics rows, keeping them for retry: {e}")
+                        return 0
+                    
+                    # Solo se quitan del buffer las filas escritas (pudo descartarse alguna mientras tanto)
+                    written = {id(row) for row in rows}
+                    with self._lock:
+                        self._buffer = deque(row for row in self._buffer if id(row) not in written)
+                    
+                    try:
+                        self.rollup_manager.run()
+                    except Exception as e:
+                        logger.error(f"Error updating metrics rollups: {e}")
+                finally:
+                    db.session.remove()
+            
+            return len(rows)
+
+
+# Escritor compartido (solo escribe en el proceso escritor del muestreador)
+metrics_writer = MetricsHistoryWriter()
@@ -0,0 +1,201 @@
+import re
+import math
+import time
+import threading
+from datetime import datetime
+
+# Formato combined: "$request" $status $body_bytes_sent "$http_referer" "$http_user_agent" [extra]
+COMBINED_TAIL = re.compile(rb'"[^"]*" (\d{3}) (\d+|-) "[^"]*" "[^"]*"(.*)$')
+# Tiempos con nombre (rt=0.123 urt=0.120 / request_time=... upstream_response_time=...)
+NAMED_TIMING = re.compile(rb'\b(rt|urt|request_time|upstream_response_time)=([\d.]+)')
+# Tiempos sin nombre al final de la línea ($request_time $upstream_response_time)
+PLAIN_TIMING = re.compile(rb'(?<![\w.:])(\d+\.\d+)(?![\w.])')
+
+STATUS_CLASSES = ('2xx', '3xx', '4xx', '5xx')
+QUANTILES = (('p50', 0.50), ('p95', 0.95), ('p99', 0.99))
+
+
+def parse_access_line(line):
+    """Extrae estado, bytes y tiempos de una línea del access log
+    
+    Returns:
+        tuple: (status, bytes, request_time, upstream_time) con tiempos en
+            segundos o None si el formato no los incluye; None si la línea no
+            tiene formato combined
+    """
+    match = COMBINED_TAIL.search(line)
+    if not match:
+        return None
+    status = int(match.group(1))
+    sent = int(match.group(2)) if match.group(2) != b'-' else 0
+    rest = match.group(3)
+    request_time = upstream_time = None
+    if rest.strip():
+        named = dict(NAMED_TIMING.findall(rest))
+        if named:
+            request_time = named.get(b'rt') or named.get(b'request_time')
+            upstream_time = named.get(b'urt') or named.get(b'upstream_response_time')
+        else:
+            plain = PLAIN_TIMING.findall(rest)
+            request_time = plain[0] if plain else None
+            upstream_time = plain[1] if len(plain) > 1 else None
+        request_time = float(request_time) if request_time else None
+        upstream_time = float(upstream_time) if upstream_time else None
+    return status, sent, request_time, upstream_time
+
+
+class LatencyHistogram:
+    """Histograma log-lineal de latencias en memoria fija (estilo HDR)
+    
+    Cada potencia de 2 de milisegundos se divide en `sub_buckets` partes
+    iguales, así el error relativo de un percentil queda acotado por
+    1/sub_buckets (6 % con 16) en todo el rango, de 1 ms a `max_exponent`
+    potencias (~131 s con 17). Lo que cae por debajo o por encima se cuenta
+    en el primer o el último bucket.
+    """
+    
+    def __init__(self, sub_buckets=16, max_exponent=17):
+        self.sub_buckets = sub_buckets
+        self.max_exponent = max_exponent
+        self.counts = [0] * (1 + (max_exponent + 1) * sub_buckets)
+        self.total = 0
+        self.sum = 0.0
+        self.max = 0.0
+    
+    def _index(self, milliseconds):
+        if milliseconds < 1:
+            return 0
+        mantissa, exponent = math.frexp(milliseconds)  # ms = mantissa * 2^exponent, mantissa en [0.5, 1)
+        exponent -= 1
+        if exponent > self.max_exponent:
+            return len(self.counts) - 1
+        return 1 + exponent * self.sub_buckets + int((mantissa * 2 - 1) * self.sub_buckets)
+    
+    def _bucket_value(self, index):
+        """Punto medio del bucket, en milisegundos"""
+        if index == 0:
+            return 0.5
+        exponent, sub = divmod(index - 1, self.sub_buckets)
+        return 2 ** exponent * (1 + (sub + 0.5) / self.sub_buckets)
+    
+    def add(self, seconds):
+        milliseconds = seconds * 1000
+        self.counts[self._index(milliseconds)] += 1
+        self.total += 1
+        self.sum += milliseconds
+        self.max = max(self.max, milliseconds)
+    
+    def quantile(self, q):
+        """Percentil aproximado en milisegundos (None sin datos)"""
+        if not self.total:
+            return None
+        rank = q * self.total
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return round(min(self._bucket_value(index), self.max), 2)
+        return round(self.max, 2)
+    
+    def summary(self, prefix=''):
+        result = {f'{prefix}{name}_ms': self.quantile(q) for name, q in QUANTILES}
+        result[f'{prefix}avg_ms'] = round(self.sum / self.total, 2) if self.total else None
+        result[f'{prefix}max_ms'] = round(self.max, 2) if self.total else None
+        return result
+
+
+class DomainStats:
+    """Contadores de una ventana para un dominio"""
+    
+    def __init__(self):
+        self.requests = 0
+        self.bytes_sent = 0
+        self.status = dict.fromkeys(STATUS_CLASSES, 0)
+        self.latency = LatencyHistogram()
+        self.upstream = LatencyHistogram()
+    
+    def add(self, status, sent, request_time, upstream_time):
+        self.requests += 1
+        self.bytes_sent += sent
+        status_class = f'{status // 100}xx'
+        if status_class in self.status:
+            self.status[status_class] += 1
+        if request_time is not None:
+            self.latency.add(request_time)
+        if upstream_time is not None:
+            self.upstream.add(upstream_time)
+    
+    def summary(self, seconds):
+        result = {
+            'requests': self.requests,
+            'rps': round(self.requests / seconds, 3) if seconds else None,
+            'bytes_sent': self.bytes_sent,
+            'error_rate': round(100 * self.status['5xx'] / self.requests, 2) if self.requests else 0.0
+        }
+        result.update({f'status_{k}': v for k, v in self.status.items()})
+        result.update(self.latency.summary())
+        result.update(self.upstream.summary('upstream_'))
+        return result
+
+
+class AccessLogAnalytics:
+    """Métricas por dominio calculadas sobre el access log de nginx
+    
+    El índice de logs le pasa cada línea nueva de un dominio (observe). Los
+    contadores y los histogramas de latencia se acumulan en ventanas de
+    `window` segundos; al cerrar una ventana su resumen (peticiones/s, clases
+    de estado, tasa de 5xx y p50/p95/p99 de $request_time y
+    $upstream_response_time, si el formato los incluye) queda en el snapshot
+    compartido (clave 'nginx') y el escritor de historial lo guarda en
+    nginx_metrics_history. Memoria fija por dominio: dos histogramas de ~300
+    contadores.
+    """
+    
+    def __init__(self, window=60):
+        self.window = window
+        self.instances = {}  # dominio -> nombre de instancia
+        self._stats = {}
+        self._window_start = time.time()
+        self._latest = {}
+        self._lock = threading.Lock()
+    
+    def init_app(self, app):
+        """Toma la configuración de la app"""
+        self.window = app.config.get('NGINX_ANALYTICS_WINDOW', self.window)
+    
+    def observe(self, domain, line):
+        """Cuenta una línea del access log de `domain`"""
+        parsed = parse_access_line(line)
+        if parsed is None:
+            return
+        with self._lock:
+            stats = self._stats.get(domain)
+            if stats is None:
+                stats = self._stats[domain] = DomainStats()
+            stats.add(*parsed)
+    
+    def _close_window(self, now):
+        seconds = now - self._window_start
+        domains = {}
+        for domain, stats in self._stats.items():
+            summary = stats.summary(seconds)
+            summary['instance'] = self.instances.get(domain)
+            domains[domain] = summary
+        self._latest = {
+            'window_seconds': round(seconds, 1),
+            'window_end': datetime.utcfromtimestamp(now).isoformat(),
+            'domains': domains
+        }
+        self._stats = {}
+        self._window_start = now
+    
+    def __call__(self):
+        """Colector del muestreador: resumen de la última ventana cerrada"""
+        now = time.time()
+        with self._lock:
+            if now - self._window_start >= self.window:
+                self._close_window(now)
+            return self._latest
+
+
+nginx_analytics = AccessLogAnalytics()
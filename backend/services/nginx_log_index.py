@@ -0,0 +1,424 @@
+import os
+import re
+import json
+import time
+import fcntl
+import array
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Cada entrada del índice es el offset (uint64) del inicio de una línea
+OFFSET_TYPECODE = 'Q'
+OFFSET_SIZE = array.array(OFFSET_TYPECODE).itemsize
+# Máximo leído de una línea al resolverla desde el índice
+MAX_LINE_BYTES = 16 * 1024
+
+
+def _domain_filename(domain):
+    """Nombre de archivo seguro para un dominio"""
+    return re.sub(r'[^A-Za-z0-9._-]', '_', domain)
+
+
+class NginxLogIndex:
+    """Índice incremental por dominio de un log de nginx (access.log o error.log)
+    
+    Todos los vhosts escriben al mismo log (formato combined, sin $host), así
+    que una línea pertenece a un dominio si lo contiene, igual que el grep
+    anterior. El indexador lee solo los bytes nuevos desde el offset guardado
+    y agrega, por dominio, el offset de cada línea a `<dominio>.idx` (uint64)
+    y la línea a un ring buffer en memoria.
+    
+    Al rotar el log (otro inodo, o el mismo truncado) termina de leer el
+    archivo anterior si sigue como `<log>.1` y pasa los índices a
+    `<dominio>.1.idx`, que apuntan a ese archivo; si `<log>.1` no es el
+    archivo indexado (copytruncate, compresión) los índices viejos se descartan.
+    
+    Indexa un solo proceso a la vez (flock sobre el directorio del índice);
+    cualquier worker responde leyendo los índices del disco. Las líneas nuevas
+    se pasan al observer solo en las puestas al día que observan (las del
+    escritor); el estado guarda hasta dónde llegó (`observed`), así lo que
+    indexó antes una consulta de otro worker se observa en la siguiente.
+    """
+    
+    def __init__(self, kind, log_path, index_dir, ring_size=500, max_chunk=16 * 1024 * 1024,
+                 backfill_bytes=256 * 1024 * 1024):
+        self.kind = kind
+        self.log_path = log_path
+        self.index_dir = index_dir
+        self.ring_size = ring_size
+        self.max_chunk = max_chunk
+        self.backfill_bytes = backfill_bytes
+        self._rings = {}
+        self._ring_position = None  # (inodo, offset) hasta donde los rings están al día
+        self._pattern = None
+        self._domains = ()
+        self._lock = threading.Lock()
+        self.observer = None  # (dominio, línea en bytes) por cada línea nueva indexada
+        self._observing = False
+    
+    # --- estado en disco ---
+    
+    def _path(self, name):
+        return os.path.join(self.index_dir, name)
+    
+    def _index_path(self, domain, generation=0):
+        suffix = '.idx' if generation == 0 else f'.{generation}.idx'
+        return self._path(_domain_filename(domain) + suffix)
+    
+    def read_state(self):
+        """Estado guardado: inodo y offset del log actual, inodo del rotado y posición observada"""
+        try:
+            with open(self._path('state.json'), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+    
+    def state_age(self):
+        """Segundos desde la última puesta al día (None si nunca se indexó)"""
+        try:
+            return time.time() - os.stat(self._path('state.json')).st_mtime
+        except OSError:
+            return None
+    
+    def _write_state(self, state):
+        path = self._path('state.json')
+        with open(f'{path}.tmp', 'w') as f:
+            json.dump(state, f)
+        os.replace(f'{path}.tmp', path)
+    
+    # --- indexado ---
+    
+    def set_domains(self, domains):
+        """Dominios a indexar (los más largos primero: dev-x.com no cuenta como x.com)"""
+        domains = tuple(sorted({d for d in domains if d}, key=lambda d: (-len(d), d)))
+        if domains != self._domains:
+            self._domains = domains
+            self._pattern = re.compile('|'.join(re.escape(d) for d in domains).encode()) if domains else None
+    
+    def _index_bytes(self, fd, start, end, generation=0, handler=None):
+        """Indexa las líneas completas entre start y end; devuelve el offset alcanzado
+        
+        `handler(data, base)` reemplaza al indexado de cada bloque (ver _observe_bytes).
+        """
+        handler = handler or (lambda data, base: self._index_chunk(data, base, generation))
+        position = start
+        while position < end:
+            data = os.pread(fd, min(self.max_chunk, end - position), position)
+            if not data:
+                break
+            last_newline = data.rfind(b'\n')
+            if last_newline < 0:
+                if len(data) < self.max_chunk:
+                    break  # Línea aún incompleta: queda para el próximo ciclo
+                last_newline = len(data) - 1  # Línea gigante: se corta
+            data = data[:last_newline + 1]
+            handler(data, position)
+            position += len(data)
+        return position
+    
+    def _match_lines(self, data):
+        """Inicio de cada línea del bloque que menciona un dominio, por dominio"""
+        offsets = {}
+        seen = set()
+        for match in self._pattern.finditer(data):
+            line_start = data.rfind(b'\n', 0, match.start()) + 1
+            domain = match.group().decode()
+            if (line_start, domain) in seen:
+                continue
+            seen.add((line_start, domain))
+            offsets.setdefault(domain, []).append(line_start)
+        return offsets
+    
+    def _index_chunk(self, data, base, generation):
+        """Agrega a los índices (y rings) las líneas del bloque que mencionan un dominio"""
+        if self._pattern is None:
+            return
+        for domain, starts in self._match_lines(data).items():
+            with open(self._index_path(domain, generation), 'ab') as f:
+                f.write(array.array(OFFSET_TYPECODE, (base + s for s in starts)).tobytes())
+            if generation == 0:
+                ring = self._rings.setdefault(domain, deque(maxlen=self.ring_size))
+                for s in starts:
+                    end = data.find(b'\n', s)
+                    ring.append(data[s:end].decode('utf-8', errors='replace'))
+                    if self._observing:
+                        self.observer(domain, data[s:end])
+    
+    def _observe_chunk(self, data, base):
+        """Pasa al observer las líneas del bloque sin indexarlas"""
+        if self._pattern is None:
+            return
+        for domain, starts in self._match_lines(data).items():
+            for s in starts:
+                self.observer(domain, data[s:data.find(b'\n', s)])
+    
+    def _open_inode(self, inode):
+        """Abre el log actual o `<log>.1`, el que tenga ese inodo (None si ninguno)"""
+        for path in (self.log_path, f'{self.log_path}.1'):
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except FileNotFoundError:
+                continue
+            if os.fstat(fd).st_ino == inode:
+                return fd
+            os.close(fd)
+        return None
+    
+    def _observe_bytes(self, inode, start, end=None):
+        """Observa las líneas ya indexadas de un archivo entre start y end (None: hasta el final)"""
+        fd = self._open_inode(inode)
+        if fd is None:
+            return
+        try:
+            self._index_bytes(fd, start, os.fstat(fd).st_size if end is None else end,
+                              handler=self._observe_chunk)
+        finally:
+            os.close(fd)
+    
+    def _observe_pending(self, state):
+        """Observa lo que indexaron puestas al día sin observer desde la última que observó"""
+        observed = state.get('observed')
+        if not observed or observed == [state['inode'], state['offset']]:
+            return
+        inode, offset = observed
+        if inode != state['inode']:
+            # Una consulta rotó el log: resto del archivo anterior y el actual desde el inicio
+            self._observe_bytes(inode, offset)
+            offset = 0
+        if offset < state['offset']:
+            self._observe_bytes(state['inode'], offset, state['offset'])
+    
+    def _rotate(self, state):
+        """El log rotó: completar el anterior y pasar los índices a la generación 1"""
+        previous = f'{self.log_path}.1'
+        try:
+            old_inode = os.stat(previous).st_ino
+        except OSError:
+            old_inode = None
+        
+        if state and old_inode == state['inode']:
+            fd = os.open(previous, os.O_RDONLY)
+            try:
+                self._index_bytes(fd, state['offset'], os.fstat(fd).st_size)
+            finally:
+                os.close(fd)
+        
+        for name in os.listdir(self.index_dir):
+            if name.endswith('.1.idx'):
+                os.remove(self._path(name))
+        for name in os.listdir(self.index_dir):
+            if name.endswith('.idx'):
+                if old_inode is not None and state and old_inode == state['inode']:
+                    os.replace(self._path(name), self._path(name[:-len('.idx')] + '.1.idx'))
+                else:
+                    # El archivo rotado ya no está (comprimido o borrado): sus offsets no sirven
+                    os.remove(self._path(name))
+        return old_inode if state and old_inode == state['inode'] else None
+    
+    def catch_up(self, blocking=True, observe=True):
+        """Indexa lo escrito desde la última vez (False si otro proceso tiene el lock)
+        
+        Con `observe` cada línea nueva se pasa también al observer (no las del
+        primer indexado, que son historia).
+        """
+        os.makedirs(self.index_dir, exist_ok=True)
+        with self._lock, open(self._path('.lock'), 'a') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                return False
+            try:
+                try:
+                    fd = os.open(self.log_path, os.O_RDONLY)
+                except FileNotFoundError:
+                    return True
+                try:
+                    st = os.fstat(fd)
+                    state = self.read_state()
+                    # Si otro proceso indexó mientras tanto, los rings de este quedaron incompletos
+                    in_sync = state is not None and self._ring_position == (state['inode'], state['offset'])
+                    if not in_sync:
+                        self._rings = {}
+                    self._observing = observe and self.observer is not None
+                    try:
+                        if state is not None and self._observing:
+                            self._observe_pending(state)
+                        if state is None:
+                            # Primera vez: indexar solo el final de un log grande (sin observarlo)
+                            self._observing = False
+                            start = max(st.st_size - self.backfill_bytes, 0)
+                            if start:
+                                chunk = os.pread(fd, MAX_LINE_BYTES, start)
+                                start += chunk.find(b'\n') + 1 if b'\n' in chunk else 0
+                            state = {'inode': st.st_ino, 'offset': start, 'rotated_inode': None}
+                        elif state['inode'] != st.st_ino or st.st_size < state['offset']:
+                            rotated = self._rotate(state)
+                            state = {'inode': st.st_ino, 'offset': 0, 'rotated_inode': rotated,
+                                     'observed': state.get('observed')}
+                        
+                        state['offset'] = self._index_bytes(fd, state['offset'], st.st_size)
+                        # Sin observer la posición observada queda donde estaba (salvo el primer indexado)
+                        if self._observing or not state.get('observed'):
+                            state['observed'] = [state['inode'], state['offset']]
+                    finally:
+                        self._observing = False
+                    state['domains'] = list(self._domains)
+                    self._write_state(state)
+                    self._ring_position = (state['inode'], state['offset'])
+                finally:
+                    os.close(fd)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return True
+    
+    # --- consultas ---
+    
+    def _read_offsets(self, domain, generation, count):
+        """Últimos `count` offsets del índice de un dominio"""
+        try:
+            with open(self._index_path(domain, generation), 'rb') as f:
+                f.seek(0, os.SEEK_END)
+                size = f.tell() - f.tell() % OFFSET_SIZE
+                start = max(size - count * OFFSET_SIZE, 0)
+                f.seek(start)
+                offsets = array.array(OFFSET_TYPECODE)
+                offsets.frombytes(f.read(size - start))
+                return list(offsets)
+        except FileNotFoundError:
+            return []
+    
+    @staticmethod
+    def _read_lines(path, offsets, inode=None):
+        """Lee las líneas que empiezan en `offsets` (vacío si el archivo ya no es el indexado)"""
+        if not offsets:
+            return []
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            return []
+        try:
+            if inode is not None and os.fstat(fd).st_ino != inode:
+                return []
+            lines = []
+            for offset in offsets:
+                data = os.pread(fd, MAX_LINE_BYTES, offset)
+                end = data.find(b'\n')
+                lines.append(data[:end if end >= 0 else len(data)].decode('utf-8', errors='replace'))
+            return lines
+        finally:
+            os.close(fd)
+    
+    def last_lines(self, domain, count):
+        """Últimas `count` líneas del log que mencionan `domain` (más antigua primero)"""
+        state = self.read_state()
+        if state is None:
+            return []
+        
+        with self._lock:
+            ring = self._rings.get(domain)
+            if ring is not None and len(ring) >= count and self._ring_position == (state['inode'], state['offset']):
+                return list(ring)[-count:]
+        
+        offsets = self._read_offsets(domain, 0, count)
+        lines = self._read_lines(self.log_path, offsets, state['inode'])
+        missing = count - len(lines)
+        if missing > 0 and state.get('rotated_inode'):
+            older = self._read_offsets(domain, 1, missing)
+            lines = self._read_lines(f'{self.log_path}.1', older, state['rotated_inode']) + lines
+        return lines
+
+
+class NginxLogIndexer:
+    """Mantiene al día los índices de access.log y error.log
+    
+    El proceso escritor del muestreador los pone al día cada `interval`
+    segundos (listener, en un hilo propio); si nadie lo hizo hace rato (p.ej.
+    sin muestreador), la consulta misma intenta ponerse al día antes de leer.
+    """
+    
+    def __init__(self, interval=5):
+        self.app = None
+        self.interval = interval
+        self.indexes = {}
+        self.analytics = None
+        self._last_run = 0
+        self._thread = None
+    
+    def init_app(self, app):
+        """Crea los índices con la configuración de la app"""
+        self.app = app
+        self.interval = app.config.get('NGINX_LOG_INDEX_INTERVAL', self.interval)
+        index_dir = app.config.get('NGINX_LOG_INDEX_DIR')
+        options = {
+            'ring_size': app.config.get('NGINX_LOG_RING_LINES', 500),
+            'backfill_bytes': app.config.get('NGINX_LOG_INDEX_BACKFILL_MB', 256) * 1024 * 1024
+        }
+        self.indexes = {
+            'nginx-access': NginxLogIndex('nginx-access', app.config.get('NGINX_ACCESS_LOG'),
+                                          os.path.join(index_dir, 'access'), **options),
+            'nginx-error': NginxLogIndex('nginx-error', app.config.get('NGINX_ERROR_LOG'),
+                                         os.path.join(index_dir, 'error'), **options)
+        }
+    
+    def observe_access(self, analytics):
+        """Pasa cada línea nueva del access log a `analytics` (AccessLogAnalytics)"""
+        self.analytics = analytics
+        self.indexes['nginx-access'].observer = analytics.observe
+    
+    def _domains(self):
+        """Dominio -> instancia, del registro de instancias"""
+        from services.instance_manager import shared_registry
+        
+        with self.app.app_context():
+            return {i['domain']: i['name'] for i in shared_registry().all() if i.get('domain')}
+    
+    def run(self, blocking=True, observe=False):
+        """Pone al día todos los índices
+        
+        Solo el listener observa las líneas (las métricas son las del proceso
+        escritor); lo que indexe antes una consulta se observa en su siguiente
+        pasada.
+        """
+        domains = self._domains()
+        if self.analytics is not None:
+            self.analytics.instances = domains
+        for index in self.indexes.values():
+            index.set_domains(domains)
+            try:
+                index.catch_up(blocking=blocking, observe=observe)
+            except Exception as e:
+                logger.error(f"Error indexing {index.log_path}: {e}")
+    
+    def tick(self, metrics=None):
+        """Listener del muestreador: indexa cada `interval` segundos
+        
+        Corre en un hilo propio para que leer el log no demore la siguiente
+        muestra del muestreador; si la pasada anterior sigue, se saltea.
+        """
+        if self.app is None or time.monotonic() - self._last_run < self.interval:
+            return
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._last_run = time.monotonic()
+        self._thread = threading.Thread(target=self._run_observed, name='nginx-log-indexer', daemon=True)
+        self._thread.start()
+    
+    def _run_observed(self):
+        try:
+            self.run(blocking=False, observe=True)
+        except Exception as e:
+            logger.error(f"Error indexing nginx logs: {e}")
+    
+    def last_lines(self, kind, domain, count):
+        """Últimas `count` líneas de `domain` en el log `kind` (nginx-access / nginx-error)"""
+        index = self.indexes[kind]
+        age = index.state_age()
+        if age is None or age > max(3 * self.interval, 30) or domain not in (index.read_state() or {}).get('domains', []):
+            self.run()
+        return index.last_lines(domain, count)
+
+
+nginx_log_indexer = NginxLogIndexer()
@@ -0,0 +1,389 @@
+import os
+import glob
+import json
+import time
+import logging
+import threading
+
+from services.metrics_store import SharedMetricsStore
+from services.system_monitor import sampler
+
+logger = logging.getLogger(__name__)
+
+# Límites (segundos) de los buckets del histograma de latencia
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+OPENMETRICS_CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+TEXT_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class PanelStateCollector:
+    """Colector del muestreador: estado de instancias y resumen de backups
+    
+    Consultar systemd y recorrer los directorios de backup es caro, así que
+    solo se hace cada `refresh_interval` segundos en el proceso escritor; el
+    resultado viaja en el snapshot compartido (clave 'panel').
+    """
+    
+    def __init__(self, refresh_interval=30):
+        self.app = None
+        self.refresh_interval = refresh_interval
+        self._state = {}
+        self._refreshed_at = 0
+    
+    def init_app(self, app):
+        """Toma la configuración de la app"""
+        self.app = app
+        self.refresh_interval = app.config.get('METRICS_PANEL_REFRESH_INTERVAL', self.refresh_interval)
+    
+    def _refresh(self):
+        """Lee el estado de las instancias y de los backups"""
+        from services.instance_manager import InstanceManager
+        from services.backup_manager_v2 import BackupManagerV2
+        
+        state = {'instances': {}, 'backups': {}, 'refreshed_at': time.time()}
+        with self.app.app_context():
+            try:
+                for instance in InstanceManager().list_instances():
+                    state['instances'][instance['name']] = {
+                        'status': instance.get('status'),
+                        'type': instance.get('type'),
+                        'service': instance.get('service')
+                    }
+            except Exception as e:
+                logger.error(f"Error reading instance status for metrics: {e}")
+            try:
+                state['backups'] = BackupManagerV2().get_backup_metrics()
+            except Exception as e:
+                logger.error(f"Error reading backup stats for metrics: {e}")
+        self._state = state
+    
+    def __call__(self):
+        if self.app is None:
+            return {}
+        if time.monotonic() - self._refreshed_at >= self.refresh_interval:
+            self._refreshed_at = time.monotonic()
+            self._refresh()
+        return self._state
+
+
+class RequestLatencyRecorder:
+    """Histogramas de latencia de las peticiones HTTP
+    
+    Cada worker cuenta sus propias peticiones por (método, ruta, estado) y
+    cada `dump_interval` segundos vuelca los contadores a un archivo propio
+    junto al segmento de métricas. Al exportar se suman los archivos de los
+    workers vivos; los de procesos muertos se eliminan (Prometheus trata la
+    caída como un reinicio de contador).
+    """
+    
+    def __init__(self, buckets=LATENCY_BUCKETS, dump_interval=5):
+        self.buckets = buckets
+        self.dump_interval = dump_interval
+        self.prefix = None
+        self._series = {}
+        self._lock = threading.Lock()
+        self._last_dump = 0
+        self._pid = None
+    
+    def init_app(self, app):
+        """Registra los hooks de la app y la ubicación de los archivos por worker"""
+        base = app.config.get('METRICS_SHM_PATH') or SharedMetricsStore.default_path()
+        self.prefix = f'{base}-latency'
+        
+        from flask import g, request
+        
+        @app.before_request
+        def _start_timer():
+            g._request_started = time.perf_counter()
+        
+        @app.after_request
+        def _observe_request(response):
+            started = g.pop('_request_started', None)
+            if started is not None:
+                endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+                self.observe(request.method, endpoint, response.status_code, time.perf_counter() - started)
+            return response
+    
+    def observe(self, method, endpoint, status, seconds):
+        """Registra la duración de una petición"""
+        if self._pid != os.getpid():
+            # Tras un fork los contadores heredados son del padre
+            with self._lock:
+                self._series = {}
+                self._pid = os.getpid()
+        
+        key = f'{method} {status} {endpoint}'
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'buckets': [0] * len(self.buckets), 'count': 0, 'sum': 0.0}
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series['buckets'][i] += 1
+            series['count'] += 1
+            series['sum'] += seconds
+        
+        if time.monotonic() - self._last_dump >= self.dump_interval:
+            self.dump()
+    
+    def _path(self, pid):
+        return f'{self.prefix}-{pid}.json'
+    
+    def dump(self):
+        """Escribe los contadores de este worker (reemplazo atómico)"""
+        if self.prefix is None or self._pid != os.getpid():
+            return
+        self._last_dump = time.monotonic()
+        with self._lock:
+            payload = json.dumps(self._series, separators=(',', ':'))
+        path = self._path(self._pid)
+        tmp = f'{path}.tmp'
+        try:
+            with open(tmp, 'w') as f:
+                f.write(payload)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.error(f"Error writing request latency counters: {e}")
+    
+    def merged(self):
+        """Suma los contadores de todos los workers vivos
+        
+        Returns:
+            dict: (método, estado, ruta) -> {'buckets', 'count', 'sum'}
+        """
+        if self.prefix is None:
+            return {}
+        self.dump()
+        
+        merged = {}
+        for path in glob.glob(f'{self.prefix}-*.json'):
+            try:
+                pid = int(path[len(self.prefix) + 1:-len('.json')])
+            except ValueError:
+                continue
+            if not self._alive(pid):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            try:
+                with open(path, 'r') as f:
+                    series = json.load(f)
+            except (OSError, ValueError):
+                continue
+            
+            for key, values in series.items():
+                if len(values['buckets']) != len(self.buckets):
+                    continue
+                method, status, endpoint = key.split(' ', 2)
+                total = merged.setdefault((method, status, endpoint), {
+                    'buckets': [0] * len(self.buckets), 'count': 0, 'sum': 0.0
+                })
+                total['buckets'] = [a + b for a, b in zip(total['buckets'], values['buckets'])]
+                total['count'] += values['count']
+                total['sum'] += values['sum']
+        return merged
+    
+    @staticmethod
+    def _alive(pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+
+def _escape(value):
+    """Escapa el valor de una etiqueta"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value):
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+class MetricFamily:
+    """Una métrica con su tipo, ayuda y muestras"""
+    
+    def __init__(self, name, metric_type, help_text):
+        self.name = name
+        self.type = metric_type
+        self.help = help_text
+        self.samples = []
+    
+    def add(self, value, labels=None, suffix=''):
+        if value is None:
+            return self
+        self.samples.append((suffix, labels or {}, value))
+        return self
+    
+    def render(self, openmetrics=True):
+        # Las muestras de un contador llevan el sufijo _total en ambos formatos;
+        # en 0.0.4 HELP y TYPE usan ese mismo nombre, en OpenMetrics el de la familia
+        counter = self.type == 'counter'
+        name = f'{self.name}_total' if counter and not openmetrics else self.name
+        lines = [f'# HELP {name} {self.help}', f'# TYPE {name} {self.type}']
+        for suffix, labels, value in self.samples:
+            label_text = ''
+            if labels:
+                label_text = '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + '}'
+            sample_name = f'{self.name}{suffix or ("_total" if counter else "")}'
+            lines.append(f'{sample_name}{label_text} {_format_value(value)}')
+        return lines
+
+
+class PrometheusExporter:
+    """Genera el texto de /metrics a partir del snapshot del muestreador
+    
+    El texto se arma una sola vez por muestra (clave: versión del snapshot) y
+    se sirve desde la caché mientras no haya una muestra nueva, así los scrapes
+    no agregan trabajo.
+    """
+    
+    def __init__(self, sampler, latency):
+        self.sampler = sampler
+        self.latency = latency
+        self._cache = {}
+        self._cache_key = None
+        self._lock = threading.Lock()
+    
+    def render(self, openmetrics=True):
+        """Devuelve el texto de exposición (cacheado por muestra)"""
+        # Versión y muestra juntas: la clave siempre corresponde a la muestra cacheada
+        key, snapshot = self.sampler.get_versioned_snapshot()
+        with self._lock:
+            if key is None or key != self._cache_key:
+                self._cache = {}
+                self._cache_key = key
+            if openmetrics not in self._cache:
+                families = self._collect(snapshot)
+                lines = []
+                for family in families:
+                    lines.extend(family.render(openmetrics))
+                if openmetrics:
+                    lines.append('# EOF')
+                self._cache[openmetrics] = '\n'.join(lines) + '\n'
+            return self._cache[openmetrics]
+    
+    def _collect(self, snapshot):
+        """Construye las familias de métricas"""
+        families = []
+        families.extend(self._host_families(snapshot))
+        families.extend(self._instance_families(snapshot))
+        families.extend(self._backup_families(snapshot))
+        families.extend(self._latency_families())
+        return families
+    
+    def _host_families(self, snapshot):
+        gb = 1024 ** 3
+        cpu = snapshot.get('cpu', {})
+        memory = snapshot.get('memory', {})
+        network = snapshot.get('network', {})
+        system = snapshot.get('system', {})
+        
+        families = [
+            MetricFamily('panel_cpu_usage_percent', 'gauge', 'Uso de CPU del host').add(cpu.get('percent')),
+            MetricFamily('panel_cpu_count', 'gauge', 'CPUs lógicas del host').add(cpu.get('count_logical')),
+        ]
+        
+        memory_family = MetricFamily('panel_memory_bytes', 'gauge', 'Memoria del host')
+        for state, field in (('total', 'total_gb'), ('used', 'used_gb'), ('available', 'available_gb'),
+                             ('swap_total', 'swap_total_gb'), ('swap_used', 'swap_used_gb')):
+            if memory.get(field) is not None:
+                memory_family.add(int(memory[field] * gb), {'state': state})
+        families.append(memory_family)
+        families.append(MetricFamily('panel_memory_usage_percent', 'gauge', 'Uso de memoria del host')
+                        .add(memory.get('percent')))
+        
+        disk_bytes = MetricFamily('panel_disk_bytes', 'gauge', 'Espacio de cada partición')
+        disk_percent = MetricFamily('panel_disk_usage_percent', 'gauge', 'Uso de cada partición')
+        for disk in snapshot.get('disk', []):
+            labels = {'device': disk.get('device'), 'mountpoint': disk.get('mountpoint')}
+            for state, field in (('total', 'total_gb'), ('used', 'used_gb'), ('free', 'free_gb')):
+                if disk.get(field) is not None:
+                    disk_bytes.add(int(disk[field] * gb), dict(labels, state=state))
+            disk_percent.add(disk.get('percent'), labels)
+        families.extend([disk_bytes, disk_percent])
+        
+        families.append(MetricFamily('panel_network_sent_bytes', 'counter', 'Bytes enviados por la red')
+                        .add(network.get('bytes_sent'), suffix='_total'))
+        families.append(MetricFamily('panel_network_received_bytes', 'counter', 'Bytes recibidos por la red')
+                        .add(network.get('bytes_recv'), suffix='_total'))
+        families.append(MetricFamily('panel_uptime_seconds', 'gauge', 'Tiempo encendido del host')
+                        .add(system.get('uptime_seconds')))
+        return families
+    
+    def _instance_families(self, snapshot):
+        panel = snapshot.get('panel') or {}
+        instances = panel.get('instances') or {}
+        resources = snapshot.get('instances') or {}
+        
+        up = MetricFamily('panel_instance_up', 'gauge', 'Servicio de la instancia activo (1) o no (0)')
+        for name, info in sorted(instances.items()):
+            if not info.get('service'):
+                continue
+            up.add(1 if info.get('status') == 'active' else 0, {
+                'instance': name, 'type': info.get('type') or '', 'service': info['service']
+            })
+        
+        cpu = MetricFamily('panel_instance_cpu_usage_percent', 'gauge', 'CPU de la instancia (porcentaje del host)')
+        memory = MetricFamily('panel_instance_memory_bytes', 'gauge', 'Memoria del cgroup de la instancia')
+        rss = MetricFamily('panel_instance_rss_bytes', 'gauge', 'Memoria anónima (RSS) de la instancia')
+        io = MetricFamily('panel_instance_io_bytes_per_second', 'gauge', 'IO de disco de la instancia')
+        mb = 1024 ** 2
+        for name, usage in sorted(resources.items()):
+            labels = {'instance': name}
+            cpu.add(usage.get('cpu_percent'), labels)
+            if usage.get('memory_mb') is not None:
+                memory.add(int(usage['memory_mb'] * mb), labels)
+            if usage.get('rss_mb') is not None:
+                rss.add(int(usage['rss_mb'] * mb), labels)
+            for direction, field in (('read', 'io_read_mb_s'), ('write', 'io_write_mb_s')):
+                if usage.get(field) is not None:
+                    io.add(usage[field] * mb, dict(labels, direction=direction))
+        return [up, cpu, memory, rss, io]
+    
+    def _backup_families(self, snapshot):
+        backups = (snapshot.get('panel') or {}).get('backups') or {}
+        now = time.time()
+        
+        count = MetricFamily('panel_backup_count', 'gauge', 'Backups guardados por instancia')
+        size = MetricFamily('panel_backup_size_bytes', 'gauge', 'Tamaño total de los backups por instancia')
+        last = MetricFamily('panel_backup_last_success_timestamp_seconds', 'gauge',
+                            'Fecha del backup más reciente (epoch)')
+        age = MetricFamily('panel_backup_last_success_age_seconds', 'gauge',
+                           'Antigüedad del backup más reciente')
+        for name, stats in sorted(backups.items()):
+            labels = {'instance': name}
+            count.add(stats.get('count'), labels)
+            size.add(stats.get('total_size_bytes'), labels)
+            if stats.get('last_success'):
+                last.add(stats['last_success'], labels)
+                age.add(round(now - stats['last_success'], 1), labels)
+        return [count, size, last, age]
+    
+    def _latency_families(self):
+        histogram = MetricFamily('panel_http_request_duration_seconds', 'histogram',
+                                 'Duración de las peticiones HTTP de la API')
+        for (method, status, endpoint), series in sorted(self.latency.merged().items()):
+            labels = {'method': method, 'endpoint': endpoint, 'status': status}
+            for bound, value in zip(self.latency.buckets, series['buckets']):
+                histogram.add(value, dict(labels, le=repr(float(bound))), suffix='_bucket')
+            histogram.add(series['count'], dict(labels, le='+Inf'), suffix='_bucket')
+            histogram.add(series['count'], labels, suffix='_count')
+            histogram.add(round(series['sum'], 6), labels, suffix='_sum')
+        return [histogram]
+
+
+# Instancias compartidas (el colector solo corre en el proceso escritor)
+panel_state = PanelStateCollector()
+request_latency = RequestLatencyRecorder()
+exporter = PrometheusExporter(sampler, request_latency)
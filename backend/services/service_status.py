@@ -0,0 +1,151 @@
+import json
+import time
+import logging
+import threading
+import subprocess
+
+logger = logging.getLogger(__name__)
+
+SHOW_PROPERTIES = ('Id', 'LoadState', 'ActiveState', 'SubState', 'MainPID')
+
+
+def unit_name(service):
+    """Nombre completo de la unidad (agrega .service si falta)"""
+    return service if service.endswith('.service') else f'{service}.service'
+
+
+def status_from_state(state):
+    """Traduce ActiveState al estado que usa el panel (active/inactive/unknown)"""
+    active_state = (state or {}).get('active_state')
+    if active_state == 'active':
+        return 'active'
+    if active_state in ('inactive', 'failed'):
+        return 'inactive'
+    return 'unknown'
+
+
+class SystemctlStatusBackend:
+    """Estado de varias unidades systemd con una sola llamada a `systemctl show`"""
+    
+    def __init__(self, systemctl='/usr/bin/systemctl', timeout=10):
+        self.systemctl = systemctl
+        self.timeout = timeout
+    
+    def get_states(self, services):
+        """Obtiene ActiveState/SubState/MainPID de todas las unidades
+        
+        Args:
+            services: Nombres de servicio (con o sin .service)
+        
+        Returns:
+            dict: servicio -> {'load_state', 'active_state', 'sub_state', 'main_pid'}
+        """
+        services = list(dict.fromkeys(s for s in services if s))
+        if not services:
+            return {}
+        
+        result = subprocess.run(
+            [self.systemctl, 'show', '--no-pager', f"--property={','.join(SHOW_PROPERTIES)}",
+             *[unit_name(s) for s in services]],
+            capture_output=True,
+            text=True,
+            timeout=self.timeout
+        )
+        if result.returncode != 0 and not result.stdout:
+            raise RuntimeError(result.stderr.strip() or f'systemctl show exited with {result.returncode}')
+        
+        by_unit = {}
+        for block in result.stdout.split('\n\n'):
+            values = dict(line.split('=', 1) for line in block.splitlines() if '=' in line)
+            if values.get('Id'):
+                by_unit[values['Id']] = {
+                    'load_state': values.get('LoadState'),
+                    'active_state': values.get('ActiveState'),
+                    'sub_state': values.get('SubState'),
+                    'main_pid': int(values.get('MainPID') or 0)
+                }
+        return {s: by_unit.get(unit_name(s)) for s in services}
+
+
+class FakeStatusBackend:
+    """Backend falso para pruebas y desarrollo sin systemd
+    
+    Los estados se toman del dict `states` (servicio -> ActiveState o dict
+    completo) o de un archivo JSON con el mismo formato; los servicios no
+    listados se informan como `default`.
+    """
+    
+    def __init__(self, states=None, states_file=None, default='active'):
+        self.states = states or {}
+        self.states_file = states_file
+        self.default = default
+        self.calls = 0
+    
+    def _load(self):
+        if not self.states_file:
+            return self.states
+        try:
+            with open(self.states_file, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return self.states
+    
+    def get_states(self, services):
+        self.calls += 1
+        states = self._load()
+        result = {}
+        for service in dict.fromkeys(s for s in services if s):
+            state = states.get(service, states.get(unit_name(service), self.default))
+            if not isinstance(state, dict):
+                state = {'active_state': state, 'sub_state': 'running' if state == 'active' else 'dead'}
+            result[service] = {
+                'load_state': state.get('load_state', 'loaded'),
+                'active_state': state.get('active_state'),
+                'sub_state': state.get('sub_state'),
+                'main_pid': state.get('main_pid', 0)
+            }
+        return result
+
+
+class CachedStatusBackend:
+    """Cachea por unos segundos el resultado de otro backend
+    
+    Varias pestañas o workers pidiendo el listado a la vez comparten la misma
+    consulta a systemd.
+    """
+    
+    def __init__(self, backend, ttl=2):
+        self.backend = backend
+        self.ttl = ttl
+        self._cache = {}
+        self._lock = threading.Lock()
+    
+    def get_states(self, services):
+        services = list(dict.fromkeys(s for s in services if s))
+        now = time.monotonic()
+        with self._lock:
+            missing = [s for s in services if s not in self._cache or now - self._cache[s][0] > self.ttl]
+            if missing:
+                try:
+                    fresh = self.backend.get_states(missing)
+                except Exception as e:
+                    logger.error(f"Error reading service states: {e}")
+                    fresh = {s: None for s in missing}
+                for service, state in fresh.items():
+                    self._cache[service] = (now, state)
+            return {s: self._cache[s][1] for s in services}
+
+
+_backends = {}
+
+
+def get_status_backend(config):
+    """Backend de estado configurado (SERVICE_STATUS_BACKEND), uno por proceso"""
+    name = config.get('SERVICE_STATUS_BACKEND', 'systemctl')
+    if name not in _backends:
+        if name == 'fake':
+            backend = FakeStatusBackend(states_file=config.get('SERVICE_STATUS_FAKE_FILE') or None)
+        else:
+            backend = SystemctlStatusBackend()
+        _backends[name] = CachedStatusBackend(backend, ttl=config.get('SERVICE_STATUS_CACHE_SECONDS', 2))
+    return _backends[name]
@@ -0,0 +1,45 @@
+import json
+from functools import wraps
+from flask import g, jsonify
+from flask_jwt_extended import verify_jwt_in_request, get_jwt
+
+# Cabeceras de las respuestas SSE (X-Accel-Buffering evita el buffer de nginx)
+SSE_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no'
+}
+
+# Claim `scope` de los tokens emitidos por POST /api/auth/stream-token
+STREAM_SCOPE = 'stream'
+
+
+def sse_event(event, data, event_id=None):
+    """Formatea un evento Server-Sent Events"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return '\n'.join(lines) + '\n\n'
+
+
+def stream_token_required(fn):
+    """Protege un endpoint SSE con un token de stream en el query string (?jwt=...)
+    
+    EventSource no permite cabeceras, así que el token viaja en la URL (y
+    queda en logs e historial): solo se acepta el token de corta duración de
+    POST /api/auth/stream-token, nunca el access token normal.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        g.stream_endpoint = True
+        verify_jwt_in_request(locations=['query_string'])
+        if get_jwt().get('scope') != STREAM_SCOPE:
+            return jsonify({'error': 'Se requiere un token de stream'}), 401
+        return fn(*args, **kwargs)
+    return wrapper
+
+
+def token_scope_allowed(jwt_header, jwt_payload):
+    """Verificación global de JWT: los tokens de stream solo valen en endpoints SSE"""
+    return jwt_payload.get('scope') != STREAM_SCOPE or g.get('stream_endpoint', False)
@@ -1,7 +1,12 @@
+import os
 import psutil
 import time
+import threading
+import logging
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
 class SystemMonitor:
     """Monitor del sistema para obtener métricas en tiempo real"""
     
@@ -9,14 +14,24 @@ class SystemMonitor:
         self._last_net_io = None
         self._last_net_time = None
     
-    def get_cpu_info(self):
-        """Obtiene información de CPU"""
+    def get_cpu_info(self, interval=1):
+        """Obtiene información de CPU
+        
+        Args:
+            interval: Segundos de medición de psutil. Con None no bloquea y
+                mide contra la llamada anterior (lo usa el muestreador).
+        """
+        freq = psutil.cpu_freq()
+        # IO-wait desde la llamada anterior (solo Linux)
+        times = psutil.cpu_times_percent(interval=None)
         return {
-            'percent': round(psutil.cpu_percent(interval=1), 2),
+            'percent': round(psutil.cpu_percent(interval=interval), 2),
             'count': psutil.cpu_count(),
             'count_logical': psutil.cpu_count(logical=True),
-            'freq': psutil.cpu_freq()._asdict() if psutil.cpu_freq() else None,
-            'per_cpu': [round(x, 2) for x in psutil.cpu_percent(interval=1, percpu=True)]
+            'freq': freq._asdict() if freq else None,
+            'per_cpu': [round(x, 2) for x in psutil.cpu_percent(interval=interval, percpu=True)],
+            'load_avg': [round(x, 2) for x in os.getloadavg()],
+            'iowait': round(getattr(times, 'iowait', 0.0), 2)
         }
     
     def get_memory_info(self):
@@ -119,13 +134,270 @@ class SystemMonitor:
         
         return " ".join(parts) if parts else "< 1m"
     
-    def get_all_metrics(self):
+    def get_all_metrics(self, interval=1):
         """Obtiene todas las métricas del sistema"""
         return {
             'timestamp': datetime.now().isoformat(),
-            'cpu': self.get_cpu_info(),
+            'cpu': self.get_cpu_info(interval=interval),
             'memory': self.get_memory_info(),
             'disk': self.get_disk_info(),
             'network': self.get_network_info(),
             'system': self.get_system_info()
         }
+
+
+class MetricsSampler:
+    """Muestreador en segundo plano de métricas del sistema
+    
+    Un hilo daemon toma una muestra completa (CPU, memoria, disco, red) cada
+    `interval` segundos y la guarda como snapshot en memoria. Los endpoints
+    leen ese snapshot en lugar de medir, así ninguna petición bloquea un
+    worker esperando a psutil.
+    
+    Con un `store` compartido (SharedMetricsStore) solo un proceso mide: el
+    que obtiene el lock de escritor publica cada muestra en el segmento y el
+    resto de los workers lo leen. Si el escritor muere, otro worker toma el
+    lock en su siguiente intento.
+    """
+    
+    # Frecuencia con la que los lectores revisan si hay una muestra nueva
+    READ_POLL_INTERVAL = 0.25
+    
+    def __init__(self, monitor=None, interval=2, store=None):
+        self.monitor = monitor or SystemMonitor()
+        self.interval = interval
+        self.store = store
+        self._snapshot = None
+        self._version = 0
+        self._lock = threading.Lock()
+        self._updated = threading.Condition(self._lock)
+        self._sample_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._listeners = []
+        self._collectors = {}
+    
+    def init_app(self, app):
+        """Toma la configuración de la app (wsgi.py inicia el hilo en cada worker)"""
+        from services.metrics_store import SharedMetricsStore
+        
+        self.interval = app.config.get('METRICS_SAMPLE_INTERVAL', self.interval)
+        if app.config.get('METRICS_SHARED_STORE', True):
+            self.store = SharedMetricsStore(
+                path=app.config.get('METRICS_SHM_PATH') or None,
+                size=app.config.get('METRICS_SHM_SIZE', 1024 * 1024)
+            )
+    
+    def start(self):
+        """Inicia el hilo de muestreo si no está corriendo en este proceso"""
+        with self._lock:
+            # Tras un fork (workers de gunicorn) el hilo del padre no existe
+            if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            
+            self._pid = os.getpid()
+            self._stop_event.clear()
+            # Primera llamada sin intervalo: fija la referencia de cpu_percent
+            psutil.cpu_percent(interval=None)
+            psutil.cpu_percent(interval=None, percpu=True)
+            self._thread = threading.Thread(target=self._run, name='metrics-sampler', daemon=True)
+            self._thread.start()
+            logger.info(f"Metrics sampler started (pid={self._pid}, interval={self.interval}s)")
+    
+    def stop(self):
+        """Detiene el hilo de muestreo"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval + 1)
+        self._thread = None
+    
+    def add_collector(self, key, collector):
+        """Registra una función cuyo resultado se agrega a cada muestra bajo `key`
+        
+        Solo corre en el proceso escritor; el resultado viaja en el snapshot
+        compartido, así todos los workers sirven los mismos valores.
+        """
+        self._collectors[key] = collector
+    
+    def add_listener(self, callback):
+        """Registra una función que recibe cada muestra nueva
+        
+        Solo se invoca en el proceso escritor, así los consumidores (historial,
+        alertas, etc.) procesan cada muestra una única vez entre todos los workers.
+        """
+        self._listeners.append(callback)
+    
+    def is_writer(self):
+        """Indica si este proceso es el que mide (siempre, sin store compartido)"""
+        return self.store is None or self.store.is_writer()
+    
+    @property
+    def version(self):
+        """Versión del snapshot actual (crece con cada muestra nueva)"""
+        return self._version
+    
+    def _set_snapshot(self, metrics, version=None):
+        """Reemplaza el snapshot local"""
+        with self._lock:
+            self._snapshot = metrics
+            self._version = version if version is not None else self._version + 1
+            self._updated.notify_all()
+    
+    def wait_for_update(self, last_version, timeout=None):
+        """Espera una muestra con versión distinta de `last_version`
+        
+        Returns:
+            tuple: (versión, snapshot). Si vence el timeout la versión es la misma.
+        """
+        self.start()
+        with self._lock:
+            self._updated.wait_for(lambda: self._version != last_version, timeout=timeout)
+            return self._version, self._snapshot
+    
+    def _disable_store(self, error):
+        """Vuelve al muestreo por proceso si el segmento compartido falla"""
+        logger.error(f"Shared metrics store unavailable, sampling per process: {error}")
+        self.store = None
+    
+    def sample_once(self):
+        """Toma una muestra sin bloquear, la publica si es escritor y actualiza el snapshot"""
+        # El monitor guarda estado de red entre llamadas: una muestra a la vez
+        with self._sample_lock:
+            metrics = self.monitor.get_all_metrics(interval=None)
+            if self.is_writer():
+                for key, collector in self._collectors.items():
+                    try:
+                        metrics[key] = collector()
+                    except Exception as e:
+                        logger.error(f"Error in metrics collector '{key}': {e}")
+            version = None
+            if self.store is not None:
+                # Una muestra local de un lector queda en versión 0 hasta leer el segmento
+                version = 0
+                if self.store.is_writer():
+                    try:
+                        version = self.store.write(metrics)
+                    except Exception as e:
+                        logger.error(f"Error publishing metrics snapshot: {e}")
+            self._set_snapshot(metrics, version)
+        return metrics
+    
+    def _notify_listeners(self, metrics):
+        """Entrega la muestra a los consumidores registrados"""
+        for callback in self._listeners:
+            try:
+                callback(metrics)
+            except Exception as e:
+                logger.error(f"Error in metrics listener {getattr(callback, '__qualname__', callback)}: {e}")
+    
+    def _refresh_from_store(self):
+        """Carga la última muestra del escritor si cambió; False si no hay una vigente"""
+        try:
+            if self.store.read_version() == self._version and self._snapshot is not None:
+                return True
+            version, written_at, metrics = self.store.read()
+        except Exception as e:
+            self._disable_store(e)
+            return False
+        
+        # Segmento vacío o escritor caído hace rato (p.ej. tras reiniciar el servicio)
+        if metrics is None or time.time() - written_at > max(5 * self.interval, 10):
+            return False
+        
+        self._set_snapshot(metrics, version)
+        return True
+    
+    def get_snapshot(self):
+        """Devuelve la última muestra disponible"""
+        self.start()
+        if self.store is not None and not self.store.is_writer():
+            self._refresh_from_store()
+        
+        snapshot = self._snapshot
+        if snapshot is None:
+            # Aún no hay muestra: tomar una local sin bloquear
+            snapshot = self.sample_once()
+        return snapshot
+    
+    def get_versioned_snapshot(self):
+        """Última muestra y su versión, leídas juntas (p.ej. para cachear por versión)"""
+        self.get_snapshot()
+        with self._lock:
+            return self._version, self._snapshot
+    
+    def peek_snapshot(self):
+        """Última muestra conocida sin iniciar el hilo ni competir por el rol de escritor
+        
+        Para procesos que no sirven métricas (cron, CLI): si este proceso no
+        muestrea, lee el store compartido solo si ya existe. None si no hay
+        una muestra vigente.
+        """
+        running = self._thread is not None and self._thread.is_alive() and self._pid == os.getpid()
+        if (not running and self.store is not None and not self.store.is_writer()
+                and os.path.exists(self.store.path) and not self._refresh_from_store()):
+            return None
+        return self._snapshot
+    
+    def _try_become_writer(self):
+        """Intenta tomar el rol de escritor del store compartido"""
+        try:
+            return self.store.try_acquire_writer()
+        except Exception as e:
+            self._disable_store(e)
+            return False
+    
+    def _run(self):
+        """Bucle de muestreo: el escritor mide con cadencia fija, los lectores leen el segmento"""
+        # La primera muestra espera un intervalo para que cpu_percent tenga base
+        next_sample = time.monotonic() + self.interval
+        next_acquire = time.monotonic()
+        delay = 0
+        while not self._stop_event.wait(delay):
+            now = time.monotonic()
+            
+            if self.store is not None and not self.store.is_writer() and now >= next_acquire:
+                next_acquire = now + self.interval
+                self._try_become_writer()
+            
+            if not self.is_writer():
+                self._refresh_from_store()
+                delay = self.READ_POLL_INTERVAL
+                continue
+            
+            if now >= next_sample:
+                try:
+                    self._notify_listeners(self.sample_once())
+                except Exception as e:
+                    logger.error(f"Error sampling system metrics: {e}")
+                
+                # Cadencia fija: no acumular el tiempo que tarda la muestra
+                next_sample += self.interval
+                if next_sample < time.monotonic():
+                    next_sample = time.monotonic()
+            delay = max(0, next_sample - time.monotonic())
+
+
+def metrics_delta(previous, current):
+    """Devuelve solo los campos de `current` que cambiaron respecto de `previous`
+    
+    Los diccionarios se comparan campo a campo; las listas (per_cpu, discos)
+    se envían completas si cambió cualquier elemento.
+    """
+    delta = {}
+    for key, value in current.items():
+        if key not in previous:
+            delta[key] = value
+            continue
+        old = previous[key]
+        if isinstance(value, dict) and isinstance(old, dict):
+            nested = metrics_delta(old, value)
+            if nested:
+                delta[key] = nested
+        elif value != old:
+            delta[key] = value
+    return delta
+
+
+# Muestreador compartido por los endpoints de este proceso
+sampler = MetricsSampler()
@@ -0,0 +1,22 @@
+import os
+import sys
+
+# Los módulos del backend se importan como en la app (services.*, models)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from flask import Flask
+
+
+@pytest.fixture
+def db_app():
+    """App mínima con los modelos sobre SQLite en memoria"""
+    from models import db
+    
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
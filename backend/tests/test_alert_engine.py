@@ -0,0 +1,103 @@
+import pytest
+
+from services.alert_engine import AlertRule, RingBuffer, extract_metric
+
+
+def fill(rule, values, start=1000, step=10):
+    """Buffer de la regla con un punto cada `step` segundos; devuelve (buffer, instante del último)"""
+    buffer = rule.new_buffer()
+    t = start
+    for value in values:
+        buffer.append(t, value)
+        last, t = t, t + step
+    return buffer, last
+
+
+def test_threshold_fires_when_whole_window_matches():
+    rule = AlertRule('disk_full', 'disk_percent', op='>', threshold=90, **{'for': 60})
+    buffer, now = fill(rule, [95] * 7)
+    
+    assert rule.evaluate(buffer, now, tolerance=10) == (True, 95)
+
+
+def test_threshold_waits_until_window_is_covered():
+    rule = AlertRule('disk_full', 'disk_percent', op='>', threshold=90, **{'for': 60})
+    buffer, now = fill(rule, [95] * 3)
+    
+    assert rule.evaluate(buffer, now, tolerance=10) is None
+
+
+def test_threshold_clears_as_soon_as_latest_point_recovers():
+    rule = AlertRule('disk_full', 'disk_percent', op='>', threshold=90, **{'for': 60})
+    buffer, now = fill(rule, [95, 95])
+    
+    assert rule.evaluate(buffer, now, tolerance=10) is None
+    buffer.append(now + 10, 50)
+    assert rule.evaluate(buffer, now + 10, tolerance=10) == (False, 50)
+
+
+def test_threshold_does_not_fire_with_a_dip_in_the_window():
+    rule = AlertRule('disk_full', 'disk_percent', op='>', threshold=90, **{'for': 60})
+    buffer, now = fill(rule, [95, 95, 95, 80, 95, 95, 95])
+    
+    assert rule.evaluate(buffer, now, tolerance=10) == (False, 95)
+
+
+def test_rate_is_slope_per_hour():
+    rule = AlertRule('rss_growth', 'instance_rss_mb', type='rate', op='>', threshold=50, window=600)
+    # 1 MB por minuto = 60 MB por hora
+    buffer, now = fill(rule, [100 + i for i in range(11)], step=60)
+    
+    assert rule.evaluate(buffer, now, tolerance=60) == (True, 60.0)
+
+
+def test_rate_needs_a_covered_window():
+    rule = AlertRule('rss_growth', 'instance_rss_mb', type='rate', op='>', threshold=50, window=600)
+    buffer, now = fill(rule, [100, 200], step=60)
+    
+    assert rule.evaluate(buffer, now, tolerance=60) is None
+
+
+def test_percentile_interpolates_between_points():
+    rule = AlertRule('cpu_p95', 'cpu_percent', type='percentile', percentile=50, op='>', threshold=20,
+                     window=40)
+    buffer, now = fill(rule, [10, 20, 30, 40, 50])
+    
+    assert rule.evaluate(buffer, now, tolerance=10) == (True, 30.0)
+    
+    rule.percentile = 95
+    assert rule.evaluate(buffer, now, tolerance=10) == (True, 48.0)
+
+
+def test_empty_buffer_is_undecided():
+    rule = AlertRule('disk_full', 'disk_percent', threshold=90)
+    
+    assert rule.evaluate(rule.new_buffer(), 1000, tolerance=10) is None
+
+
+def test_invalid_rule_is_rejected():
+    with pytest.raises(ValueError):
+        AlertRule('x', 'cpu_percent', type='avg')
+    with pytest.raises(ValueError):
+        AlertRule('x', 'cpu_percent', op='==')
+
+
+def test_ring_buffer_keeps_one_point_per_spacing():
+    buffer = RingBuffer(3, spacing=10)
+    for t in (0, 5, 10, 20, 30):
+        buffer.append(t, t)
+    
+    assert buffer.window(100, 30) == [(10, 10), (20, 20), (30, 30)]
+    assert buffer.oldest() == 10
+
+
+def test_extract_metric_by_subject():
+    snapshot = {
+        'cpu': {'percent': 12.5},
+        'disk': [{'mountpoint': '/', 'percent': 91}, {'mountpoint': '/data', 'percent': 40}],
+        'instances': {'prod-a': {'rss_mb': 512}}
+    }
+    
+    assert extract_metric(snapshot, 'cpu_percent') == {'host': 12.5}
+    assert extract_metric(snapshot, 'disk_percent') == {'/': 91, '/data': 40}
+    assert extract_metric(snapshot, 'instance_rss_mb') == {'prod-a': 512}
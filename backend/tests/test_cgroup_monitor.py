@@ -0,0 +1,90 @@
+import pytest
+
+from services import cgroup_monitor
+from services.cgroup_monitor import CgroupMonitor
+
+MB = 1024 ** 2
+
+
+def write_unit(root, service, usage_usec, memory, anon, rbytes, wbytes):
+    path = root / 'system.slice' / f'{service}.service'
+    path.mkdir(parents=True, exist_ok=True)
+    (path / 'cpu.stat').write_text(f'usage_usec {usage_usec}\nuser_usec 0\nsystem_usec 0\n')
+    (path / 'memory.current').write_text(f'{memory}\n')
+    (path / 'memory.stat').write_text(f'anon {anon}\nfile 0\n')
+    (path / 'io.stat').write_text(
+        f'8:0 rbytes={rbytes // 2} wbytes={wbytes} rios=1 wios=1\n'
+        f'8:16 rbytes={rbytes - rbytes // 2} wbytes=0 rios=1 wios=1\n'
+    )
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cgroup_monitor.time, 'monotonic', lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def monitor(tmp_path):
+    monitor = CgroupMonitor(cgroup_root=str(tmp_path))
+    monitor.cpu_count = 4
+    return monitor
+
+
+def test_first_reading_has_memory_but_no_rates(tmp_path, monitor, clock):
+    write_unit(tmp_path, 'odoo-a', 0, 200 * MB, 150 * MB, 0, 0)
+    
+    usage = monitor.collect({'prod-a': 'odoo-a'})['prod-a']
+    
+    assert usage['memory_mb'] == 200
+    assert usage['rss_mb'] == 150
+    assert usage['cpu_percent'] is None
+    assert usage['io_read_mb_s'] is None
+
+
+def test_cpu_and_io_deltas(tmp_path, monitor, clock):
+    write_unit(tmp_path, 'odoo-a', 1_000_000, 200 * MB, 150 * MB, 10 * MB, 0)
+    monitor.collect({'prod-a': 'odoo-a'})
+    
+    # 2 s después: 3 s de CPU (1,5 núcleos), 20 MB leídos y 4 MB escritos
+    clock[0] += 2
+    write_unit(tmp_path, 'odoo-a', 4_000_000, 210 * MB, 160 * MB, 30 * MB, 4 * MB)
+    usage = monitor.collect({'prod-a': 'odoo-a'})['prod-a']
+    
+    assert usage['cpu_cores'] == 1.5
+    assert usage['cpu_percent'] == 37.5
+    assert usage['io_read_mb_s'] == 10
+    assert usage['io_write_mb_s'] == 2
+    assert usage['memory_mb'] == 210
+
+
+def test_counter_reset_gives_no_rate(tmp_path, monitor, clock):
+    write_unit(tmp_path, 'odoo-a', 5_000_000, 200 * MB, 150 * MB, 10 * MB, 0)
+    monitor.collect({'prod-a': 'odoo-a'})
+    
+    # Servicio reiniciado: cgroup nuevo con contadores en cero
+    clock[0] += 2
+    write_unit(tmp_path, 'odoo-a', 100_000, 50 * MB, 40 * MB, 0, 0)
+    usage = monitor.collect({'prod-a': 'odoo-a'})['prod-a']
+    
+    assert usage['cpu_percent'] is None
+    assert usage['io_read_mb_s'] is None
+    assert usage['memory_mb'] == 50
+
+
+def test_units_without_cgroup_or_service_are_skipped(tmp_path, monitor, clock):
+    write_unit(tmp_path, 'odoo-a', 0, MB, MB, 0, 0)
+    
+    result = monitor.collect({'prod-a': 'odoo-a', 'dev-b': 'odoo-b', 'dev-c': None})
+    
+    assert list(result) == ['prod-a']
+
+
+def test_missing_files_leave_fields_empty(tmp_path, monitor, clock):
+    (tmp_path / 'system.slice' / 'odoo-a.service').mkdir(parents=True)
+    
+    usage = monitor.collect({'prod-a': 'odoo-a'})['prod-a']
+    
+    assert usage['memory_mb'] is None
+    assert usage['rss_mb'] is None
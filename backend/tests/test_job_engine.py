@@ -0,0 +1,152 @@
+from collections import Counter
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from models import db, Job
+from services.job_engine import JobEngine
+
+
+@pytest.fixture
+def engine(db_app, tmp_path):
+    """Motor sin app: encola sin despachar (no lanza procesos)"""
+    return JobEngine(directory=str(tmp_path))
+
+
+def test_submit_queues_job(engine, tmp_path):
+    result = engine.submit('create', ['/bin/true'], 'prod-a')
+    
+    assert result['success'] is True
+    assert result['job']['status'] == 'queued'
+    assert result['job']['job_class'] == 'db'
+    assert result['job']['log_file'] == str(tmp_path / f"{result['job']['id']}.log")
+
+
+def test_submit_rejects_duplicate_active_operation(engine):
+    first = engine.submit('create', ['/bin/true'], 'prod-a')
+    
+    result = engine.submit('create', ['/bin/true'], 'prod-a')
+    
+    assert result['success'] is False
+    assert result['job']['id'] == first['job']['id']
+    assert engine.submit('backup', ['/bin/true'], 'prod-a')['success'] is True
+
+
+def test_cancel_queued_job(engine):
+    job_id = engine.submit('create', ['/bin/true'], 'prod-a')['job']['id']
+    
+    result = engine.cancel(job_id)
+    
+    assert result['success'] is True
+    assert db.session.get(Job, job_id).status == 'cancelled'
+    assert engine.cancel(job_id)['success'] is False
+
+
+def test_job_result_waits_for_finished_job(engine, db_app):
+    engine.app = db_app
+    job_id = engine.submit('create', ['/bin/true'], 'prod-a')['job']['id']
+    
+    assert engine.job_result(job_id) is None
+    
+    job = db.session.get(Job, job_id)
+    job.status, job.exit_code, job.duration = 'failed', 2, 12.5
+    db.session.commit()
+    
+    assert engine.job_result(job_id) == {'status': 'failed', 'exit_code': 2, 'duration': 12.5}
+    assert engine.job_result(999) == {'status': None, 'exit_code': None, 'duration': None}
+
+
+def test_latest_returns_last_job_of_instance(engine):
+    first = engine.submit('create', ['/bin/true'], 'prod-a')['job']['id']
+    engine.cancel(first)
+    second = engine.submit('create', ['/bin/true'], 'prod-a')['job']['id']
+    
+    latest = engine.latest('create', 'prod-a')
+    
+    assert latest['id'] == second
+    assert latest['queue_position'] == 1
+    assert engine.latest('create', 'prod-b') is None
+
+
+def add_job(action, status='queued', job_class='db', priority=1, **fields):
+    job = Job(action=action, instance_name=f'{action}-{status}', command='[]', status=status,
+              job_class=job_class, priority=priority, **fields)
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def queued_job(job_class='db', waited=0):
+    return SimpleNamespace(job_class=job_class, created_at=datetime.utcnow() - timedelta(seconds=waited))
+
+
+def test_admission_respects_concurrency_and_class_limits():
+    engine = JobEngine(max_concurrent=2, class_limits={'db': 1})
+    
+    assert engine._admission(queued_job(), 0, Counter(), {}, idle=False).startswith('Límite de jobs')
+    assert engine._admission(queued_job(), 1, Counter(db=1), {}, idle=False).startswith('Límite de la clase db')
+    assert engine._admission(queued_job('io'), 1, Counter(db=1), {}, idle=False) is None
+
+
+def test_admission_holds_on_load_and_iowait():
+    engine = JobEngine(max_load_per_cpu=1.5, max_iowait=25)
+    loaded = {'load_per_cpu': 2.0, 'iowait': 0}
+    iowait = {'load_per_cpu': 0.5, 'iowait': 40}
+    
+    assert engine._admission(queued_job(), 2, Counter(), loaded, idle=False).startswith('Carga del sistema')
+    assert engine._admission(queued_job('db'), 2, Counter(), iowait, idle=False).startswith('IO-wait')
+    # El IO-wait no frena a los jobs de CPU
+    assert engine._admission(queued_job('cpu'), 2, Counter(), iowait, idle=False) is None
+
+
+def test_admission_releases_idle_queue_after_max_hold():
+    engine = JobEngine(max_hold=900)
+    loaded = {'load_per_cpu': 5.0, 'iowait': 90}
+    
+    assert engine._admission(queued_job(waited=60), 2, Counter(), loaded, idle=True) is not None
+    assert engine._admission(queued_job(waited=1000), 2, Counter(), loaded, idle=True) is None
+    assert engine._admission(queued_job(waited=1000), 2, Counter(), loaded, idle=False) is not None
+
+
+def test_pressure_from_sample():
+    metrics = {'cpu': {'load_avg': [3.0, 1.0, 1.0], 'count_logical': 4, 'iowait': 12.5}}
+    
+    assert JobEngine().pressure(metrics) == {'load_per_cpu': 0.75, 'iowait': 12.5}
+
+
+def test_estimates_average_recent_successful_runs(engine):
+    add_job('backup', status='succeeded', duration=100)
+    add_job('backup', status='succeeded', duration=200)
+    add_job('backup', status='failed', duration=5)
+    
+    assert engine.estimates() == {'backup': 150}
+
+
+def test_queue_eta_follows_class_and_global_slots(engine):
+    engine.max_concurrent = 2
+    engine.class_limits = {'db': 1, 'io': 1}
+    engine.default_estimate = 300
+    first = add_job('backup')
+    second = add_job('restore')
+    other_class = add_job('update-files', job_class='io')
+    
+    queue = {job['id']: job for job in engine.queue()}
+    
+    assert [queue[job.id]['queue_position'] for job in (first, second, other_class)] == [1, 2, 3]
+    # El segundo db espera al primero; el de io usa el otro lugar global
+    assert [queue[job.id]['eta_seconds'] for job in (first, second, other_class)] == [0, 300, 0]
+
+
+def test_queue_eta_counts_running_jobs_and_priority(engine):
+    engine.max_concurrent = 1
+    engine.class_limits = {}
+    engine.default_estimate = 300
+    add_job('backup', status='running', started_at=datetime.utcnow() - timedelta(seconds=100))
+    low = add_job('backup', priority=2)
+    high = add_job('restore', priority=0)
+    
+    queue = engine.queue()
+    
+    assert [job['id'] for job in queue] == [high.id, low.id]
+    assert [job['eta_seconds'] for job in queue] == [200, 500]
@@ -0,0 +1,129 @@
+import pytest
+
+from services.journal import FakeJournalSource, InvalidCursor, JournalFollower, read_journal
+
+
+def make_source(count=3):
+    source = FakeJournalSource()
+    for i in range(count):
+        source.append('odoo-x', f'mensaje {i}', timestamp=1700000000 + i, pid=42)
+    return source
+
+
+def test_first_read_returns_last_lines():
+    result = read_journal(make_source(5), 'odoo-x', lines=2)
+    
+    assert result['count'] == 2
+    assert result['reset'] is True
+    assert result['cursor'] == 'fake;odoo-x;5'
+    assert 'mensaje 3' in result['logs'] and 'mensaje 4' in result['logs']
+    assert 'odoo-x[42]: mensaje 4\n' in result['logs']
+
+
+def test_resume_from_cursor_returns_only_new_entries():
+    source = make_source()
+    first = read_journal(source, 'odoo-x')
+    source.append('odoo-x', 'nuevo', timestamp=1700000100)
+    
+    result = read_journal(source, 'odoo-x', cursor=first['cursor'])
+    
+    assert result['count'] == 1
+    assert result['reset'] is False
+    assert result['cursor'] == 'fake;odoo-x;4'
+    assert result['logs'].endswith('odoo-x: nuevo\n')
+
+
+def test_resume_without_new_entries_keeps_cursor():
+    source = make_source()
+    first = read_journal(source, 'odoo-x')
+    
+    result = read_journal(source, 'odoo-x', cursor=first['cursor'])
+    
+    assert result == {'logs': '', 'count': 0, 'cursor': first['cursor'], 'reset': False}
+
+
+def test_invalid_cursor_reads_from_the_end():
+    source = make_source()
+    
+    result = read_journal(source, 'odoo-x', lines=2, cursor='fake;odoo-x;99')
+    
+    assert result['reset'] is True
+    assert result['count'] == 2
+    assert result['cursor'] == 'fake;odoo-x;3'
+
+
+def test_cursor_of_another_unit_is_invalid():
+    source = make_source()
+    with pytest.raises(InvalidCursor):
+        source.entries('odoo-x', after_cursor='fake;odoo-y;1')
+    
+    assert read_journal(source, 'odoo-x', cursor='fake;odoo-y;1')['reset'] is True
+
+
+def test_fake_source_returns_first_entries_after_cursor():
+    entries = make_source(10).entries('odoo-x', lines=3, after_cursor='fake;odoo-x;2')
+    
+    assert [e['message'] for e in entries] == ['mensaje 2', 'mensaje 3', 'mensaje 4']
+
+
+def test_more_new_entries_than_max_reads_last_lines():
+    source = make_source(10)
+    
+    result = read_journal(source, 'odoo-x', lines=2, cursor='fake;odoo-x;2', max_entries=5)
+    
+    assert result['reset'] is True
+    assert result['count'] == 2
+    assert result['cursor'] == 'fake;odoo-x;10'
+    assert 'mensaje 8' in result['logs'] and 'mensaje 9' in result['logs']
+    assert 'mensaje 2' not in result['logs']
+
+
+def follower_after_first_read(source, interval=0):
+    follower = JournalFollower(source, interval=interval)
+    first = read_journal(source, 'odoo-x')
+    return follower, first['cursor']
+
+
+def test_follower_shares_one_read_between_streams():
+    source = make_source()
+    follower, cursor = follower_after_first_read(source, interval=60)
+    follower.read('odoo-x', cursor)
+    source.append('odoo-x', 'nuevo')
+    calls = source.calls
+    
+    first = follower.read('odoo-x', cursor)
+    second = follower.read('odoo-x', cursor)
+    
+    # Dentro del intervalo no se vuelve a leer el journal
+    assert source.calls == calls
+    assert first['count'] == second['count'] == 0
+
+
+def test_follower_returns_entries_after_each_cursor():
+    source = make_source()
+    follower, cursor = follower_after_first_read(source)
+    follower.read('odoo-x', cursor)
+    source.append('odoo-x', 'uno')
+    behind = follower.read('odoo-x', cursor)
+    source.append('odoo-x', 'dos')
+    calls = source.calls
+    
+    ahead = follower.read('odoo-x', behind['cursor'])
+    late = follower.read('odoo-x', cursor)
+    
+    # Una lectura compartida por llamada (intervalo 0), ninguna propia
+    assert source.calls == calls + 2
+    assert ahead['count'] == 1 and ahead['logs'].endswith('odoo-x: dos\n')
+    assert late['count'] == 2 and late['cursor'] == ahead['cursor']
+    assert late['reset'] is False
+
+
+def test_follower_reads_alone_when_cursor_is_unknown():
+    source = make_source()
+    follower, cursor = follower_after_first_read(source)
+    follower.read('odoo-x', cursor)
+    
+    result = follower.read('odoo-x', 'fake;odoo-x;1')
+    
+    assert result['count'] == 2
+    assert result['cursor'] == 'fake;odoo-x;3'
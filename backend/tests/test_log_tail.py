@@ -0,0 +1,185 @@
+import os
+
+from services.log_tail import complete_utf8_length, read_incremental, tail_lines
+
+
+def write(path, data, mode='wb'):
+    with open(path, mode) as f:
+        f.write(data)
+
+
+def test_missing_file():
+    result = read_incremental('/nonexistent/odoo-create.log', 10)
+    
+    assert result['exists'] is False
+    assert result['offset'] == 0
+
+
+def test_first_read_returns_tail_and_cursor(tmp_path):
+    path = tmp_path / 'create.log'
+    write(path, b'0123456789')
+    
+    result = read_incremental(str(path), tail_bytes=4)
+    
+    assert result['log'] == '6789'
+    assert result['offset'] == 10
+    assert result['inode'] == os.stat(path).st_ino
+    assert result['reset'] is True
+    assert result['more'] is False
+
+
+def test_resume_returns_only_appended_bytes(tmp_path):
+    path = tmp_path / 'create.log'
+    write(path, b'linea 1\n')
+    first = read_incremental(str(path))
+    write(path, b'linea 2\n', mode='ab')
+    
+    result = read_incremental(str(path), first['offset'], first['inode'])
+    
+    assert result['log'] == 'linea 2\n'
+    assert result['offset'] == 16
+    assert result['reset'] is False
+
+
+def test_resume_without_changes_returns_nothing(tmp_path):
+    path = tmp_path / 'create.log'
+    write(path, b'linea 1\n')
+    first = read_incremental(str(path))
+    
+    result = read_incremental(str(path), first['offset'], first['inode'])
+    
+    assert result['log'] == ''
+    assert result['offset'] == first['offset']
+
+
+def test_truncated_file_is_reread_from_start(tmp_path):
+    path = tmp_path / 'create.log'
+    write(path, b'intento anterior, bastante largo\n')
+    first = read_incremental(str(path))
+    write(path, b'nuevo\n')
+    
+    result = read_incremental(str(path), first['offset'], first['inode'])
+    
+    assert result['log'] == 'nuevo\n'
+    assert result['reset'] is True
+    assert result['offset'] == 6
+
+
+def test_replaced_file_is_reread_from_start(tmp_path):
+    path = tmp_path / 'create.log'
+    write(path, b'viejo\n')
+    first = read_incremental(str(path))
+    write(tmp_path / 'nuevo.log', b'otro archivo mas largo\n')
+    os.replace(tmp_path / 'nuevo.log', path)
+    
+    result = read_incremental(str(path), first['offset'], first['inode'])
+    
+    assert result['log'] == 'otro archivo mas largo\n'
+    assert result['reset'] is True
+
+
+def test_max_bytes_pages_through_the_log(tmp_path):
+    path = tmp_path / 'create.log'
+    write(path, b'abcdefghij')
+    
+    first = read_incremental(str(path), 0, max_bytes=4)
+    second = read_incremental(str(path), first['offset'], first['inode'], max_bytes=4)
+    
+    assert (first['log'], first['offset'], first['more']) == ('abcd', 4, True)
+    assert (second['log'], second['offset'], second['more']) == ('efgh', 8, True)
+
+
+def test_incomplete_utf8_character_is_left_for_next_read(tmp_path):
+    path = tmp_path / 'create.log'
+    check = '✅'.encode('utf-8')
+    write(path, b'ok ' + check[:2])
+    
+    first = read_incremental(str(path), 0)
+    write(path, check[2:] + b'\n', mode='ab')
+    second = read_incremental(str(path), first['offset'], first['inode'])
+    
+    assert first['log'] == 'ok '
+    assert first['offset'] == 3
+    assert second['log'] == '✅\n'
+
+
+def test_tail_does_not_start_mid_character(tmp_path):
+    path = tmp_path / 'create.log'
+    write(path, 'xx✅ fin'.encode('utf-8'))
+    
+    result = read_incremental(str(path), tail_bytes=6)
+    
+    assert result['log'] == ' fin'
+
+
+def test_complete_utf8_length():
+    check = '✅'.encode('utf-8')
+    
+    assert complete_utf8_length(b'abc') == 3
+    assert complete_utf8_length(b'a' + check) == 4
+    assert complete_utf8_length(b'a' + check[:1]) == 1
+    assert complete_utf8_length(b'a' + check[:2]) == 1
+
+
+def numbered_log(path, count):
+    write(path, ''.join(f'linea {i}\n' for i in range(count)).encode('utf-8'))
+
+
+def test_tail_lines_reads_across_blocks(tmp_path):
+    path = tmp_path / 'odoo.log'
+    numbered_log(path, 100)
+    
+    result = tail_lines(str(path), lines=30, block_size=16)
+    
+    assert result['lines'] == 30
+    assert result['log'].startswith('linea 70\n')
+    assert result['log'].endswith('linea 99\n')
+    assert result['end'] == result['size']
+    assert result['has_more'] is True
+
+
+def test_tail_lines_pages_backwards_with_before(tmp_path):
+    path = tmp_path / 'odoo.log'
+    numbered_log(path, 10)
+    last = tail_lines(str(path), lines=4, block_size=8)
+    
+    previous = tail_lines(str(path), lines=4, before=last['start'], inode=last['inode'], block_size=8)
+    
+    assert previous['log'] == 'linea 2\nlinea 3\nlinea 4\nlinea 5\n'
+    assert previous['end'] == last['start']
+    assert previous['reset'] is False
+
+
+def test_tail_lines_returns_whole_file_when_shorter(tmp_path):
+    path = tmp_path / 'odoo.log'
+    write(path, b'uno\ndos')
+    
+    result = tail_lines(str(path), lines=10)
+    
+    assert result['log'] == 'uno\ndos'
+    assert result['lines'] == 2
+    assert result['start'] == 0
+    assert result['has_more'] is False
+
+
+def test_tail_lines_ignores_before_after_rotation(tmp_path):
+    path = tmp_path / 'odoo.log'
+    numbered_log(path, 10)
+    last = tail_lines(str(path), lines=2)
+    write(tmp_path / 'nuevo.log', b'rotado\n')
+    os.replace(tmp_path / 'nuevo.log', path)
+    
+    result = tail_lines(str(path), lines=2, before=last['start'], inode=last['inode'])
+    
+    assert result['reset'] is True
+    assert result['log'] == 'rotado\n'
+
+
+def test_tail_lines_caps_long_lines(tmp_path):
+    path = tmp_path / 'odoo.log'
+    write(path, b'x' * 100 + b'\n')
+    
+    result = tail_lines(str(path), lines=1, block_size=16, max_bytes=32)
+    
+    assert result['start'] == result['end'] - 32
+    assert result['has_more'] is True
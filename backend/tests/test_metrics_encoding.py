@@ -0,0 +1,58 @@
+from datetime import datetime
+
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+from services.metrics_encoding import COLUMNAR_MIMETYPE, encode_columns, negotiate, rows_to_columns
+
+
+def accept(header):
+    return parse_accept_header(header, MIMEAccept)
+
+
+def test_negotiate_prefers_json_on_wildcard():
+    assert negotiate(accept('*/*')) == 'json'
+    assert negotiate(MIMEAccept()) == 'json'
+
+
+def test_negotiate_compact_formats():
+    assert negotiate(accept(COLUMNAR_MIMETYPE)) == 'columnar'
+    assert negotiate(accept('application/msgpack,application/json;q=0.5')) == 'msgpack'
+
+
+def test_rows_to_columns_uses_epoch_seconds():
+    rows = [
+        {'timestamp': datetime(2024, 1, 1, 0, 0, 0), 'cpu_percent': 1.5},
+        {'timestamp': '2024-01-01T00:01:00', 'cpu_percent': None}
+    ]
+    
+    timestamps, columns = rows_to_columns(rows, ['cpu_percent'])
+    
+    assert timestamps == [1704067200, 1704067260]
+    assert columns == {'cpu_percent': [1.5, None]}
+
+
+def test_encode_columns_delta_encodes_timestamps():
+    payload = encode_columns([100, 160, 220, 290], {'cpu': [1.234, 2.0, None, 3]}, resolution='raw')
+    
+    assert payload['t0'] == 100
+    assert payload['dt'] == [0, 60, 60, 70]
+    assert payload['count'] == 4
+    assert payload['resolution'] == 'raw'
+    assert payload['fields']['cpu'] == [1.23, 2.0, None, 3]
+    assert 'scale' not in payload
+
+
+def test_encode_columns_scaled_integers():
+    payload = encode_columns([100], {'cpu': [12.345]}, precision=1, scaled=True)
+    
+    assert payload['scale'] == 10
+    assert payload['fields']['cpu'] == [123]
+
+
+def test_encode_columns_empty_series():
+    payload = encode_columns([], {'cpu': []})
+    
+    assert payload['count'] == 0
+    assert payload['t0'] is None
+    assert payload['dt'] == []
@@ -0,0 +1,139 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from models import db, MetricsHistory, MetricsRollup1m, MetricsRollup15m
+from services.metrics_rollup import EPOCH, MetricsRollupManager, floor_time
+
+NOW = datetime(2024, 1, 1, 12, 0, 0)
+
+
+def manager(**config):
+    return MetricsRollupManager(SimpleNamespace(**config))
+
+
+def add_raw(start, values, step=20):
+    for i, value in enumerate(values):
+        db.session.add(MetricsHistory(timestamp=start + timedelta(seconds=i * step), cpu_percent=value,
+                                      ram_total_gb=8, disk_total_gb=100))
+    db.session.commit()
+
+
+def test_floor_time():
+    assert floor_time(datetime(2024, 1, 1, 12, 7, 59), 60) == datetime(2024, 1, 1, 12, 7)
+    assert floor_time(datetime(2024, 1, 1, 12, 7, 59), 900) == datetime(2024, 1, 1, 12, 0)
+    assert floor_time(datetime(2024, 1, 1, 12, 59, 0), 3600) == datetime(2024, 1, 1, 12, 0)
+
+
+def test_raw_samples_roll_up_into_minute_buckets(db_app):
+    add_raw(NOW - timedelta(minutes=3), [10, 20, 30, 40, 50, 60])
+    
+    manager().run(now=NOW)
+    
+    rows = MetricsRollup1m.query.order_by(MetricsRollup1m.bucket_start).all()
+    assert [row.bucket_start for row in rows] == [NOW - timedelta(minutes=3), NOW - timedelta(minutes=2)]
+    assert [(r.cpu_percent_min, r.cpu_percent_avg, r.cpu_percent_max, r.sample_count) for r in rows] == [
+        (10, 20, 30, 3), (40, 50, 60, 3)
+    ]
+    assert rows[0].ram_total_gb == 8
+
+
+def test_open_bucket_is_not_rolled_up(db_app):
+    add_raw(NOW, [10, 20])
+    
+    manager().run(now=NOW + timedelta(seconds=30))
+    
+    assert MetricsRollup1m.query.count() == 0
+
+
+def test_rerun_replaces_buckets_with_late_samples(db_app):
+    add_raw(NOW - timedelta(minutes=2), [10, 20])
+    rollups = manager()
+    rollups.run(now=NOW)
+    # Muestra tardía dentro del bucket ya agregado
+    add_raw(NOW - timedelta(minutes=2) + timedelta(seconds=50), [60])
+    
+    rollups.run(now=NOW)
+    
+    rows = MetricsRollup1m.query.all()
+    assert len(rows) == 1
+    assert (rows[0].cpu_percent_avg, rows[0].cpu_percent_max, rows[0].sample_count) == (30, 60, 3)
+
+
+def test_coarser_tier_weights_average_by_sample_count(db_app):
+    start = NOW - timedelta(minutes=15)
+    add_raw(start, [5, 10, 15])
+    add_raw(start + timedelta(minutes=1), [50])
+    
+    manager().run(now=NOW)
+    
+    row = MetricsRollup15m.query.one()
+    assert row.bucket_start == start
+    assert row.sample_count == 4
+    assert (row.cpu_percent_min, row.cpu_percent_avg, row.cpu_percent_max) == (5, 20, 50)
+
+
+def test_retention_removes_old_raw_rows(db_app):
+    add_raw(NOW - timedelta(hours=3), [10])
+    add_raw(NOW - timedelta(minutes=30), [20])
+    
+    manager(METRICS_RAW_RETENTION_HOURS=1).run(now=NOW)
+    
+    assert [row.cpu_percent for row in MetricsHistory.query.all()] == [20]
+
+
+def test_choose_tier_respects_max_points():
+    rollups = manager(METRICS_HISTORY_MAX_POINTS=100)
+    
+    assert rollups.choose_tier(3600).name == 'raw'
+    assert rollups.choose_tier(6 * 3600).name == '15m'
+    assert rollups.choose_tier(30 * 86400).name == '1h'
+
+
+def recent_minutes(count):
+    """Una muestra por minuto con cpu = minuto, desde un bucket de 10 minutos de la última hora"""
+    base = floor_time(datetime.utcnow() - timedelta(hours=1), 600)
+    add_raw(base, list(range(count)), step=60)
+    return base, int((base - EPOCH).total_seconds())
+
+
+def test_bucketed_query_averages_rollups_in_sql(db_app):
+    base, epoch = recent_minutes(20)
+    rollups = manager()
+    rollups.run()
+    
+    result = rollups.bucketed_query(base, base + timedelta(minutes=20), 600, ['cpu_percent'])
+    
+    assert result['resolution'] == '1m'
+    assert result['timestamps'] == [epoch, epoch + 600]
+    assert result['cpu_percent'] == [4.5, 14.5]
+
+
+def test_bucketed_query_max_uses_max_columns(db_app):
+    base, _ = recent_minutes(20)
+    rollups = manager()
+    rollups.run()
+    
+    result = rollups.bucketed_query(base, base + timedelta(minutes=20), 600, ['cpu_percent'], agg='max')
+    
+    assert result['cpu_percent'] == [9, 19]
+
+
+def test_bucketed_percentile_falls_back_to_python_on_sqlite(db_app):
+    base, epoch = recent_minutes(20)
+    
+    result = manager().bucketed_query(base, base + timedelta(minutes=20), 600, ['cpu_percent'], agg='p95')
+    
+    # Menos de 15 filas por bucket en cualquier nivel agregado: se usa el crudo
+    assert result['resolution'] == 'raw'
+    assert result['timestamps'] == [epoch, epoch + 600]
+    assert result['cpu_percent'] == [8.55, 18.55]
+
+
+def test_choose_source_tier():
+    rollups = manager()
+    
+    assert rollups.choose_source_tier(NOW - timedelta(hours=1), 600, now=NOW).name == '1m'
+    assert rollups.choose_source_tier(NOW - timedelta(hours=1), 3600, now=NOW).name == '1h'
+    assert rollups.choose_source_tier(NOW - timedelta(hours=1), 3600, min_rows=15, now=NOW).name == '1m'
+    # Fuera de la retención del crudo y del 1m
+    assert rollups.choose_source_tier(NOW - timedelta(days=30), 60, now=NOW).name == '15m'
@@ -0,0 +1,109 @@
+import os
+
+from services.nginx_log_index import NginxLogIndex
+
+
+def make_index(tmp_path, **options):
+    index = NginxLogIndex('nginx-access', str(tmp_path / 'access.log'), str(tmp_path / 'index'), **options)
+    index.set_domains(['x.com', 'dev-x.com', 'y.com'])
+    return index
+
+
+def append(tmp_path, *lines, name='access.log'):
+    with open(tmp_path / name, 'ab') as f:
+        f.write(''.join(line + '\n' for line in lines).encode('utf-8'))
+
+
+def test_lines_are_indexed_per_domain(tmp_path):
+    append(tmp_path, 'GET / x.com 1', 'GET / y.com 2', 'GET / dev-x.com 3', 'GET / x.com 4')
+    index = make_index(tmp_path)
+    
+    index.catch_up()
+    
+    assert index.last_lines('x.com', 10) == ['GET / x.com 1', 'GET / x.com 4']
+    assert index.last_lines('dev-x.com', 10) == ['GET / dev-x.com 3']
+    assert index.last_lines('x.com', 1) == ['GET / x.com 4']
+
+
+def test_other_process_reads_offsets_from_disk(tmp_path):
+    append(tmp_path, 'GET / x.com 1', 'GET / y.com 2', 'GET / x.com 3')
+    make_index(tmp_path).catch_up()
+    
+    reader = make_index(tmp_path)
+    
+    assert reader.last_lines('x.com', 10) == ['GET / x.com 1', 'GET / x.com 3']
+    assert os.path.getsize(tmp_path / 'index' / 'x.com.idx') == 16
+
+
+def test_catch_up_indexes_only_new_complete_lines(tmp_path):
+    append(tmp_path, 'GET / x.com 1')
+    index = make_index(tmp_path)
+    index.catch_up()
+    with open(tmp_path / 'access.log', 'ab') as f:
+        f.write(b'GET / x.com 2\nGET / x.com 3')
+    
+    index.catch_up()
+    
+    assert index.read_state()['offset'] == os.path.getsize(tmp_path / 'access.log') - len('GET / x.com 3')
+    assert index.last_lines('x.com', 10) == ['GET / x.com 1', 'GET / x.com 2']
+    
+    append(tmp_path, '')
+    index.catch_up()
+    
+    assert make_index(tmp_path).last_lines('x.com', 10) == ['GET / x.com 1', 'GET / x.com 2', 'GET / x.com 3']
+
+
+def test_rotation_keeps_previous_file_as_generation_one(tmp_path):
+    append(tmp_path, 'GET / x.com viejo 1')
+    index = make_index(tmp_path)
+    index.catch_up()
+    # Líneas escritas después del último indexado y antes de rotar
+    append(tmp_path, 'GET / x.com viejo 2')
+    os.rename(tmp_path / 'access.log', tmp_path / 'access.log.1')
+    append(tmp_path, 'GET / x.com nuevo 1')
+    
+    index.catch_up()
+    
+    assert os.path.exists(tmp_path / 'index' / 'x.com.1.idx')
+    assert index.read_state()['rotated_inode'] == os.stat(tmp_path / 'access.log.1').st_ino
+    assert make_index(tmp_path).last_lines('x.com', 10) == [
+        'GET / x.com viejo 1', 'GET / x.com viejo 2', 'GET / x.com nuevo 1'
+    ]
+
+
+def test_copytruncate_discards_old_offsets(tmp_path):
+    append(tmp_path, 'GET / x.com viejo 1', 'GET / x.com viejo 2')
+    index = make_index(tmp_path)
+    index.catch_up()
+    with open(tmp_path / 'access.log', 'wb') as f:
+        f.write(b'GET / x.com nuevo\n')
+    
+    index.catch_up()
+    
+    assert not os.path.exists(tmp_path / 'index' / 'x.com.1.idx')
+    assert make_index(tmp_path).last_lines('x.com', 10) == ['GET / x.com nuevo']
+
+
+def test_first_index_of_large_log_starts_at_a_line(tmp_path):
+    append(tmp_path, *(f'GET / x.com {i:03}' for i in range(100)))
+    index = make_index(tmp_path, backfill_bytes=100)
+    
+    index.catch_up()
+    
+    lines = make_index(tmp_path).last_lines('x.com', 100)
+    assert len(lines) < 100
+    assert lines[0].startswith('GET / x.com ')
+    assert lines[-1] == 'GET / x.com 099'
+
+
+def test_observer_sees_new_lines_but_not_backfill(tmp_path):
+    append(tmp_path, 'GET / x.com historia')
+    index = make_index(tmp_path)
+    seen = []
+    index.observer = lambda domain, line: seen.append((domain, line))
+    index.catch_up()
+    append(tmp_path, 'GET / y.com nueva')
+    
+    index.catch_up()
+    
+    assert seen == [('y.com', b'GET / y.com nueva')]
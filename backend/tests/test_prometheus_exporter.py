@@ -0,0 +1,30 @@
+from services.prometheus_exporter import MetricFamily
+
+
+def counter():
+    return MetricFamily('panel_network_sent_bytes', 'counter', 'Bytes enviados').add(10, {'nic': 'eth0'})
+
+
+def test_counter_openmetrics_uses_total_samples():
+    assert counter().render(openmetrics=True) == [
+        '# HELP panel_network_sent_bytes Bytes enviados',
+        '# TYPE panel_network_sent_bytes counter',
+        'panel_network_sent_bytes_total{nic="eth0"} 10'
+    ]
+
+
+def test_counter_text_format_uses_total_everywhere():
+    assert counter().render(openmetrics=False) == [
+        '# HELP panel_network_sent_bytes_total Bytes enviados',
+        '# TYPE panel_network_sent_bytes_total counter',
+        'panel_network_sent_bytes_total{nic="eth0"} 10'
+    ]
+
+
+def test_gauge_and_suffixed_samples_keep_their_names():
+    gauge = MetricFamily('panel_cpu_usage_percent', 'gauge', 'CPU').add(1.5)
+    histogram = MetricFamily('panel_http_request_duration_seconds', 'histogram', 'Latencia')
+    histogram.add(3, suffix='_count').add(None, suffix='_sum')
+    
+    assert gauge.render()[-1] == 'panel_cpu_usage_percent 1.5'
+    assert histogram.render()[2:] == ['panel_http_request_duration_seconds_count 3']
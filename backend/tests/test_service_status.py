@@ -0,0 +1,98 @@
+import subprocess
+
+from services.service_status import (
+    CachedStatusBackend, FakeStatusBackend, SystemctlStatusBackend, status_from_state, unit_name
+)
+
+SHOW_OUTPUT = """Id=odoo19e-prod-a.service
+LoadState=loaded
+ActiveState=active
+SubState=running
+MainPID=1234
+
+Id=odoo19e-dev-b.service
+LoadState=loaded
+ActiveState=failed
+SubState=failed
+MainPID=0
+
+Id=odoo19e-gone.service
+LoadState=not-found
+ActiveState=inactive
+SubState=dead
+MainPID=0
+"""
+
+
+def fake_run(stdout, returncode=0, stderr=''):
+    calls = []
+    
+    def run(command, **kwargs):
+        calls.append(command)
+        return subprocess.CompletedProcess(command, returncode, stdout=stdout, stderr=stderr)
+    return run, calls
+
+
+def test_systemctl_show_is_parsed_per_unit(monkeypatch):
+    run, calls = fake_run(SHOW_OUTPUT)
+    monkeypatch.setattr(subprocess, 'run', run)
+    
+    states = SystemctlStatusBackend().get_states(['odoo19e-prod-a', 'odoo19e-dev-b.service', 'odoo19e-gone'])
+    
+    assert len(calls) == 1
+    assert calls[0][-3:] == ['odoo19e-prod-a.service', 'odoo19e-dev-b.service', 'odoo19e-gone.service']
+    assert states['odoo19e-prod-a'] == {
+        'load_state': 'loaded', 'active_state': 'active', 'sub_state': 'running', 'main_pid': 1234
+    }
+    assert states['odoo19e-dev-b.service']['active_state'] == 'failed'
+    assert states['odoo19e-gone']['load_state'] == 'not-found'
+
+
+def test_systemctl_unit_missing_from_output_is_none(monkeypatch):
+    run, _ = fake_run(SHOW_OUTPUT.split('\n\n')[0])
+    monkeypatch.setattr(subprocess, 'run', run)
+    
+    states = SystemctlStatusBackend().get_states(['odoo19e-prod-a', 'odoo19e-other'])
+    
+    assert states['odoo19e-other'] is None
+
+
+def test_status_from_state():
+    assert status_from_state({'active_state': 'active'}) == 'active'
+    assert status_from_state({'active_state': 'failed'}) == 'inactive'
+    assert status_from_state({'active_state': 'inactive'}) == 'inactive'
+    assert status_from_state({'active_state': 'activating'}) == 'unknown'
+    assert status_from_state(None) == 'unknown'
+
+
+def test_fake_backend_states():
+    backend = FakeStatusBackend(states={
+        'odoo-a': 'inactive',
+        'odoo-b.service': {'active_state': 'active', 'sub_state': 'running', 'main_pid': 7}
+    })
+    
+    states = backend.get_states(['odoo-a', 'odoo-b', 'odoo-c'])
+    
+    assert states['odoo-a'] == {'load_state': 'loaded', 'active_state': 'inactive', 'sub_state': 'dead', 'main_pid': 0}
+    assert states['odoo-b']['main_pid'] == 7
+    assert states['odoo-c']['active_state'] == 'active'
+    assert unit_name('odoo-b') == 'odoo-b.service'
+
+
+def test_fake_backend_reads_states_file(tmp_path):
+    states_file = tmp_path / 'states.json'
+    states_file.write_text('{"odoo-a": "failed"}')
+    
+    backend = FakeStatusBackend(states_file=str(states_file))
+    
+    assert status_from_state(backend.get_states(['odoo-a'])['odoo-a']) == 'inactive'
+
+
+def test_cached_backend_shares_one_query():
+    fake = FakeStatusBackend()
+    backend = CachedStatusBackend(fake, ttl=60)
+    
+    backend.get_states(['odoo-a', 'odoo-b'])
+    backend.get_states(['odoo-b', 'odoo-a'])
+    
+    assert fake.calls == 1
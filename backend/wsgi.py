@@ -1,9 +1,16 @@
 from app import create_app, init_db
+from services.system_monitor import sampler
 
 app = create_app()
 
 # Inicializar BD al arrancar
 init_db(app)
 
+# Muestreador en cada worker desde el arranque (gunicorn sin --preload importa
+# este módulo en cada worker): el lock de escritor elige al único que mide,
+# escribe el historial, evalúa alertas, indexa nginx y despacha jobs, sin
+# esperar a que alguien abra el panel
+sampler.start()
+
 if __name__ == '__main__':
     app.run()
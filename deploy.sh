@@ -213,6 +213,10 @@ Environment="PATH=$BACKEND_DIR/venv/bin"
 
 # Configuración de Gunicorn para archivos grandes y operaciones largas
 # -w 4: 4 workers (ajustar según CPU)
+# --worker-class gthread --threads 32: hilos por worker. Cada stream SSE
+#   (métricas, eventos de instancias, journal: hasta 3 por pestaña) ocupa un
+#   hilo hasta 10 minutos (METRICS_STREAM_MAX_SECONDS); 4x32 = 128 hilos
+#   alcanzan para ~30 pestañas abiertas y dejan hilos libres para la API
 # -b 127.0.0.1:5000: bind a localhost
 # --timeout 600: timeout de 10 minutos para operaciones largas (backups)
 # --max-requests 1000: reiniciar workers después de 1000 requests
@@ -221,6 +225,8 @@ Environment="PATH=$BACKEND_DIR/venv/bin"
 # --limit-request-field_size 8190: límite de campo de header
 ExecStart=$BACKEND_DIR/venv/bin/gunicorn \\
     -w 4 \\
+    --worker-class gthread \\
+    --threads 32 \\
     -b 127.0.0.1:5000 \\
     --timeout 600 \\
     --max-requests 1000 \\
@@ -339,10 +345,9 @@ else
   echo "✅ Certificado SSL ya existe"
 fi
 
-# 8. Crear cron job para guardar métricas cada minuto
-echo "⏰ Configurando cron job para métricas..."
-CRON_JOB="* * * * * curl -X POST http://localhost:5000/api/metrics/save >/dev/null 2>&1"
-(crontab -l 2>/dev/null | grep -v "/api/metrics/save"; echo "$CRON_JOB") | crontab -
+# 8. Quitar el cron antiguo de métricas (el backend guarda el historial por sí mismo)
+echo "⏰ Eliminando cron job antiguo de métricas..."
+(crontab -l 2>/dev/null | grep -v "/api/metrics/save") | crontab -
 
 echo ""
 echo "✅ ¡Despliegue completado con éxito!"
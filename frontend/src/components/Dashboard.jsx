@@ -2,7 +2,7 @@ import { useState, useEffect } from 'react';
 import { metrics } from '../lib/api';
 import { Cpu, HardDrive, Activity, Network, Clock, Server } from 'lucide-react';
 import { LineChart, Line, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer } from 'recharts';
-import { formatUptime } from '../lib/utils';
+import { formatUptime, mergeDelta, decodeColumnar } from '../lib/utils';
 
 export default function Dashboard() {
   const [currentMetrics, setCurrentMetrics] = useState(null);
@@ -10,19 +10,39 @@ export default function Dashboard() {
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
-    fetchMetrics();
-    const interval = setInterval(fetchMetrics, 5000); // Actualizar cada 5 segundos
-    return () => clearInterval(interval);
+    let pollingInterval = null;
+
+    // Métricas en vivo por SSE: snapshot al conectar y luego solo los cambios
+    const stream = metrics.stream({
+      snapshot: (event) => {
+        setCurrentMetrics(JSON.parse(event.data));
+        setLoading(false);
+      },
+      delta: (event) => {
+        setCurrentMetrics(prev => mergeDelta(prev, JSON.parse(event.data)));
+      },
+    }, () => {
+      // No se pudo (re)conectar el stream: volver a polling
+      if (!pollingInterval) {
+        fetchCurrent();
+        pollingInterval = setInterval(fetchCurrent, 5000);
+      }
+    });
+
+    fetchHistory();
+    const historyInterval = setInterval(fetchHistory, 60000); // El historial se guarda por minuto
+
+    return () => {
+      stream.close();
+      clearInterval(historyInterval);
+      if (pollingInterval) clearInterval(pollingInterval);
+    };
   }, []);
 
-  const fetchMetrics = async () => {
+  const fetchCurrent = async () => {
     try {
-      const [current, hist] = await Promise.all([
-        metrics.getCurrent(),
-        metrics.getHistory(60)
-      ]);
+      const current = await metrics.getCurrent();
       setCurrentMetrics(current.data);
-      setHistory(hist.data.metrics || []);
       setLoading(false);
     } catch (error) {
       console.error('Error fetching metrics:', error);
@@ -30,6 +50,15 @@ export default function Dashboard() {
     }
   };
 
+  const fetchHistory = async () => {
+    try {
+      const hist = await metrics.getHistoryColumnar(60);
+      setHistory(decodeColumnar(hist.data));
+    } catch (error) {
+      console.error('Error fetching metrics history:', error);
+    }
+  };
+
   if (loading) {
     return (
       <div className="flex items-center justify-center h-64">
@@ -12,7 +12,7 @@ import { useInstances, useCreationLog, useUpdateLog } from './instances/hooks';
 // Componentes de tarjetas
 import { InstanceCard } from './instances/cards';
 // Utilidades
-import { getConfirmTitle, getConfirmMessage, applyAllFilters } from './instances/utils';
+import { getConfirmTitle, getConfirmMessage, applyAllFilters, appendLogChunk } from './instances/utils';
 
 export default function Instances() {
   // Hook para manejar lista de instancias (reemplaza useState y useEffect)
@@ -38,6 +38,8 @@ export default function Instances() {
   const [logs, setLogs] = useState('');
   const [activeLogTab, setActiveLogTab] = useState('systemd');
   const [logsLoading, setLogsLoading] = useState(false);
+  const [olderLogsPage, setOlderLogsPage] = useState(null);
+  const [journalCursor, setJournalCursor] = useState(null);
   const [confirmModal, setConfirmModal] = useState({ isOpen: false, action: null, instanceName: null, neutralize: true });
   const [toast, setToast] = useState({ show: false, message: '', type: 'success' });
   const [restartModal, setRestartModal] = useState({ show: false, instanceName: '', status: 'Reiniciando...' });
@@ -219,6 +221,8 @@ export default function Instances() {
     setActiveLogTab(logType);
     setLogsLoading(true);
     setLogs('Cargando logs...');
+    setOlderLogsPage(null);
+    setJournalCursor(null);
     try {
       if (logType === 'git-deploy') {
         // Logs de Git/Deploy
@@ -237,6 +241,8 @@ export default function Instances() {
         // Logs normales (systemd, odoo, nginx)
         const response = await instances.getLogs(instanceName, 200, logType);
         setLogs(response.data.logs);
+        setOlderLogsPage(nextOlderLogsPage(response.data));
+        if (logType === 'systemd') setJournalCursor(response.data.cursor || '');
       }
     } catch (error) {
       setLogs('Error al cargar logs: ' + (error.response?.data?.error || error.message));
@@ -245,6 +251,42 @@ export default function Instances() {
     }
   };
 
+  // Journal en vivo: desde el cursor de la primera lectura solo llegan las entradas nuevas
+  const following = selectedInstance && activeLogTab === 'systemd' && journalCursor !== null;
+  useEffect(() => {
+    if (!following) return undefined;
+    const stream = instances.journalStream(selectedInstance, journalCursor, {
+      entries: (event) => {
+        const data = JSON.parse(event.data);
+        if (data.count || data.reset) {
+          setLogs(prev => appendLogChunk(prev, { log: data.logs, reset: data.reset }));
+        }
+      },
+    });
+    return () => stream.close();
+  }, [following, selectedInstance]);
+
+  // Cursor para pedir las líneas anteriores (solo logs paginables, como el de Odoo)
+  const nextOlderLogsPage = (data) => (
+    data.has_more ? { before: data.start, inode: data.inode } : null
+  );
+
+  const handleLoadOlderLogs = async () => {
+    if (!selectedInstance || !olderLogsPage) return;
+    try {
+      const response = await instances.getLogs(selectedInstance, 200, activeLogTab, olderLogsPage);
+      if (response.data.reset) {
+        // El log rotó: se muestra desde el final otra vez
+        setLogs(response.data.logs);
+      } else {
+        setLogs(prev => response.data.logs + prev);
+      }
+      setOlderLogsPage(nextOlderLogsPage(response.data));
+    } catch (error) {
+      setToast({ show: true, message: error.response?.data?.error || 'Error al cargar logs anteriores', type: 'error' });
+    }
+  };
+
   const handleLogTabChange = (logType) => {
     if (selectedInstance) {
       handleViewLogs(selectedInstance, logType);
@@ -492,6 +534,7 @@ export default function Instances() {
         logsLoading={logsLoading}
         onClose={() => setSelectedInstance(null)}
         onTabChange={handleLogTabChange}
+        onLoadOlder={olderLogsPage ? handleLoadOlderLogs : null}
       />
 
       {/* Modal de confirmación */}
@@ -1,5 +1,6 @@
 import { useState, useEffect, useRef } from 'react';
 import { instances } from '../../../lib/api';
+import { appendLogChunk, nextLogCursor } from '../utils';
 
 /**
  * Hook para manejar el log de creación de instancias con polling
@@ -37,28 +38,33 @@ export function useCreationLog() {
 
     // Intervalo de polling (3s para producción, 2s para dev)
     const interval = isProduction ? 3000 : 2000;
-    
+
+    // Cursor de lectura: la primera respuesta trae el final del log, luego solo lo nuevo
+    let cursor = null;
+    let fullLog = '';
+
+    // Detectar finalización
+    const finishMessages = [
+      '✅ Instancia de desarrollo creada con éxito',
+      '✅ ¡INSTANCIA CREADA EXITOSAMENTE!',
+      'Instancia creada con éxito'
+    ];
+
     window._pollingInterval = setInterval(async () => {
       try {
-        const logResponse = await instances.getCreationLog(instanceName);
-        const newLog = logResponse.data.log;
-
-        setCreationLog(prev => ({
-          ...prev,
-          log:
-            (newLog === null || newLog === undefined)
-              ? prev.log || "Log no disponible aún..."
-              : (newLog === "" ? prev.log : newLog)
-        }));
+        const logResponse = await instances.getCreationLog(instanceName, cursor);
+        const data = logResponse.data;
+        if (!data.exists) {
+          setCreationLog(prev => ({ ...prev, log: prev.log || data.log || 'Log no disponible aún...' }));
+          return;
+        }
 
-        // Detectar finalización
-        const finishMessages = [
-          '✅ Instancia de desarrollo creada con éxito',
-          '✅ ¡INSTANCIA CREADA EXITOSAMENTE!',
-          'Instancia creada con éxito'
-        ];
+        cursor = nextLogCursor(data);
+        if (!data.log && !data.reset) return;
+        fullLog = appendLogChunk(fullLog, data);
+        setCreationLog(prev => ({ ...prev, log: fullLog }));
 
-        if (logResponse.data.log && finishMessages.some(msg => logResponse.data.log.includes(msg))) {
+        if (finishMessages.some(msg => fullLog.includes(msg))) {
           clearInterval(window._pollingInterval);
           window._pollingInterval = null;
         }
@@ -1,6 +1,9 @@
 import { useState, useEffect } from 'react';
 import { instances } from '../../../lib/api';
 
+// Eventos del stream que cambian el listado
+const LIST_EVENTS = ['added', 'removed', 'operation_finished', 'resync'];
+
 /**
  * Hook para manejar la lista de instancias y su actualización
  */
@@ -20,9 +23,32 @@ export function useInstances() {
   };
 
   useEffect(() => {
+    let pollingInterval = null;
     fetchInstances();
-    const interval = setInterval(fetchInstances, 10000); // Actualizar cada 10 segundos
-    return () => clearInterval(interval);
+
+    // Cambios por SSE: el estado se aplica en el lugar, el resto relee el listado
+    const handlers = {
+      state_changed: (event) => {
+        const { instance, state } = JSON.parse(event.data);
+        setInstanceList(prev => prev.map(i => (
+          i.name === instance
+            ? { ...i, status: state.status, active_state: state.active_state, sub_state: state.sub_state }
+            : i
+        )));
+      },
+    };
+    LIST_EVENTS.forEach(name => { handlers[name] = fetchInstances; });
+    const stream = instances.events(handlers, () => {
+      // No se pudo (re)conectar el stream: volver a polling
+      if (!pollingInterval) {
+        pollingInterval = setInterval(fetchInstances, 10000);
+      }
+    });
+
+    return () => {
+      stream.close();
+      if (pollingInterval) clearInterval(pollingInterval);
+    };
   }, []);
 
   return { instanceList, loading, fetchInstances };
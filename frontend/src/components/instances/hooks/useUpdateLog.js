@@ -1,5 +1,6 @@
 import { useState, useEffect, useRef } from 'react';
 import { instances } from '../../../lib/api';
+import { appendLogChunk, nextLogCursor } from '../utils';
 
 /**
  * Hook para manejar el log de actualización de instancias con polling
@@ -24,18 +25,23 @@ export function useUpdateLog() {
   const startPolling = (instanceName, action) => {
     setUpdateLog({ show: true, instanceName, action, log: '', completed: false });
 
+    // Cursor de lectura: desde el inicio y luego solo los bytes nuevos
+    let cursor = { offset: 0 };
+
     const pollLog = async () => {
       try {
-        const logResponse = await instances.getUpdateLog(instanceName, action);
+        const logResponse = await instances.getUpdateLog(instanceName, action, cursor);
+        const data = logResponse.data;
         
-        if (logResponse.data.exists) {
+        if (data.exists) {
+          cursor = nextLogCursor(data);
           setUpdateLog(prev => ({
             ...prev,
-            log: logResponse.data.log,
-            completed: logResponse.data.completed
+            log: appendLogChunk(prev.log, data),
+            completed: data.completed
           }));
 
-          if (logResponse.data.completed) {
+          if (data.completed) {
             // Detener polling cuando se complete
             return true;
           }
@@ -1,6 +1,7 @@
 /**
  * Modal para visualizar logs de instancias
  * Soporta múltiples tipos de logs: systemd, odoo, nginx-access, nginx-error, git-deploy
+ * Si recibe onLoadOlder muestra un botón para traer las líneas anteriores
  */
 export default function LogsModal({ 
   show, 
@@ -9,7 +10,8 @@ export default function LogsModal({
   logs, 
   logsLoading, 
   onClose, 
-  onTabChange 
+  onTabChange,
+  onLoadOlder
 }) {
   if (!show) return null;
 
@@ -60,9 +62,19 @@ export default function LogsModal({
               <div className="animate-spin rounded-full h-8 w-8 border-b-2 border-blue-600"></div>
             </div>
           ) : (
-            <pre className="bg-gray-900 text-green-400 p-4 rounded-lg overflow-auto flex-1 text-sm font-mono">
-              {logs}
-            </pre>
+            <>
+              {onLoadOlder && (
+                <button
+                  onClick={onLoadOlder}
+                  className="mb-2 self-start px-3 py-1 text-sm text-blue-600 dark:text-blue-400 hover:underline"
+                >
+                  Cargar líneas anteriores
+                </button>
+              )}
+              <pre className="bg-gray-900 text-green-400 p-4 rounded-lg overflow-auto flex-1 text-sm font-mono">
+                {logs}
+              </pre>
+            </>
           )}
         </div>
       </div>
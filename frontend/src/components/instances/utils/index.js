@@ -5,3 +5,4 @@ export {
   filterBySearchTerm, 
   applyAllFilters 
 } from './instanceFilters';
+export { appendLogChunk, nextLogCursor, MAX_LOG_CHARS } from './logChunks';
@@ -0,0 +1,26 @@
+/**
+ * Utilidades para logs leídos de forma incremental (offset + inode)
+ */
+
+// Caracteres que se conservan en pantalla (los logs de creación llegan a MB)
+export const MAX_LOG_CHARS = 200000;
+
+/**
+ * Agrega un fragmento de log recibido al texto acumulado
+ * @param {string} previous - Texto acumulado hasta ahora
+ * @param {object} data - Respuesta del endpoint ({ log, reset })
+ * @returns {string} Texto acumulado, recortado a MAX_LOG_CHARS
+ */
+export function appendLogChunk(previous, data) {
+  const text = data.reset ? data.log : (previous || '') + data.log;
+  return text.length > MAX_LOG_CHARS ? text.slice(-MAX_LOG_CHARS) : text;
+}
+
+/**
+ * Cursor para la próxima lectura a partir de la respuesta del endpoint
+ * @param {object} data - Respuesta del endpoint ({ offset, inode })
+ * @returns {object|null} { offset, inode } o null si el log aún no existe
+ */
+export function nextLogCursor(data) {
+  return data.exists ? { offset: data.offset, inode: data.inode } : null;
+}
@@ -1,4 +1,5 @@
 import axios from 'axios';
+import { COLUMNAR_MIMETYPE } from './utils';
 
 // En producción, usar rutas relativas (mismo dominio)
 // En desarrollo, usar localhost:5000
@@ -42,6 +43,68 @@ api.interceptors.response.use(
   }
 );
 
+// Streams SSE. EventSource no permite cabeceras: cada conexión pide un token
+// de stream (corta duración, solo sirve para streams) y lo manda en el query
+// string. Si el stream se corta (el servidor lo cierra cada 10 minutos) se
+// reconecta con un token nuevo; path(lastEventId) arma la ruta para retomar
+// desde el último evento recibido. onClosed se llama si no se pudo reconectar.
+const MAX_STREAM_RETRIES = 3;
+
+const openStream = (path, handlers, onClosed) => {
+  let source = null;
+  let closed = false;
+  let lastEventId = null;
+  let failures = 0;
+  let retryTimer = null;
+
+  const giveUp = () => {
+    if (!closed && onClosed) onClosed();
+  };
+
+  const connect = async () => {
+    let token;
+    try {
+      token = (await api.post('/api/auth/stream-token')).data.token;
+    } catch (error) {
+      giveUp();
+      return;
+    }
+    if (closed) return;
+
+    const url = `${API_URL}${path(lastEventId)}`;
+    source = new EventSource(`${url}${url.includes('?') ? '&' : '?'}jwt=${encodeURIComponent(token)}`);
+    source.onopen = () => {
+      failures = 0;
+    };
+    Object.entries(handlers).forEach(([name, handler]) => {
+      source.addEventListener(name, (event) => {
+        if (event.lastEventId) lastEventId = event.lastEventId;
+        handler(event);
+      });
+    });
+    source.onerror = () => {
+      // EventSource reintentaría con el mismo token (ya vencido): se reconecta con uno nuevo
+      source.close();
+      if (closed) return;
+      failures += 1;
+      if (failures > MAX_STREAM_RETRIES) {
+        giveUp();
+        return;
+      }
+      retryTimer = setTimeout(connect, 2000);
+    };
+  };
+
+  connect();
+  return {
+    close: () => {
+      closed = true;
+      clearTimeout(retryTimer);
+      if (source) source.close();
+    },
+  };
+};
+
 export const auth = {
   login: (username, password) => 
     api.post('/api/auth/login', { username, password }),
@@ -57,20 +120,40 @@ export const metrics = {
   getCurrent: () => 
     api.get('/api/metrics/current'),
   
+  // Stream SSE de métricas: handlers = { snapshot, delta }
+  stream: (handlers, onClosed) => 
+    openStream(() => '/api/metrics/stream', handlers, onClosed),
+  
   getHistory: (minutes = 60) => 
     api.get(`/api/metrics/history?minutes=${minutes}`),
+  
+  // Misma serie en formato columnar compacto (ver decodeColumnar)
+  getHistoryColumnar: (minutes = 60) => 
+    api.get(`/api/metrics/history?minutes=${minutes}`, { headers: { Accept: COLUMNAR_MIMETYPE } }),
+  
+  // Serie agregada en buckets: { from, to, step, fields, agg }
+  query: (params = {}) => 
+    api.get('/api/metrics/query', { params }),
 };
 
 export const instances = {
   list: () => 
     api.get('/api/instances'),
   
+  // Stream SSE de eventos (altas, bajas, cambios de estado, operaciones terminadas)
+  events: (handlers, onClosed) => 
+    openStream(
+      (lastEventId) => `/api/instances/events${lastEventId ? `?last_event_id=${lastEventId}` : ''}`,
+      handlers,
+      onClosed
+    ),
+  
   get: (name) => 
     api.get(`/api/instances/${encodeURIComponent(name)}`),
   
   // Método actualizado: ahora acepta sourceInstance
-  create: (name, sourceInstance = null, neutralize = true) => 
-    api.post('/api/instances/create', { name, sourceInstance, neutralize }),
+  create: (name, sourceInstance = null, neutralize = true, cloneMethod = null) => 
+    api.post('/api/instances/create', { name, sourceInstance, neutralize, cloneMethod }),
   
   // Nuevo método: obtener instancias de producción disponibles
   getProductionInstances: () => 
@@ -97,17 +180,31 @@ export const instances = {
   regenerateAssets: (name) => 
     api.post(`/api/instances/${encodeURIComponent(name)}/regenerate-assets`),
   
-  getLogs: (name, lines = 100, type = 'systemd') => 
-    api.get(`/api/instances/${encodeURIComponent(name)}/logs?lines=${lines}&type=${type}`),
+  // page = { before, inode } de la respuesta anterior para traer líneas previas (log de Odoo)
+  getLogs: (name, lines = 100, type = 'systemd', page = null) => 
+    api.get(`/api/instances/${encodeURIComponent(name)}/logs?lines=${lines}&type=${type}`, { params: page || {} }),
+  
+  // Stream SSE del journal (systemd); cursor = el de la respuesta anterior
+  journalStream: (name, cursor, handlers, onClosed) => 
+    openStream(
+      (lastEventId) => {
+        const from = lastEventId || cursor;
+        return `/api/instances/${encodeURIComponent(name)}/logs/stream`
+          + (from ? `?cursor=${encodeURIComponent(from)}` : '');
+      },
+      handlers,
+      onClosed
+    ),
   
   restart: (name) => 
     api.post(`/api/instances/${encodeURIComponent(name)}/restart`),
   
-  getCreationLog: (name) => 
-    api.get(`/api/instances/creation-log/${encodeURIComponent(name)}`),
+  // cursor = { offset, inode } de la respuesta anterior: solo trae lo nuevo
+  getCreationLog: (name, cursor = null) => 
+    api.get(`/api/instances/creation-log/${encodeURIComponent(name)}`, { params: cursor || {} }),
   
-  getUpdateLog: (name, action) => 
-    api.get(`/api/instances/update-log/${encodeURIComponent(name)}/${encodeURIComponent(action)}`),
+  getUpdateLog: (name, action, cursor = null) => 
+    api.get(`/api/instances/update-log/${encodeURIComponent(name)}/${encodeURIComponent(action)}`, { params: cursor || {} }),
 };
 
 export const logs = {
@@ -282,3 +379,25 @@ export const backupV2 = {
   getGlobalStats: () => 
     api.get('/api/backup/v2/stats'),
 };
+
+export const jobs = {
+  list: (params = {}) => 
+    api.get('/api/jobs', { params }),
+  
+  get: (id) => 
+    api.get(`/api/jobs/${id}`),
+  
+  // cursor = { offset, inode } de la respuesta anterior: solo trae lo nuevo
+  getLog: (id, cursor = null) => 
+    api.get(`/api/jobs/${id}/log`, { params: cursor || {} }),
+  
+  cancel: (id) => 
+    api.post(`/api/jobs/${id}/cancel`),
+  
+  getStats: (hours = 24) => 
+    api.get('/api/jobs/stats', { params: { hours } }),
+  
+  // Cola en orden de despacho con posición, ETA y motivo de espera
+  getQueue: () => 
+    api.get('/api/jobs/queue'),
+};
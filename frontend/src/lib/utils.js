@@ -40,3 +40,39 @@ export function formatDate(dateString) {
     minute: '2-digit',
   }).format(date);
 }
+
+// Aplica un delta (solo campos cambiados) sobre un objeto, recursivamente.
+// Las listas se reemplazan completas, igual que las envía el backend.
+export function mergeDelta(target, delta) {
+  if (!target) return delta;
+  const result = { ...target };
+  Object.entries(delta).forEach(([key, value]) => {
+    const current = result[key];
+    if (value && typeof value === 'object' && !Array.isArray(value)
+        && current && typeof current === 'object' && !Array.isArray(current)) {
+      result[key] = mergeDelta(current, value);
+    } else {
+      result[key] = value;
+    }
+  });
+  return result;
+}
+
+// Decodifica la serie columnar compacta de /api/metrics (t0 + deltas) en
+// filas { timestamp (ms), campo: valor } para los gráficos.
+export const COLUMNAR_MIMETYPE = 'application/vnd.serverpanel.columnar+json';
+
+export function decodeColumnar(data) {
+  const rows = [];
+  const fields = Object.entries(data.fields || {});
+  let t = data.t0;
+  (data.dt || []).forEach((delta, i) => {
+    t += delta;
+    const row = { timestamp: t * 1000 };
+    fields.forEach(([name, values]) => {
+      row[name] = data.scale ? (values[i] === null ? null : values[i] / data.scale) : values[i];
+    });
+    rows.push(row);
+  });
+  return rows;
+}
@@ -0,0 +1,149 @@
+#!/bin/bash
+export PATH=/usr/local/sbin:/usr/local/bin:/usr/sbin:/usr/bin:/sbin:/bin
+
+# 🗄️ Clona una base de datos de producción en una nueva base
+# Uso: clone-database.sh <bd_origen> <bd_destino> <owner>
+#
+# Métodos (variable DB_CLONE_METHOD):
+#   auto      Copia desde el snapshot de producción con CREATE DATABASE ... TEMPLATE
+#             si existe y no es más viejo que DB_CLONE_SNAPSHOT_MAX_AGE minutos (60);
+#             si no, pg_dump/pg_restore en paralelo y renueva el snapshot.
+#   template  Como auto pero usa el snapshot sin importar su antigüedad.
+#   dump      Siempre pg_dump -Fd -j N / pg_restore -j N, sin snapshot.
+#
+# El snapshot (<bd_origen>-clone-snapshot) es una copia de producción sin
+# neutralizar, marcada como plantilla y sin conexiones permitidas (Odoo no la
+# lista). CREATE DATABASE ... TEMPLATE copia los archivos de la base sin pasar
+# por SQL ni reconstruir índices, pero exige que nadie esté conectado a la
+# plantilla: por eso se copia del snapshot y no de producción, que nunca se
+# corta. La ventana sin conexiones es solo la del snapshot.
+#
+# La antigüedad del snapshot usado queda como detalle de la fase db_template
+# (age=N min) en las fases del job. Si pg_restore terminó con errores la copia
+# se deja como está, pero no se usa para renovar el snapshot.
+
+set -e
+
+SRC_DB="$1"
+DEST_DB="$2"
+OWNER="$3"
+
+if [[ -z "$SRC_DB" ]] || [[ -z "$DEST_DB" ]] || [[ -z "$OWNER" ]]; then
+  echo "❌ Uso: $0 <bd_origen> <bd_destino> <owner>"
+  exit 1
+fi
+
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+source "$SCRIPT_DIR/../utils/job-phases.sh"
+
+METHOD="${DB_CLONE_METHOD:-auto}"
+JOBS="${DB_CLONE_JOBS:-0}"
+MAX_AGE="${DB_CLONE_SNAPSHOT_MAX_AGE:-60}"
+RESTORE_FAILED=0
+SNAPSHOT_DB="${SRC_DB}-clone-snapshot"
+
+if [[ "$JOBS" -lt 1 ]]; then
+  JOBS=$(( $(nproc) / 2 ))
+  [[ "$JOBS" -lt 1 ]] && JOBS=1
+fi
+
+psql_admin() {
+  sudo -u postgres psql -v ON_ERROR_STOP=1 -tA -d postgres "$@"
+}
+
+db_exists() {
+  [[ "$(psql_admin -c "SELECT 1 FROM pg_database WHERE datname = '$1';")" == "1" ]]
+}
+
+# Antigüedad del snapshot en minutos (vacío si no existe o no tiene fecha)
+snapshot_age() {
+  local comment
+  comment=$(psql_admin -c "SELECT shobj_description(oid, 'pg_database') FROM pg_database WHERE datname = '$SNAPSHOT_DB';")
+  local created="${comment##*:}"
+  if [[ "$comment" == snapshot:* ]] && [[ "$created" =~ ^[0-9]+$ ]]; then
+    echo $(( ($(date +%s) - created) / 60 ))
+  fi
+}
+
+# Copia de archivos desde el snapshot: corta las conexiones que haya y copia
+clone_from_snapshot() {
+  phase_start db_template
+  psql_admin -c "ALTER DATABASE \"$SNAPSHOT_DB\" ALLOW_CONNECTIONS false;" >/dev/null
+  psql_admin -c "SELECT pg_terminate_backend(pid) FROM pg_stat_activity WHERE datname = '$SNAPSHOT_DB';" >/dev/null
+  if ! psql_admin -c "CREATE DATABASE \"$DEST_DB\" TEMPLATE \"$SNAPSHOT_DB\" OWNER \"$OWNER\";" >/dev/null; then
+    phase_end failed
+    return 1
+  fi
+  phase_end "age=${AGE:-?} min"
+}
+
+# pg_dump en formato directorio y pg_restore, ambos con JOBS procesos
+clone_with_dump() {
+  # pg_dump crea el directorio (0700, de postgres)
+  local dump_dir="/tmp/${DEST_DB}_dump.$$"
+  sudo rm -rf "$dump_dir"
+
+  echo "   Creando dump de $SRC_DB ($JOBS procesos)..."
+  phase_start db_dump
+  if ! sudo -u postgres pg_dump -Fd -j "$JOBS" -f "$dump_dir" "$SRC_DB"; then
+    sudo rm -rf "$dump_dir"
+    return 1
+  fi
+  phase_end "jobs=$JOBS"
+
+  echo "   Creando base de datos $DEST_DB..."
+  sudo -u postgres createdb "$DEST_DB" -O "$OWNER" --encoding='UTF8'
+
+  echo "   Restaurando datos ($JOBS procesos)..."
+  phase_start db_restore
+  # Como el psql de antes, los errores sueltos (roles o extensiones que faltan) no cortan la copia
+  local detail="jobs=$JOBS"
+  if ! sudo -u postgres pg_restore -j "$JOBS" -d "$DEST_DB" "$dump_dir"; then
+    RESTORE_FAILED=1
+    detail+=", con errores"
+    echo "⚠️  pg_restore terminó con errores (ver arriba)"
+  fi
+  phase_end "$detail"
+  sudo rm -rf "$dump_dir"
+}
+
+# Reemplaza el snapshot por una copia de la base recién restaurada (nadie conectado todavía)
+refresh_snapshot() {
+  phase_start db_snapshot
+  if db_exists "$SNAPSHOT_DB"; then
+    psql_admin -c "ALTER DATABASE \"$SNAPSHOT_DB\" IS_TEMPLATE false;" >/dev/null &&
+      sudo -u postgres dropdb "$SNAPSHOT_DB" || return 1
+  fi
+  psql_admin -c "CREATE DATABASE \"$SNAPSHOT_DB\" TEMPLATE \"$DEST_DB\";" >/dev/null &&
+    psql_admin -c "ALTER DATABASE \"$SNAPSHOT_DB\" IS_TEMPLATE true ALLOW_CONNECTIONS false;" >/dev/null &&
+    psql_admin -c "COMMENT ON DATABASE \"$SNAPSHOT_DB\" IS 'snapshot:$SRC_DB:$(date +%s)';" >/dev/null || return 1
+  phase_end
+}
+
+echo "   Eliminando BD anterior si existe..."
+sudo -u postgres dropdb "$DEST_DB" 2>/dev/null || true
+
+if [[ "$METHOD" != "dump" ]] && db_exists "$SNAPSHOT_DB"; then
+  AGE=$(snapshot_age)
+  if [[ "$METHOD" == "template" ]] || [[ -n "$AGE" && "$AGE" -le "$MAX_AGE" ]]; then
+    echo "   Copiando desde snapshot $SNAPSHOT_DB (${AGE:-?} min de antigüedad)..."
+    if clone_from_snapshot; then
+      echo "✅ Base de datos clonada desde snapshot (CREATE DATABASE ... TEMPLATE)."
+      exit 0
+    fi
+    echo "⚠️  No se pudo copiar desde el snapshot, se usa pg_dump/pg_restore"
+    sudo -u postgres dropdb "$DEST_DB" 2>/dev/null || true
+  else
+    echo "   Snapshot $SNAPSHOT_DB vencido (${AGE:-?} min, máximo $MAX_AGE), se renueva"
+  fi
+fi
+
+clone_with_dump
+echo "✅ Base de datos clonada con pg_dump/pg_restore."
+
+if [[ "$METHOD" != "dump" ]] && [[ "$RESTORE_FAILED" == 1 ]]; then
+  echo "⚠️  Snapshot $SNAPSHOT_DB no renovado: pg_restore terminó con errores"
+elif [[ "$METHOD" != "dump" ]]; then
+  echo "   Renovando snapshot $SNAPSHOT_DB para las próximas copias..."
+  refresh_snapshot || echo "⚠️  No se pudo renovar el snapshot (la copia de $DEST_DB está completa)"
+fi
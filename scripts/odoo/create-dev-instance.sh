@@ -6,15 +6,24 @@ export PATH=/usr/local/sbin:/usr/local/bin:/usr/sbin:/usr/bin:/sbin:/bin
 
 set -e
 
+# Método de clonado pedido por el panel (tiene prioridad sobre el .env)
+REQUESTED_CLONE_METHOD="${DB_CLONE_METHOD:-}"
+
 # Cargar variables de entorno
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 source "$SCRIPT_DIR/../utils/load-env.sh"
+[[ -n "$REQUESTED_CLONE_METHOD" ]] && export DB_CLONE_METHOD="$REQUESTED_CLONE_METHOD"
 
 # Validar variables requeridas
 source "$SCRIPT_DIR/../utils/validate-env.sh" \
     CF_API_TOKEN DOMAIN_ROOT DB_USER DB_PASSWORD \
     ODOO_ADMIN_PASSWORD PUBLIC_IP PROD_ROOT DEV_ROOT PROD_INSTANCE_NAME
 
+# Tiempos por fase (phase_start / phase_end)
+source "$SCRIPT_DIR/../utils/job-phases.sh"
+# Árbol de Odoo y venv compartidos (ensure_odoo_runtime / link_odoo_runtime)
+source "$SCRIPT_DIR/../utils/odoo-runtime.sh"
+
 # Configuración desde .env
 PROD_ROOT="${PROD_ROOT}"
 DEV_ROOT="${DEV_ROOT}"
@@ -232,36 +241,27 @@ sleep 5
 echo "📁 Creando estructura de carpetas en $BASE_DIR..."
 mkdir -p "$BASE_DIR"
 mkdir -p "$BASE_DIR/custom_addons"
-mkdir -p "$BASE_DIR/odoo-server"
-
-# Copiar archivos desde producción
-echo "📦 Copiando archivos desde producción..."
-echo "   Esto puede tomar varios minutos..."
-cp -r "$PROD_ROOT/$PROD_INSTANCE/odoo-server/"* "$BASE_DIR/odoo-server/"
-echo "✅ Archivos copiados correctamente."
-
-# Crear entorno virtual Python
-echo "🐍 Creando entorno virtual Python..."
-$PYTHON -m venv "$VENV_DIR"
-source "$VENV_DIR/bin/activate"
-echo "⬆️  Actualizando pip y wheel..."
-pip install --upgrade pip wheel
-echo "📦 Instalando requerimientos Python..."
-pip install -r "$BASE_DIR/odoo-server/requirements.txt"
-echo "📦 Instalando dependencias adicionales comunes..."
-pip install phonenumbers gevent greenlet
-
-# Clonar base de datos desde producción
-echo "🗄️  Clonando base de datos desde producción..."
-echo "   Eliminando BD anterior si existe..."
-sudo -u postgres dropdb "$DB_NAME" 2>/dev/null || true
-echo "   Creando dump de $PROD_DB..."
-sudo -u postgres pg_dump "$PROD_DB" > "/tmp/${DB_NAME}_dump.sql"
-echo "   Creando base de datos $DB_NAME..."
-sudo -u postgres createdb "$DB_NAME" -O "$DB_USER" --encoding='UTF8'
-echo "   Restaurando datos..."
-sudo -u postgres psql -d "$DB_NAME" < "/tmp/${DB_NAME}_dump.sql"
-rm -f "/tmp/${DB_NAME}_dump.sql"
+
+# Enlazar el árbol de Odoo y el venv compartidos (se arman solo la primera vez
+# que se usa esta versión de Odoo y estos requerimientos; ver odoo-runtime.sh)
+echo "📦 Preparando runtime de Odoo (árbol y venv compartidos)..."
+phase_start runtime
+ensure_odoo_runtime "$PROD_ROOT/$PROD_INSTANCE/odoo-server" "$PYTHON"
+link_odoo_runtime "$BASE_DIR"
+if [[ "$ODOO_RUNTIME_REUSED" == "yes" ]]; then
+  phase_end reused
+  echo "✅ Runtime existente enlazado."
+else
+  phase_end built
+  echo "✅ Runtime creado y enlazado."
+fi
+
+# Clonar base de datos desde producción (snapshot + TEMPLATE o pg_dump/pg_restore en paralelo,
+# según DB_CLONE_METHOD; ver clone-database.sh)
+echo "🗄️  Clonando base de datos desde producción (método: ${DB_CLONE_METHOD:-auto})..."
+phase_start database
+"$SCRIPTS_PATH/odoo/clone-database.sh" "$PROD_DB" "$DB_NAME" "$DB_USER"
+phase_end "${DB_CLONE_METHOD:-auto}"
 echo "✅ Base de datos clonada correctamente."
 
 # Copiar filestore desde producción
@@ -273,7 +273,9 @@ DEV_FILESTORE="$FILESTORE_BASE/$DB_NAME"
 if [[ -d "$PROD_FILESTORE" ]]; then
   echo "   Origen: $PROD_FILESTORE ($(du -sh $PROD_FILESTORE | cut -f1))"
   mkdir -p "$DEV_FILESTORE"
+  phase_start filestore
   rsync -a "$PROD_FILESTORE/" "$DEV_FILESTORE/"
+  phase_end
   echo "✅ Filestore copiado correctamente ($(find $DEV_FILESTORE -type f | wc -l) archivos)"
 else
   echo "⚠️  Advertencia: No se encontró filestore de producción en $PROD_FILESTORE"
@@ -283,8 +285,10 @@ fi
 if [[ "$NEUTRALIZE_OPTION" == "neutralize" ]]; then
   echo "🛡️  Neutralizando base de datos de desarrollo..."
   # Usar script SQL directo (no requiere importar Odoo)
+  phase_start neutralize
   "$SCRIPTS_PATH/odoo/neutralize-database-sql.sh" "$DB_NAME"
   if [ $? -eq 0 ]; then
+    phase_end
     echo "✅ Base de datos neutralizada correctamente"
   else
     echo "❌ Error al neutralizar base de datos"
@@ -352,9 +356,11 @@ sudo systemctl enable "odoo19e-$INSTANCE_NAME"
 # Regenerar assets antes de iniciar el servicio
 echo "🎨 Regenerando assets (CSS, JS, iconos)..."
 echo "   Esto puede tomar algunos minutos..."
-sudo -u $USER "$VENV_DIR/bin/python3" "$BASE_DIR/odoo-server/odoo-bin" -c "$ODOO_CONF" --update=all --stop-after-init
-
-if [ $? -ne 0 ]; then
+phase_start update_modules
+if sudo -u $USER "$VENV_DIR/bin/python3" "$BASE_DIR/odoo-server/odoo-bin" -c "$ODOO_CONF" --update=all --stop-after-init; then
+  phase_end
+else
+  phase_end failed
   echo "⚠️  Advertencia: Error al actualizar módulos. Continuando..."
 fi
 
@@ -628,30 +634,17 @@ fi
 echo "⏹️  Deteniendo servicio Odoo..."
 sudo systemctl stop "odoo19e-$INSTANCE_NAME"
 
-echo "💾 Haciendo backup de custom_addons..."
-if [[ -d "$DEV_DIR/custom_addons" ]]; then
-  cp -r "$DEV_DIR/custom_addons" "$DEV_DIR/custom_addons.backup"
-fi
-
-echo "🗑️  Eliminando odoo-server actual..."
-rm -rf "$DEV_DIR/odoo-server"
-
-echo "📦 Copiando archivos desde producción..."
-mkdir -p "$DEV_DIR/odoo-server"
-cp -r "$PROD_DIR/odoo-server/"* "$DEV_DIR/odoo-server/"
-
-echo "🔄 Restaurando custom_addons..."
-if [[ -d "$DEV_DIR/custom_addons.backup" ]]; then
-  rm -rf "$DEV_DIR/custom_addons"
-  mv "$DEV_DIR/custom_addons.backup" "$DEV_DIR/custom_addons"
+# odoo-server y venv son enlaces a runtimes compartidos: se reenlazan al
+# runtime del odoo-server actual de producción (custom_addons no se toca)
+echo "📦 Enlazando runtime de Odoo de producción..."
+ODOO_RUNTIMES_PATH="__ODOO_RUNTIMES_PATH__"
+source "__SCRIPTS_PATH__/utils/odoo-runtime.sh"
+if ! ensure_odoo_runtime "$PROD_DIR/odoo-server" "__PYTHON__"; then
+  sudo systemctl start "odoo19e-$INSTANCE_NAME"
+  echo "❌ No se pudo preparar el runtime de Odoo."
+  exit 1
 fi
-
-echo "🐍 Actualizando dependencias Python..."
-source "$DEV_DIR/venv/bin/activate"
-pip install --upgrade pip wheel
-pip install -r "$DEV_DIR/odoo-server/requirements.txt"
-echo "📦 Instalando dependencias adicionales comunes..."
-pip install phonenumbers
+link_odoo_runtime "$DEV_DIR"
 
 echo "▶️  Iniciando servicio Odoo..."
 sudo systemctl start "odoo19e-$INSTANCE_NAME"
@@ -662,6 +655,9 @@ UPDATEFILES
 sed -i "s|__PROD_DIR__|$PROD_ROOT/$PROD_INSTANCE|g" "$BASE_DIR/update-files.sh"
 sed -i "s|__BASE_DIR__|$BASE_DIR|g" "$BASE_DIR/update-files.sh"
 sed -i "s/__INSTANCE_NAME__/$INSTANCE_NAME/g" "$BASE_DIR/update-files.sh"
+sed -i "s|__SCRIPTS_PATH__|$SCRIPTS_PATH|g" "$BASE_DIR/update-files.sh"
+sed -i "s|__PYTHON__|$PYTHON|g" "$BASE_DIR/update-files.sh"
+sed -i "s|__ODOO_RUNTIMES_PATH__|$ODOO_RUNTIMES_PATH|g" "$BASE_DIR/update-files.sh"
 chmod +x "$BASE_DIR/update-files.sh"
 
 # Script para sincronizar filestore
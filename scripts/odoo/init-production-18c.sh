@@ -10,6 +10,7 @@ SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 source "$SCRIPT_DIR/../utils/load-env.sh"
 source "$SCRIPT_DIR/../utils/ssl-manager.sh"
 source "$SCRIPT_DIR/../utils/odoo-version-manager.sh"
+source "$SCRIPT_DIR/../utils/wheelhouse.sh"
 
 # Validar variables requeridas
 source "$SCRIPT_DIR/../utils/validate-env.sh" \
@@ -249,13 +250,9 @@ if [[ ! -d "$BASE_DIR/odoo-server/odoo" ]]; then
 fi
 
 echo "🐍 Entorno virtual..."
-$PYTHON -m venv venv
-source venv/bin/activate
-pip install --upgrade pip wheel
-pip install -r odoo-server/requirements.txt
-pip install gevent greenlet
-echo "📦 Instalando dependencias adicionales comunes..."
-pip install phonenumbers
+echo "📦 Instalando requerimientos Python (wheelhouse local)..."
+build_venv "$VENV_DIR" "$BASE_DIR/odoo-server/requirements.txt" "$PYTHON" gevent greenlet phonenumbers
+source "$VENV_DIR/bin/activate"
 
 echo "🗑️ Limpiando base de datos existente si existe..."
 sudo -u postgres dropdb "$INSTANCE_NAME" 2>/dev/null || true
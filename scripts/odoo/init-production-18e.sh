@@ -10,6 +10,7 @@ SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 source "$SCRIPT_DIR/../utils/load-env.sh"
 source "$SCRIPT_DIR/../utils/ssl-manager.sh"
 source "$SCRIPT_DIR/../utils/odoo-version-manager.sh"
+source "$SCRIPT_DIR/../utils/wheelhouse.sh"
 
 # Validar variables requeridas
 source "$SCRIPT_DIR/../utils/validate-env.sh" \
@@ -250,15 +251,9 @@ fi
 
 
 echo "🐍 Creando entorno virtual Python..."
-$PYTHON -m venv "$VENV_DIR"
-echo "💡 Activando entorno virtual..."
+echo "📦 Instalando requerimientos Python (wheelhouse local)..."
+build_venv "$VENV_DIR" "$BASE_DIR/odoo-server/requirements.txt" "$PYTHON" phonenumbers
 source "$VENV_DIR/bin/activate"
-echo "⬆️  Actualizando pip y wheel..."
-pip install --upgrade pip wheel
-echo "📦 Instalando requerimientos Python..."
-pip install -r "$BASE_DIR/odoo-server/requirements.txt"
-echo "📦 Instalando dependencias adicionales comunes..."
-pip install phonenumbers
 
 echo "🗑️ Limpiando base de datos existente si existe..."
 sudo -u postgres dropdb "$INSTANCE_NAME" 2>/dev/null || true
@@ -138,10 +138,14 @@ else
   echo "⚠️  La base de datos '$DB_NAME' no existía o ya fue eliminada."
 fi
 
-# Eliminar carpeta de instancia
+# Eliminar carpeta de instancia (odoo-server y venv son enlaces: el runtime compartido no se toca)
 echo "🧽 Eliminando carpeta de instancia..."
 sudo rm -rf "$BASE_DIR"
 
+# Liberar runtimes de Odoo que ya no usa ninguna instancia
+source "$SCRIPT_DIR/../utils/odoo-runtime.sh"
+prune_odoo_runtimes
+
 # Borrar log temporal
 echo "🧹 Borrando log temporal si existe..."
 sudo rm -f "$LOG_PATH"
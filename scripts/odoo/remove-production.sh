@@ -102,6 +102,9 @@ fi
 echo "🗄️  Eliminando base de datos PostgreSQL..."
 sudo -u postgres psql -c "SELECT pg_terminate_backend(pid) FROM pg_stat_activity WHERE datname = '$DB_NAME';" >/dev/null 2>&1 || true
 sudo -u postgres dropdb "$DB_NAME" >/dev/null 2>&1 || true
+# Snapshot usado para clonar instancias de desarrollo (clone-database.sh)
+sudo -u postgres psql -c "ALTER DATABASE \"$DB_NAME-clone-snapshot\" IS_TEMPLATE false;" >/dev/null 2>&1 || true
+sudo -u postgres dropdb "$DB_NAME-clone-snapshot" >/dev/null 2>&1 || true
 
 echo "🧽 Eliminando carpeta de instancia..."
 sudo rm -rf "$BASE_DIR"
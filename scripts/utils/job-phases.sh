@@ -0,0 +1,32 @@
+#!/bin/bash
+
+# ========================================
+# TIEMPOS POR FASE DE UN SCRIPT
+# ========================================
+# Uso: source /path/to/job-phases.sh
+#      phase_start nombre
+#      ...
+#      phase_end [detalle]
+#
+# Cada fase se muestra en el log con su duración. Si el script corre como
+# job, el job engine pasa JOB_PHASES_FILE y cada fase se agrega ahí como
+# "nombre<TAB>milisegundos<TAB>detalle"; al terminar el job queda en
+# jobs.phases para comparar tiempos entre ejecuciones.
+
+JOB_PHASES_FILE="${JOB_PHASES_FILE:-}"
+
+phase_start() {
+    PHASE_NAME="$1"
+    PHASE_STARTED_MS=$(date +%s%3N)
+}
+
+phase_end() {
+    local detail="${1:-}"
+    [[ -z "$PHASE_NAME" ]] && return 0
+    local elapsed=$(( $(date +%s%3N) - PHASE_STARTED_MS ))
+    echo "⏱️  Fase $PHASE_NAME${detail:+ ($detail)}: $(( elapsed / 1000 )).$(printf '%03d' $(( elapsed % 1000 )))s"
+    if [[ -n "$JOB_PHASES_FILE" ]]; then
+        printf '%s\t%s\t%s\n' "$PHASE_NAME" "$elapsed" "$detail" >> "$JOB_PHASES_FILE" 2>/dev/null || true
+    fi
+    PHASE_NAME=""
+}
@@ -0,0 +1,170 @@
+#!/bin/bash
+
+# ========================================
+# RUNTIMES COMPARTIDOS DE ODOO
+# ========================================
+# Uso: source /path/to/odoo-runtime.sh
+#      ensure_odoo_runtime <odoo-server de origen> [python]
+#      link_odoo_runtime <directorio de la instancia>
+#      prune_odoo_runtimes
+#
+# En vez de copiar odoo-server y crear un venv por instancia de desarrollo,
+# se guarda una sola copia de solo lectura de cada árbol de Odoo y un solo
+# venv por conjunto de dependencias, y las instancias los enlazan:
+#
+#   $ODOO_RUNTIMES_PATH/src/<versión><e|c>-<hash del contenido>/
+#   $ODOO_RUNTIMES_PATH/venv/py<versión de python>-<hash de requirements>/
+#
+# El árbol se identifica por versión, edición y contenido (dos producciones
+# con el mismo Odoo comparten copia; una actualizada en producción genera
+# otra). El venv depende solo de requirements.txt, los paquetes extra y la
+# versión de Python, así que sirve para cualquier árbol con esas
+# dependencias. Cada uno se arma una vez, bajo un flock, y queda listo al
+# escribir `.ready`; los que no se usan hace más de un día se borran con
+# prune_odoo_runtimes.
+
+ODOO_RUNTIMES_PATH="${ODOO_RUNTIMES_PATH:-$(dirname "$(dirname "${DEV_ROOT:-/home/mtg/apps/develop/odoo}")")/runtimes}"
+# Paquetes que se instalan además de requirements.txt (forman parte del hash)
+ODOO_RUNTIME_EXTRA_PACKAGES="${ODOO_RUNTIME_EXTRA_PACKAGES:-phonenumbers gevent greenlet}"
+
+# Los venvs se arman desde la wheelhouse local (build_venv)
+source "$(dirname "${BASH_SOURCE[0]}")/wheelhouse.sh"
+
+# Versión mayor de Odoo del árbol (de odoo/release.py)
+odoo_source_version() {
+    grep -m1 "^version_info" "$1/odoo/release.py" 2>/dev/null \
+        | sed -E "s/^version_info = \(['\"]?(saas~)?([0-9]+).*/\2/"
+}
+
+# e (enterprise) o c (community)
+odoo_source_edition() {
+    if [[ -d "$1/odoo/addons/web_enterprise" ]]; then echo "e"; else echo "c"; fi
+}
+
+# Hash del contenido del árbol (sin cachés de Python)
+odoo_source_hash() {
+    (cd "$1" && find . -type f ! -name '*.pyc' ! -path '*/__pycache__/*' -print0 \
+        | sort -z | xargs -0 sha1sum | sha1sum | cut -c1-12)
+}
+
+odoo_requirements_hash() {
+    { cat "$1/requirements.txt" 2>/dev/null; echo "$ODOO_RUNTIME_EXTRA_PACKAGES"; } | sha1sum | cut -c1-12
+}
+
+# Ejecuta "$@" con el flock de un runtime (un solo proceso lo arma)
+with_runtime_lock() {
+    local lock_file="$1"
+    shift
+    mkdir -p "$(dirname "$lock_file")"
+    (
+        flock 9
+        "$@"
+    ) 9>"$lock_file"
+}
+
+# Los pasos se encadenan con || return: dentro de with_runtime_lock ... || return
+# el set -e del script que llama no corta, y un paso fallido no debe dejar .ready
+_build_odoo_source() {
+    local source_dir="$1" target="$2" python="$3"
+    if [[ -f "$target/.ready" ]]; then
+        touch "$target/.ready"
+        return 0
+    fi
+    # Restos de un armado que se cortó
+    if [[ -d "$target" ]]; then
+        chmod -R u+w "$target" && rm -rf "$target" || return 1
+    fi
+    echo "   Copiando árbol de Odoo a $target..."
+    mkdir -p "$target" || return 1
+    rsync -a --exclude '__pycache__' --exclude '*.pyc' "$source_dir/" "$target/" || return 1
+    # Compilado de antemano: con el árbol de solo lectura Python no puede escribir __pycache__
+    "$python" -m compileall -q "$target/odoo" >/dev/null 2>&1 || true
+    chmod -R a+rX,a-w "$target" && chmod u+w "$target" || return 1
+    touch "$target/.ready"
+}
+
+_build_odoo_venv() {
+    local source_dir="$1" target="$2" python="$3"
+    if [[ -f "$target/.ready" ]]; then
+        touch "$target/.ready"
+        return 0
+    fi
+    if [[ -d "$target" ]]; then
+        chmod -R u+w "$target" && rm -rf "$target" || return 1
+    fi
+    echo "   Creando venv compartido en $target..."
+    # El venv no se puede mover después de creado: se arma en su ruta final
+    # shellcheck disable=SC2086
+    build_venv "$target" "$source_dir/requirements.txt" "$python" $ODOO_RUNTIME_EXTRA_PACKAGES || return 1
+    "$target/bin/python" -m compileall -q "$target/lib" >/dev/null 2>&1 || true
+    chmod -R a+rX,a-w "$target" && chmod u+w "$target" || return 1
+    touch "$target/.ready"
+}
+
+# Asegura el árbol y el venv para el odoo-server de origen
+# Deja en ODOO_RUNTIME_SRC y ODOO_RUNTIME_VENV las rutas a enlazar y en
+# ODOO_RUNTIME_REUSED "yes" si ambos ya existían.
+ensure_odoo_runtime() {
+    local source_dir="$1"
+    local python="${2:-${PYTHON_BIN:-/usr/bin/python3.12}}"
+
+    if [[ ! -f "$source_dir/odoo-bin" ]] || [[ ! -f "$source_dir/requirements.txt" ]]; then
+        echo "❌ $source_dir no es un árbol de Odoo (falta odoo-bin o requirements.txt)"
+        return 1
+    fi
+
+    local version edition py_version
+    version=$(odoo_source_version "$source_dir")
+    edition=$(odoo_source_edition "$source_dir")
+    py_version=$("$python" -c 'import sys; print("%d.%d" % sys.version_info[:2])')
+
+    ODOO_RUNTIME_SRC="$ODOO_RUNTIMES_PATH/src/${version:-unknown}${edition}-$(odoo_source_hash "$source_dir")"
+    ODOO_RUNTIME_VENV="$ODOO_RUNTIMES_PATH/venv/py${py_version}-$(odoo_requirements_hash "$source_dir")"
+    ODOO_RUNTIME_REUSED="no"
+    [[ -f "$ODOO_RUNTIME_SRC/.ready" && -f "$ODOO_RUNTIME_VENV/.ready" ]] && ODOO_RUNTIME_REUSED="yes"
+
+    echo "   Runtime: Odoo ${version:-?}${edition} ($(basename "$ODOO_RUNTIME_SRC")), venv $(basename "$ODOO_RUNTIME_VENV")"
+    with_runtime_lock "$ODOO_RUNTIME_SRC.lock" _build_odoo_source "$source_dir" "$ODOO_RUNTIME_SRC" "$python" || return 1
+    with_runtime_lock "$ODOO_RUNTIME_VENV.lock" _build_odoo_venv "$source_dir" "$ODOO_RUNTIME_VENV" "$python" || return 1
+}
+
+# Enlaza odoo-server y venv de la instancia al último runtime asegurado
+# (reemplaza copias propias de instancias anteriores)
+link_odoo_runtime() {
+    local base_dir="$1"
+    local name
+    for name in odoo-server venv; do
+        if [[ -e "$base_dir/$name" && ! -L "$base_dir/$name" ]]; then
+            chmod -R u+w "$base_dir/$name" 2>/dev/null || true
+            rm -rf "${base_dir:?}/$name"
+        fi
+    done
+    ln -sfn "$ODOO_RUNTIME_SRC" "$base_dir/odoo-server"
+    ln -sfn "$ODOO_RUNTIME_VENV" "$base_dir/venv"
+}
+
+# Borra los runtimes que ninguna instancia enlaza y no se usaron en el último día
+prune_odoo_runtimes() {
+    local roots=("${DEV_ROOT:-}" "${PROD_ROOT:-}")
+    local used=" "
+    local root link
+    for root in "${roots[@]}"; do
+        [[ -d "$root" ]] || continue
+        for link in "$root"/*/odoo-server "$root"/*/venv; do
+            [[ -L "$link" ]] && used+="$(readlink -f "$link") "
+        done
+    done
+
+    local runtime
+    for runtime in "$ODOO_RUNTIMES_PATH"/src/* "$ODOO_RUNTIMES_PATH"/venv/*; do
+        [[ -d "$runtime" ]] || continue
+        [[ "$used" == *" $(readlink -f "$runtime") "* ]] && continue
+        # Recién armado o en uso por una creación que todavía no enlazó
+        [[ -n "$(find "$runtime/.ready" -mmin -1440 2>/dev/null)" ]] && continue
+        [[ ! -f "$runtime/.ready" ]] && continue
+        echo "🧹 Eliminando runtime sin uso: $runtime"
+        chmod -R u+w "$runtime" 2>/dev/null || true
+        rm -rf "$runtime" "$runtime.lock"
+    done
+    return 0
+}
@@ -26,7 +26,8 @@ restart_backend() {
         echo -e "${RED}❌ Backend no está corriendo${NC}"
         echo -e "${YELLOW}💡 Iniciando backend...${NC}"
         cd "$PROJECT_ROOT/backend"
-        nohup venv/bin/gunicorn -w 4 -b 127.0.0.1:5000 \
+        # 32 hilos por worker: los streams SSE ocupan uno cada uno (ver deploy.sh)
+        nohup venv/bin/gunicorn -w 4 --worker-class gthread --threads 32 -b 127.0.0.1:5000 \
             --timeout 600 \
             --max-requests 1000 \
             --max-requests-jitter 50 \
@@ -0,0 +1,83 @@
+#!/bin/bash
+
+# ========================================
+# WHEELHOUSE LOCAL Y VENVS SIN RED
+# ========================================
+# Uso: source /path/to/wheelhouse.sh
+#      build_venv <venv> <requirements.txt> <python> [paquetes extra...]
+#
+# Los wheels de las dependencias (psycopg2, lxml, gevent...) se compilan una
+# sola vez por versión de Python y quedan en $ODOO_WHEELHOUSE_PATH/py<versión>/,
+# compartidos entre conjuntos de requerimientos. Cada conjunto (hash de
+# requirements.txt y los paquetes extra) queda marcado con .ready-<hash> una
+# vez que todos sus wheels están, y desde ahí los venvs se arman con
+# `pip install --no-index --find-links`: sin resolver contra PyPI ni compilar,
+# y sin red. Armar un conjunto nuevo sí necesita red, salvo que sus wheels ya
+# estén en la carpeta.
+
+ODOO_WHEELHOUSE_PATH="${ODOO_WHEELHOUSE_PATH:-${ODOO_RUNTIMES_PATH:-$(dirname "$(dirname "${DEV_ROOT:-/home/mtg/apps/develop/odoo}")")/runtimes}/wheelhouse}"
+
+# Versión X.Y del intérprete
+python_version() {
+    "$1" -c 'import sys; print("%d.%d" % sys.version_info[:2])'
+}
+
+# Hash de requirements.txt más los paquetes extra
+requirements_hash() {
+    local requirements="$1"
+    shift
+    { cat "$requirements" 2>/dev/null; echo "$*"; } | sha1sum | cut -c1-12
+}
+
+# Compila los wheels de un conjunto en la carpeta de su versión de Python
+# (bajo flock: un solo proceso compila)
+ensure_wheelhouse() {
+    local requirements="$1" python="$2"
+    shift 2
+    local wheelhouse="$ODOO_WHEELHOUSE_PATH/py$(python_version "$python")"
+    local marker="$wheelhouse/.ready-$(requirements_hash "$requirements" "$@")"
+    WHEELHOUSE_DIR="$wheelhouse"
+
+    mkdir -p "$wheelhouse" || return 1
+    (
+        flock 9
+        [[ -f "$marker" ]] && exit 0
+        echo "   Compilando wheels en $wheelhouse (solo la primera vez)..."
+        # pip de un venv temporal: el Python del sistema puede no traer pip
+        local builder
+        builder=$(mktemp -d) || exit 1
+        trap 'rm -rf "$builder"' EXIT
+        "$python" -m venv "$builder" || exit 1
+        "$builder/bin/pip" install --quiet --upgrade pip wheel || exit 1
+        # Los wheels que ya están en la carpeta no se vuelven a compilar
+        "$builder/bin/pip" wheel --wheel-dir "$wheelhouse" --find-links "$wheelhouse" \
+            pip wheel setuptools -r "$requirements" "$@" || exit 1
+        touch "$marker"
+    ) 9>"$wheelhouse/.lock"
+}
+
+# Instala requirements y extras en un venv existente solo desde la wheelhouse
+install_from_wheelhouse() {
+    local venv="$1" requirements="$2"
+    shift 2
+    "$venv/bin/pip" install --no-index --find-links "$WHEELHOUSE_DIR" --upgrade pip wheel &&
+        "$venv/bin/pip" install --no-index --find-links "$WHEELHOUSE_DIR" -r "$requirements" "$@"
+}
+
+# Crea el venv e instala las dependencias desde la wheelhouse; si no se pudo
+# armar la wheelhouse (sin red y sin wheels), instala desde PyPI como antes
+build_venv() {
+    local venv="$1" requirements="$2" python="$3"
+    shift 3
+
+    "$python" -m venv "$venv" || return 1
+    if ensure_wheelhouse "$requirements" "$python" "$@"; then
+        echo "   Instalando dependencias desde la wheelhouse local (sin red)..."
+        install_from_wheelhouse "$venv" "$requirements" "$@" && return 0
+        echo "⚠️  Falló la instalación desde la wheelhouse, se instala desde PyPI"
+    else
+        echo "⚠️  No se pudo armar la wheelhouse, se instala desde PyPI"
+    fi
+    "$venv/bin/pip" install --upgrade pip wheel &&
+        "$venv/bin/pip" install -r "$requirements" "$@"
+}
@@ -59,6 +59,8 @@ $ACTUAL_USER ALL=(ALL) NOPASSWD: /usr/bin/nginx -t
 $ACTUAL_USER ALL=(postgres) NOPASSWD: /usr/bin/psql
 $ACTUAL_USER ALL=(postgres) NOPASSWD: /usr/bin/createdb
 $ACTUAL_USER ALL=(postgres) NOPASSWD: /usr/bin/dropdb
+$ACTUAL_USER ALL=(postgres) NOPASSWD: /usr/bin/pg_dump
+$ACTUAL_USER ALL=(postgres) NOPASSWD: /usr/bin/pg_restore
 
 # Certbot (para Let's Encrypt)
 $ACTUAL_USER ALL=(ALL) NOPASSWD: /usr/bin/certbot